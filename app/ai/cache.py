@@ -0,0 +1,61 @@
+"""Persistent, content-addressed cache for deterministic LLM generations.
+
+Entries are keyed by a hash of everything that determines the response
+(model, system prompt, prompt and max_tokens), expire after a TTL, and are
+evicted least-recently-used once the table grows past its size limit.
+"""
+import hashlib
+import json
+import time
+
+from app.config import settings
+from app.database import execute, query_one, transaction
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def cache_key(model: str, system: str, prompt: str, max_tokens: int) -> str:
+    payload = json.dumps([model, system, prompt, max_tokens])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get(key: str) -> str | None:
+    now = time.time()
+    row = query_one("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,))
+    if row is None or now - row["created_at"] > settings.llm_cache_ttl_seconds:
+        _stats["misses"] += 1
+        return None
+    execute("UPDATE llm_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+    _stats["hits"] += 1
+    return row["response"]
+
+
+def put(key: str, response: str):
+    now = time.time()
+    with transaction() as db:
+        execute(
+            """INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_used_at)
+               VALUES (?, ?, ?, ?)""",
+            (key, response, now, now),
+        )
+        expired = db.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?",
+            (now - settings.llm_cache_ttl_seconds,),
+        ).rowcount
+        evicted = db.execute(
+            """DELETE FROM llm_cache WHERE key IN (
+                   SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+               )""",
+            (settings.llm_cache_max_entries,),
+        ).rowcount
+    _stats["evictions"] += expired + evicted
+
+
+def stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    entries = query_one("SELECT COUNT(*) AS c FROM llm_cache")["c"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+        "entries": entries,
+    }
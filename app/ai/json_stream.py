@@ -0,0 +1,132 @@
+import json
+from typing import Any
+
+_WHITESPACE = " \t\r\n"
+
+
+class JsonFieldStream:
+    """Incrementally parse a JSON object that arrives in chunks.
+
+    Feed it model output as it streams in and it reports each top-level field
+    as soon as its value closes, plus each element of a top-level array as
+    soon as that element closes. Text before the opening brace (such as a
+    ```json fence) and after the closing brace is ignored.
+
+    feed() returns a list of events:
+        ("item", key, index, value)  -- an element of the array field `key`
+        ("field", key, value)        -- a complete top-level field
+    """
+
+    def __init__(self):
+        self.result: dict[str, Any] = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = True
+        self._key: str | None = None
+        self._key_start: int | None = None
+        self._value_start: int | None = None
+        self._value_is_array = False
+        self._item_start: int | None = None
+        self._item_index = 0
+
+    def feed(self, chunk: str) -> list[tuple]:
+        self._text += chunk
+        text = self._text
+        events: list[tuple] = []
+
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(i, events)
+                continue
+
+            if ch in _WHITESPACE:
+                continue
+            if ch == '"':
+                self._open_value(i)
+                self._in_string = True
+            elif ch in "{[":
+                self._open_value(i)
+                if self._depth == 1 and ch == "[":
+                    self._value_is_array = True
+                self._depth += 1
+            elif ch in "}]":
+                self._flush_scalar(i, events)
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                elif self._depth == 1:
+                    self._emit_field(i + 1, events)
+                elif self._depth == 2 and self._value_is_array:
+                    self._emit_item(i + 1, events)
+            elif ch == ":":
+                if self._depth == 1:
+                    self._expect_key = False
+            elif ch == ",":
+                self._flush_scalar(i, events)
+                if self._depth == 1:
+                    self._expect_key = True
+            else:
+                # First character of a number, true, false or null
+                self._open_value(i)
+
+        return events
+
+    def _open_value(self, i: int):
+        if self._depth == 1:
+            if self._expect_key:
+                self._key_start = i
+            elif self._value_start is None:
+                self._value_start = i
+        elif self._depth == 2 and self._value_is_array and self._item_start is None:
+            self._item_start = i
+
+    def _close_string(self, i: int, events: list[tuple]):
+        if self._depth == 1:
+            if self._expect_key:
+                self._key = json.loads(self._text[self._key_start:i + 1])
+            else:
+                self._emit_field(i + 1, events)
+        elif self._depth == 2 and self._value_is_array:
+            self._emit_item(i + 1, events)
+
+    def _flush_scalar(self, i: int, events: list[tuple]):
+        """Close a bare scalar (number/literal), which only ends at a delimiter."""
+        if self._depth == 1 and self._value_start is not None:
+            self._emit_field(i, events)
+        elif self._depth == 2 and self._value_is_array and self._item_start is not None:
+            self._emit_item(i, events)
+
+    def _emit_field(self, end: int, events: list[tuple]):
+        value = json.loads(self._text[self._value_start:end])
+        self.result[self._key] = value
+        events.append(("field", self._key, value))
+        self._value_start = None
+        self._value_is_array = False
+        self._item_index = 0
+
+    def _emit_item(self, end: int, events: list[tuple]):
+        value = json.loads(self._text[self._item_start:end])
+        events.append(("item", self._key, self._item_index, value))
+        self._item_start = None
+        self._item_index += 1
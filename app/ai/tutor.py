@@ -1,83 +1,187 @@
 import json
+from collections.abc import AsyncIterator
+from app.ai import cache as llm_cache
+from app.ai import usage
 from app.ai.client import get_client
 from app.ai.prompts import format_prompt
 from app.config import settings
 
+# Marks the end of a prompt prefix that is worth caching on Anthropic's side.
+# Prefixes shorter than the model's minimum cacheable length are sent as usual.
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+DEFAULT_SYSTEM = "You are an expert tutor."
 
-def _call(prompt: str, system: str = "You are an expert tutor.", expect_json: bool = True, max_tokens: int = 4096) -> str | dict:
+
+async def _call(
+    prompt: str,
+    system: str = DEFAULT_SYSTEM,
+    expect_json: bool = True,
+    max_tokens: int = 4096,
+    cache: bool = False,
+    context: str | None = None,
+) -> str | dict:
+    """Send a single-turn prompt. With cache=True, identical requests are served from the LLM cache.
+
+    `context` is sent ahead of the prompt and marked for prompt caching, so
+    calls sharing it (e.g. a quiz and review cards for the same lesson) only
+    pay full price for it once.
+    """
+    key = llm_cache.cache_key(settings.model, system, (context or "") + prompt, max_tokens) if cache else None
+    text = llm_cache.get(key) if key else None
+    if text is not None:
+        return parse_json(text) if expect_json else text
+
+    content = prompt
+    if context is not None:
+        content = [
+            {"type": "text", "text": context, "cache_control": CACHE_BREAKPOINT},
+            {"type": "text", "text": prompt},
+        ]
     client = get_client()
-    response = client.messages.create(
+    response = await client.messages.create(
         model=settings.model,
         max_tokens=max_tokens,
         system=system,
-        messages=[{"role": "user", "content": prompt}],
+        messages=[{"role": "user", "content": content}],
     )
+    usage.record(getattr(response, "usage", None))
     text = response.content[0].text.strip()
-    if expect_json:
-        # Extract JSON from markdown code blocks if present.
-        # Use rfind for the closing ``` to avoid matching backticks
-        # inside JSON string values (e.g. markdown code examples).
-        if "```json" in text:
-            start = text.index("```json") + len("```json")
-            end = text.rfind("```")
-            text = text[start:end].strip()
-        elif "```" in text:
-            start = text.index("```") + len("```")
-            end = text.rfind("```")
-            text = text[start:end].strip()
-        return json.loads(text)
-    return text
-
-
-def generate_curriculum(skill_name: str, difficulty: str = "beginner") -> dict:
+
+    # Parse before caching so a malformed response is never replayed
+    result = parse_json(text) if expect_json else text
+    if key:
+        llm_cache.put(key, text)
+    return result
+
+
+def _lesson_context(lesson_content: dict) -> str:
+    # Byte-identical for every call about the same lesson, so its cache entry is shared
+    return "Lesson content:\n" + json.dumps(lesson_content, indent=2)
+
+
+def _chat_request(messages: list[dict], skill_context: str) -> dict:
+    """System prompt (with the lesson context) and history, with cache breakpoints.
+
+    The system prompt is stable for a whole conversation about one lesson,
+    and each turn extends the previous one, so both prefixes are cached.
+    """
+    system = [{"type": "text", "text": format_prompt("tutor_chat", skill_context=skill_context),
+               "cache_control": CACHE_BREAKPOINT}]
+    messages = [dict(m) for m in messages]
+    if len(messages) > 1:
+        # The history before the new message is next turn's prefix
+        previous = messages[-2]
+        previous["content"] = [{"type": "text", "text": previous["content"], "cache_control": CACHE_BREAKPOINT}]
+    return {"system": system, "messages": messages}
+
+
+def parse_json(text: str) -> dict:
+    # Extract JSON from markdown code blocks if present.
+    # Use rfind for the closing ``` to avoid matching backticks
+    # inside JSON string values (e.g. markdown code examples).
+    if "```json" in text:
+        start = text.index("```json") + len("```json")
+        end = text.rfind("```")
+        text = text[start:end].strip()
+    elif "```" in text:
+        start = text.index("```") + len("```")
+        end = text.rfind("```")
+        text = text[start:end].strip()
+    return json.loads(text)
+
+
+async def generate_curriculum(skill_name: str, difficulty: str = "beginner") -> dict:
     prompt = format_prompt("curriculum", skill_name=skill_name, difficulty=difficulty)
-    return _call(prompt)
+    return await _call(prompt, cache=True)
 
 
-def generate_lesson(skill_name: str, topic: str, difficulty: int, previous_topics: list[str]) -> dict:
+def _lesson_prompt(skill_name: str, topic: str, difficulty: int, previous_topics: list[str]) -> str:
     prev = ", ".join(previous_topics) if previous_topics else "None (this is the first lesson)"
-    prompt = format_prompt(
+    return format_prompt(
         "lesson",
         skill_name=skill_name,
         topic=topic,
         difficulty=difficulty,
         previous_topics=prev,
     )
-    return _call(prompt, max_tokens=8192)
 
 
-def generate_quiz(lesson_content: dict, difficulty: int) -> dict:
-    prompt = format_prompt(
-        "quiz",
-        lesson_json=json.dumps(lesson_content, indent=2),
-        difficulty=difficulty,
-    )
-    return _call(prompt)
+async def generate_lesson(skill_name: str, topic: str, difficulty: int, previous_topics: list[str]) -> dict:
+    prompt = _lesson_prompt(skill_name, topic, difficulty, previous_topics)
+    return await _call(prompt, max_tokens=8192)
+
 
+async def stream_lesson(skill_name: str, topic: str, difficulty: int, previous_topics: list[str]) -> AsyncIterator[str]:
+    """Yield the raw lesson JSON text as the model writes it."""
+    prompt = _lesson_prompt(skill_name, topic, difficulty, previous_topics)
+    client = get_client()
+    async with client.messages.stream(
+        model=settings.model,
+        max_tokens=8192,
+        system=DEFAULT_SYSTEM,
+        messages=[{"role": "user", "content": prompt}],
+    ) as stream:
+        async for text in stream.text_stream:
+            yield text
+        usage.record((await stream.get_final_message()).usage)
+
+
+async def generate_quiz(lesson_content: dict, difficulty: int) -> dict:
+    prompt = format_prompt("quiz", difficulty=difficulty)
+    return await _call(prompt, context=_lesson_context(lesson_content))
 
-def grade_answer(question: dict, user_answer: str) -> dict:
+
+async def grade_answer(question: dict, user_answer: str) -> dict:
     prompt = format_prompt(
         "grade_answer",
         question=question["question"],
         correct_answer=question.get("correct_answer", ""),
         user_answer=user_answer,
     )
-    return _call(prompt)
+    return await _call(prompt)
+
+
+async def grade_answers(items: list[dict]) -> dict:
+    """Grade several short answers in one call.
 
+    items: [{"id", "question", "expected_answer", "answer"}]
+    """
+    prompt = format_prompt("grade_answers", answers_json=json.dumps(items, indent=2))
+    return await _call(prompt, max_tokens=min(4096, 256 + 200 * len(items)))
 
-def chat(messages: list[dict], skill_context: str = "") -> str:
-    system = format_prompt("tutor_chat", skill_context=skill_context)
+
+async def chat(messages: list[dict], skill_context: str = "") -> str:
     client = get_client()
-    response = client.messages.create(
+    response = await client.messages.create(
         model=settings.model,
         max_tokens=2048,
-        system=system,
-        messages=messages,
+        **_chat_request(messages, skill_context),
     )
+    usage.record(getattr(response, "usage", None))
     return response.content[0].text.strip()
 
 
-def evaluate_exercise(exercise: dict, submission: str, output: str | None = None) -> dict:
+async def summarize_chat(summary: str, messages: list[dict]) -> str:
+    """Fold older chat turns into the conversation's running summary."""
+    transcript = "\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+    prompt = format_prompt("chat_summary", summary=summary or "(none yet)", transcript=transcript)
+    return await _call(prompt, expect_json=False, max_tokens=512)
+
+
+async def chat_stream(messages: list[dict], skill_context: str = "") -> AsyncIterator[str]:
+    """Yield the tutor's reply as text deltas while the model is still writing it."""
+    client = get_client()
+    async with client.messages.stream(
+        model=settings.model,
+        max_tokens=2048,
+        **_chat_request(messages, skill_context),
+    ) as stream:
+        async for text in stream.text_stream:
+            yield text
+        usage.record((await stream.get_final_message()).usage)
+
+
+async def evaluate_exercise(exercise: dict, submission: str, output: str | None = None) -> dict:
     output_section = ""
     if output:
         output_section = f"Execution output:\n```\n{output}\n```"
@@ -91,22 +195,20 @@ def evaluate_exercise(exercise: dict, submission: str, output: str | None = None
         submission=submission,
         output_section=output_section,
     )
-    return _call(prompt)
+    return await _call(prompt)
 
 
-def generate_resources(topic: str, skill_name: str, papers: list[dict]) -> dict:
+async def generate_resources(topic: str, skill_name: str) -> dict:
     prompt = format_prompt("resources", topic=topic, skill_name=skill_name)
-    result = _call(prompt, max_tokens=1024)
-    result["papers"] = papers
-    return result
+    return await _call(prompt, max_tokens=1024, cache=True)
 
 
-def generate_cheat_sheet(skill_name: str, lesson_summaries: str) -> str:
+async def generate_cheat_sheet(skill_name: str, lesson_summaries: str, cache: bool = True) -> str:
     prompt = format_prompt("cheat_sheet", skill_name=skill_name, lesson_summaries=lesson_summaries)
-    return _call(prompt, expect_json=False, max_tokens=2048)
+    return await _call(prompt, expect_json=False, max_tokens=2048, cache=cache)
 
 
-def generate_project_brief(
+async def generate_project_brief(
     skill_name: str,
     curriculum_overview: str,
     lesson_topics: str,
@@ -119,10 +221,10 @@ def generate_project_brief(
         lesson_topics=lesson_topics,
         submission_type=submission_type,
     )
-    return _call(prompt, max_tokens=2048)
+    return await _call(prompt, max_tokens=2048)
 
 
-def evaluate_project(
+async def evaluate_project(
     skill_name: str,
     project_title: str,
     project_description: str,
@@ -139,23 +241,20 @@ def evaluate_project(
         evaluation_criteria=evaluation_criteria,
         submission=submission,
     )
-    return _call(prompt, max_tokens=2048)
+    return await _call(prompt, max_tokens=2048)
 
 
-def explain_differently(topic: str, skill_name: str, sections: list) -> str:
+async def explain_differently(topic: str, skill_name: str, sections: list) -> str:
     prompt = format_prompt(
         "explain_differently",
         topic=topic,
         skill_name=skill_name,
         sections_json=json.dumps(sections, indent=2),
     )
-    return _call(prompt, expect_json=False, max_tokens=1024)
+    return await _call(prompt, expect_json=False, max_tokens=1024, cache=True)
 
 
-def generate_review_cards(lesson_content: dict) -> list[dict]:
-    prompt = format_prompt(
-        "review_cards",
-        lesson_json=json.dumps(lesson_content, indent=2),
-    )
-    result = _call(prompt)
+async def generate_review_cards(lesson_content: dict) -> list[dict]:
+    prompt = format_prompt("review_cards")
+    result = await _call(prompt, context=_lesson_context(lesson_content))
     return result.get("cards", result) if isinstance(result, dict) else result
@@ -0,0 +1,24 @@
+"""Token usage counters, including prompt-cache reads and writes."""
+
+_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+_stats = {"requests": 0, **{field: 0 for field in _FIELDS}}
+
+
+def record(usage):
+    """Add a response's `usage` to the running totals."""
+    if usage is None:
+        return
+    _stats["requests"] += 1
+    for field in _FIELDS:
+        value = getattr(usage, field, None)
+        if isinstance(value, int):
+            _stats[field] += value
+
+
+def stats() -> dict:
+    prompt_tokens = _stats["input_tokens"] + _stats["cache_read_input_tokens"] + _stats["cache_creation_input_tokens"]
+    return {
+        **_stats,
+        "cache_read_ratio": round(_stats["cache_read_input_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0,
+    }
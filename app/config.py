@@ -14,7 +14,40 @@ class Settings:
     anthropic_api_key: str = field(default_factory=lambda: os.getenv("ANTHROPIC_API_KEY", ""))
     model: str = "claude-sonnet-4-5-20250929"
     db_path: Path = field(default_factory=lambda: PROJECT_ROOT / "data" / "tutor.db")
+    # Compress large TEXT columns (see database.COMPRESSED_COLUMNS)
+    db_compression: bool = True
+    db_compression_min_chars: int = 1024
+    db_compression_level: int = 6
     prompts_dir: Path = field(default_factory=lambda: PROJECT_ROOT / "prompts")
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_max_entries: int = 5000
+    arxiv_url: str = "https://export.arxiv.org/api/query"
+    arxiv_cache_dir: Path = field(default_factory=lambda: PROJECT_ROOT / "data" / "cache" / "arxiv")
+    arxiv_cache_ttl_seconds: int = 7 * 24 * 3600
+    arxiv_failure_ttl_seconds: int = 15 * 60
+    lesson_timeout_seconds: int = 180
+    resources_timeout_seconds: int = 45
+    resources_grace_seconds: float = 5
+    chat_history_max_messages: int = 40
+    chat_history_token_budget: int = 3000
+    sandbox_workers: int = 2
+    sandbox_queue_limit: int = 8
+    sandbox_queue_wait_seconds: float = 5
+    sandbox_timeout_seconds: int = 10
+    sandbox_memory_mb: int = 256
+    sandbox_max_output_bytes: int = 64 * 1024
+    # Run learner code even where the kernel cannot confine it (no namespaces): it can then
+    # read any file the server can, including .env and the database
+    sandbox_allow_unconfined: bool = False
+    # Write-behind cache for user_progress; one server process per database
+    progress_cache: bool = True
+    progress_flush_seconds: float = 2
+    progress_cache_max_users: int = 10_000
+    job_concurrency: int = 2
+    job_budget_per_user: int = 20
+    job_budget_window_seconds: int = 3600
+    # Chat summaries have their own budget so a long chat cannot starve lesson prefetch
+    chat_summary_budget_per_user: int = 20
     host: str = "0.0.0.0"
     port: int = 8000
 
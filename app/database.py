@@ -1,9 +1,52 @@
 import sqlite3
-from pathlib import Path
+import threading
+import weakref
+import zlib
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 
 from app.config import settings
 
-_connection: sqlite3.Connection | None = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Per-thread connection pool. _generation is bumped by close_db() so threads
+# drop connections that belong to a closed pool.
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+# Reentrant: a thread's old holder can be collected (see _Holder) while it holds the lock
+_pool_lock = threading.RLock()
+_generation = 0
+_initialized = False
+
+# Single writer lane: SQLite allows one writer at a time, so serialize
+# writers in-process instead of letting them spin on SQLITE_BUSY.
+_write_lock = threading.RLock()
+
+# Python functions callable from SQL on every connection (see register_function)
+_sql_functions: dict[str, tuple[int, Callable]] = {}
+
+# Callbacks registered with add_hook(). The transaction hooks run in the thread
+# that owns the outermost transaction(); "open" runs once the schema is ready,
+# with the connection; "close" runs in close_db().
+_hooks: dict[str, list[Callable[..., None]]] = {
+    "before_commit": [], "after_commit": [], "after_rollback": [], "open": [], "close": [],
+}
+
+# Large TEXT columns whose values are written through pack(). Reads decode
+# them transparently (see _row), so callers always see plain strings.
+COMPRESSED_COLUMNS = {
+    "lessons": ("content_json",),
+    "skills": ("cheatsheet",),
+    "skill_project_submissions": ("submission", "feedback_json"),
+}
+# A compressed value is a BLOB of magic + codec byte + payload. Plaintext
+# rows are TEXT, so rows written before compression still read as they are.
+_MAGIC = b"\x00mtz"
+_ZSTD = b"s"
+_ZLIB = b"z"
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS users (
@@ -137,32 +180,264 @@ CREATE TABLE IF NOT EXISTS user_feedback (
 """
 
 
+def pack(text: str | None) -> str | bytes | None:
+    """Encode a value for one of the COMPRESSED_COLUMNS.
+
+    Compresses with zstd if the zstandard package is installed, else zlib.
+    Short values, values that do not shrink, and everything while
+    settings.db_compression is off are stored as plain TEXT.
+    """
+    if text is None or not settings.db_compression or len(text) < settings.db_compression_min_chars:
+        return text
+    raw = text.encode()
+    if zstandard:
+        packed = _MAGIC + _ZSTD + zstandard.ZstdCompressor(level=settings.db_compression_level).compress(raw)
+    else:
+        packed = _MAGIC + _ZLIB + zlib.compress(raw, settings.db_compression_level)
+    return packed if len(packed) < len(raw) else text
+
+
+def unpack(value):
+    """Decode a value written by pack(); anything else is returned unchanged."""
+    if value.__class__ is not bytes or not value.startswith(_MAGIC):
+        return value
+    codec, payload = value[len(_MAGIC):len(_MAGIC) + 1], value[len(_MAGIC) + 1:]
+    if codec == _ZLIB:
+        return zlib.decompress(payload).decode()
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("This database has zstd-compressed rows; install the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(payload).decode()
+    raise ValueError(f"Unknown column compression codec {codec!r}")
+
+
+def _row(cursor: sqlite3.Cursor, values: tuple) -> sqlite3.Row:
+    """Row factory: sqlite3.Row with compressed column values decoded."""
+    for value in values:
+        if value.__class__ is bytes:
+            values = tuple(unpack(v) for v in values)
+            break
+    return sqlite3.Row(cursor, values)
+
+
+def _compress_columns(db: sqlite3.Connection, batch: int = 500):
+    """Migration step: rewrite plaintext COMPRESSED_COLUMNS values in place through pack()."""
+    for table, columns in COMPRESSED_COLUMNS.items():
+        for column in columns:
+            last = 0
+            while True:
+                rows = db.execute(
+                    f"""SELECT rowid, {column} FROM {table}
+                        WHERE rowid > ? AND typeof({column}) = 'text' AND length({column}) >= ?
+                        ORDER BY rowid LIMIT ?""",
+                    (last, settings.db_compression_min_chars, batch),
+                ).fetchall()
+                if not rows:
+                    break
+                db.executemany(
+                    f"UPDATE {table} SET {column} = ? WHERE rowid = ?",
+                    [(pack(value), rowid) for rowid, value in rows],
+                )
+                last = rows[-1][0]
+
+
+def _add_column(table: str, column: str, decl: str):
+    """Migration step that adds a column unless an older runner already did."""
+    def apply(db: sqlite3.Connection):
+        columns = {row["name"] for row in db.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return apply
+
+
+# Versioned migrations: (version, description, steps). Each step is a SQL
+# statement or a callable taking the connection. Append new versions at the
+# end; never edit or renumber a migration that has shipped.
+MIGRATIONS: list[tuple[int, str, list]] = [
+    (1, "Add skills.cheatsheet", [
+        _add_column("skills", "cheatsheet", "TEXT"),
+    ]),
+    (2, "Indexes for hot access paths", [
+        # Review queue: user_id = ? AND next_review_at <= now ORDER BY next_review_at
+        "CREATE INDEX IF NOT EXISTS idx_review_cards_user_due ON review_cards (user_id, next_review_at)",
+        "CREATE INDEX IF NOT EXISTS idx_review_cards_lesson ON review_cards (lesson_id)",
+        # Chat history: user_id = ? AND skill_id = ? ORDER BY created_at
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_user_skill ON chat_messages (user_id, skill_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_lessons_skill_order ON lessons (skill_id, order_index)",
+        "CREATE INDEX IF NOT EXISTS idx_quizzes_lesson ON quizzes (lesson_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_skills_user_active ON skills (user_id, is_active)",
+        # Covering indexes for the date(completed_at) chart aggregates
+        "CREATE INDEX IF NOT EXISTS idx_lesson_attempts_user_completed ON lesson_attempts (user_id, completed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_lesson_attempts_lesson ON lesson_attempts (lesson_id)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_completed ON quiz_attempts (user_id, completed_at, score)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_quiz ON quiz_attempts (user_id, quiz_id)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_attempts_quiz ON quiz_attempts (quiz_id)",
+        "CREATE INDEX IF NOT EXISTS idx_skill_projects_skill ON skill_projects (skill_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_project_submissions_user_project ON skill_project_submissions (user_id, project_id)",
+    ]),
+    (3, "LLM response cache", [
+        """CREATE TABLE IF NOT EXISTS llm_cache (
+               key TEXT PRIMARY KEY,
+               response TEXT NOT NULL,
+               created_at REAL NOT NULL,
+               last_used_at REAL NOT NULL,
+               hits INTEGER NOT NULL DEFAULT 0
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used_at)",
+    ]),
+    (4, "Persisted background jobs", [
+        """CREATE TABLE IF NOT EXISTS jobs (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               kind TEXT NOT NULL,
+               user_id INTEGER NOT NULL REFERENCES users(id),
+               payload_json TEXT NOT NULL DEFAULT '{}',
+               status TEXT NOT NULL DEFAULT 'pending',
+               attempts INTEGER NOT NULL DEFAULT 0,
+               error TEXT,
+               created_at TEXT NOT NULL DEFAULT (datetime('now')),
+               updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)",
+    ]),
+    (5, "Server-side chat history summaries", [
+        # Lesson chat history: user_id = ? AND lesson_id = ? ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_user_lesson ON chat_messages (user_id, lesson_id, created_at)",
+        # Running summary of turns that fell out of the history window, per conversation
+        """CREATE TABLE IF NOT EXISTS chat_summaries (
+               user_id INTEGER NOT NULL REFERENCES users(id),
+               scope TEXT NOT NULL,
+               scope_id INTEGER NOT NULL,
+               summary TEXT NOT NULL,
+               through_message_id INTEGER NOT NULL,
+               updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+               PRIMARY KEY (user_id, scope, scope_id)
+           )""",
+    ]),
+    # Freed pages are reused by later writes; run VACUUM offline to shrink the file
+    (6, "Compress large text columns", [
+        _compress_columns,
+    ]),
+    # Bumped by every progress change; lets the progress cache's journal replay only newer states
+    (7, "Version user_progress rows", [
+        _add_column("user_progress", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ]),
+]
+
+
+def schema_version(db: sqlite3.Connection) -> int:
+    return db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
 def _run_migrations(db: sqlite3.Connection):
-    """Add columns to existing tables without failing if they already exist."""
-    migrations = [
-        "ALTER TABLE skills ADD COLUMN cheatsheet TEXT",
-    ]
-    for sql in migrations:
+    """Apply pending migrations in order, each in its own transaction."""
+    db.execute(
+        """CREATE TABLE IF NOT EXISTS schema_version (
+               version INTEGER PRIMARY KEY,
+               description TEXT NOT NULL,
+               applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+           )"""
+    )
+    db.commit()
+    current = schema_version(db)
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        db.execute("BEGIN IMMEDIATE")
         try:
-            db.execute(sql)
-            db.commit()
-        except sqlite3.OperationalError:
-            pass  # Column already exists — idempotent
+            for step in steps:
+                if callable(step):
+                    step(db)
+                else:
+                    db.execute(step)
+            db.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description),
+            )
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+
+
+def _connect() -> sqlite3.Connection:
+    db = sqlite3.connect(str(settings.db_path), check_same_thread=False, timeout=30)
+    db.row_factory = _row
+    db.execute("PRAGMA journal_mode=WAL;")
+    db.execute("PRAGMA foreign_keys=ON;")
+    for name, (nargs, fn) in _sql_functions.items():
+        db.create_function(name, nargs, fn, deterministic=True)
+    return db
+
+
+def register_function(name: str, nargs: int, fn: Callable):
+    """Make a deterministic Python function callable from SQL on every connection."""
+    with _pool_lock:
+        _sql_functions[name] = (nargs, fn)
+        for db in _connections:
+            db.create_function(name, nargs, fn, deterministic=True)
+
+
+class _Holder:
+    """A thread's connection, kept in _local.
+
+    The thread-local is dropped when its thread ends (the server's
+    threadpool retires idle threads), and the finalizer then closes the
+    connection, so connections do not pile up for threads that are gone.
+    """
+    __slots__ = ("connection", "generation", "__weakref__")
+
+    def __init__(self, connection: sqlite3.Connection, generation: int):
+        self.connection = connection
+        self.generation = generation
+        weakref.finalize(self, _release, connection)
+
+
+def _release(db: sqlite3.Connection):
+    with _pool_lock:
+        if db in _connections:
+            _connections.remove(db)
+            db.close()
 
 
 def get_db() -> sqlite3.Connection:
-    global _connection
-    if _connection is None:
+    """Return the calling thread's connection, opening it on first use.
+
+    Each thread gets its own connection so WAL readers run in parallel and no
+    thread can commit another thread's half-finished writes. Writes are
+    funnelled through a single writer lane (see execute()). The connection is
+    closed when the thread ends.
+    """
+    global _initialized
+    holder = getattr(_local, "holder", None)
+    if holder is not None and holder.generation == _generation:
+        return holder.connection
+
+    with _pool_lock:
         settings.db_path.parent.mkdir(parents=True, exist_ok=True)
-        _connection = sqlite3.connect(str(settings.db_path), check_same_thread=False)
-        _connection.row_factory = sqlite3.Row
-        _connection.execute("PRAGMA journal_mode=WAL;")
-        _connection.execute("PRAGMA foreign_keys=ON;")
-        _connection.executescript(SCHEMA)
-        _connection.commit()
-        _run_migrations(_connection)
-        _ensure_default_user(_connection)
-    return _connection
+        db = _connect()
+        if not _initialized:
+            with _write_lock:
+                db.executescript(SCHEMA)
+                db.commit()
+                _run_migrations(db)
+                _ensure_default_user(db)
+                _run_hooks("open", db)
+            _initialized = True
+        _connections.append(db)
+        _local.holder = _Holder(db, _generation)
+    return db
+
+
+def close_db():
+    """Close every pooled connection; the next get_db() reopens settings.db_path."""
+    global _generation, _initialized
+    _run_hooks("close")
+    with _pool_lock:
+        for db in _connections:
+            db.close()
+        _connections.clear()
+        _generation += 1
+        _initialized = False
 
 
 def _ensure_default_user(db: sqlite3.Connection):
@@ -182,10 +457,91 @@ def query_one(sql: str, params: tuple = ()) -> sqlite3.Row | None:
 
 
 def execute(sql: str, params: tuple = ()) -> int:
-    cur = get_db().execute(sql, params)
-    get_db().commit()
+    db = get_db()
+    with _write_lock:
+        cur = db.execute(sql, params)
+        if not in_transaction():
+            db.commit()
     return cur.lastrowid
 
 
+def execute_returning(sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+    """Run a write with a RETURNING clause and return the rows it produced."""
+    db = get_db()
+    with _write_lock:
+        rows = db.execute(sql, params).fetchall()
+        if not in_transaction():
+            db.commit()
+    return rows
+
+
+def executemany(sql: str, seq_of_params) -> int:
+    db = get_db()
+    with _write_lock:
+        cur = db.executemany(sql, seq_of_params)
+        if not in_transaction():
+            db.commit()
+    return cur.rowcount
+
+
+def in_transaction() -> bool:
+    return getattr(_local, "tx_depth", 0) > 0
+
+
+def add_hook(event: str, fn: Callable[..., None]):
+    """Register a callback for "before_commit", "after_commit", "after_rollback", "open" or "close".
+
+    before_commit runs inside the outermost transaction just before COMMIT,
+    so its writes join the transaction and an exception rolls it all back.
+    open is called with the new connection, before anything else uses it.
+    """
+    _hooks[event].append(fn)
+
+
+def _run_hooks(event: str, *args):
+    for fn in _hooks[event]:
+        fn(*args)
+
+
+@contextmanager
+def write_lane() -> Iterator[None]:
+    """Hold the single writer lane without opening a transaction."""
+    with _write_lock:
+        yield
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Run a multi-statement flow as one unit of work with a single commit.
+
+    execute() calls inside the block join the transaction instead of
+    committing, and nested blocks join the outermost one. An exception
+    rolls the whole flow back. The writer lane is held for the duration,
+    so never await (e.g. an LLM call) inside the block.
+    """
+    db = get_db()
+    with _write_lock:
+        depth = getattr(_local, "tx_depth", 0)
+        if depth == 0:
+            db.execute("BEGIN IMMEDIATE")
+        _local.tx_depth = depth + 1
+        try:
+            yield db
+            if depth == 0:
+                _run_hooks("before_commit")
+        except BaseException:
+            _local.tx_depth = depth
+            if depth == 0:
+                db.rollback()
+                _run_hooks("after_rollback")
+            raise
+        _local.tx_depth = depth
+        if depth == 0:
+            db.commit()
+            _run_hooks("after_commit")
+
+
 def executescript(sql: str):
-    get_db().executescript(sql)
+    db = get_db()
+    with _write_lock:
+        db.executescript(sql)
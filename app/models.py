@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Annotated
+
 from pydantic import BaseModel, Field
 
 
@@ -25,6 +28,12 @@ class QuizGradeRequest(BaseModel):
     answer: str = Field(..., min_length=1, max_length=2000)
 
 
+class QuizGradeBatchRequest(BaseModel):
+    quiz_id: int
+    # Question index -> the learner's answer
+    answers: dict[int, Annotated[str, Field(max_length=2000)]] = Field(..., max_length=50)
+
+
 class QuizSubmitRequest(BaseModel):
     quiz_id: int
     answers: dict
@@ -35,6 +44,7 @@ class ChatRequest(BaseModel):
     skill_id: int | None = None
     lesson_id: int | None = None
     message: str = Field(..., min_length=1, max_length=5000)
+    # Ignored: history is loaded server-side. Accepted so older clients still validate.
     history: list[dict] = []
 
 
@@ -48,6 +58,16 @@ class ReviewRateRequest(BaseModel):
     quality: int = Field(..., ge=0, le=5)
 
 
+class ReviewRating(BaseModel):
+    card_id: int
+    quality: int = Field(..., ge=0, le=5)
+    reviewed_at: datetime | None = None
+
+
+class ReviewBatchRequest(BaseModel):
+    ratings: list[ReviewRating] = Field(..., min_length=1, max_length=500)
+
+
 class ProjectSubmitRequest(BaseModel):
     project_id: int
     submission: str = Field(..., min_length=1, max_length=20000)
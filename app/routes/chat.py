@@ -1,15 +1,16 @@
-import json
-
 from fastapi import APIRouter
+from app import serialization
 from app.models import ChatRequest
 from app.ai import tutor
-from app.database import query, query_one, execute
+from app.database import query_one
+from app.services import chat_service
+from app.sse import event_stream, format_event
 
 router = APIRouter(prefix="/api")
 
 
-@router.post("/chat")
-def chat(req: ChatRequest):
+def _build_context(req: ChatRequest) -> tuple[str, int | None]:
+    """Return the tutor's skill/lesson context and the lesson_id to persist (if it exists)."""
     skill_context = ""
     if req.skill_id:
         skill = query_one("SELECT * FROM skills WHERE id = ?", (req.skill_id,))
@@ -22,7 +23,7 @@ def chat(req: ChatRequest):
         if lesson:
             valid_lesson_id = req.lesson_id
         if lesson and lesson["content_json"]:
-            content = json.loads(lesson["content_json"]) if isinstance(lesson["content_json"], str) else lesson["content_json"]
+            content = serialization.loads(lesson["content_json"])
             parts = []
             if content.get("topic"):
                 parts.append(f"Current lesson topic: {content['topic']}")
@@ -41,30 +42,61 @@ def chat(req: ChatRequest):
             if parts:
                 skill_context += "\n\n" + "\n".join(parts)
 
-    # Build messages for Claude
-    messages = [{"role": m["role"], "content": m["content"]} for m in req.history]
-    messages.append({"role": "user", "content": req.message})
+    return skill_context, valid_lesson_id
+
+
+def _build_conversation(req: ChatRequest, skill_context: str, lesson_id: int | None) -> tuple[list[dict], str]:
+    """Server-side history plus the new message, and the context extended with the history summary.
 
-    response = tutor.chat(messages, skill_context)
+    req.history is ignored: the client's copy of the conversation is not trusted.
+    """
+    history = chat_service.load_history(1, req.skill_id, lesson_id)
+    if history["summary"]:
+        skill_context += f"\n\nSummary of your earlier conversation with the learner:\n{history['summary']}"
+    messages = history["messages"] + [{"role": "user", "content": req.message}]
+    return messages, skill_context
 
-    # Save messages
-    if req.skill_id or valid_lesson_id:
-        execute(
-            "INSERT INTO chat_messages (user_id, skill_id, lesson_id, role, content) VALUES (?, ?, ?, 'user', ?)",
-            (1, req.skill_id, valid_lesson_id, req.message),
-        )
-        execute(
-            "INSERT INTO chat_messages (user_id, skill_id, lesson_id, role, content) VALUES (?, ?, ?, 'assistant', ?)",
-            (1, req.skill_id, valid_lesson_id, response),
-        )
+
+def _save_exchange(req: ChatRequest, lesson_id: int | None, response: str):
+    chat_service.save_exchange(1, req.skill_id, lesson_id, req.message, response)
+
+
+@router.post("/chat")
+async def chat(req: ChatRequest):
+    skill_context, valid_lesson_id = _build_context(req)
+    messages, skill_context = _build_conversation(req, skill_context, valid_lesson_id)
+
+    response = await tutor.chat(messages, skill_context)
+
+    _save_exchange(req, valid_lesson_id, response)
 
     return {"response": response}
 
 
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Same as /chat, but forwards the reply as SSE `delta` frames followed by `done`."""
+    skill_context, valid_lesson_id = _build_context(req)
+    messages, skill_context = _build_conversation(req, skill_context, valid_lesson_id)
+
+    async def events():
+        parts = []
+        try:
+            async for text in tutor.chat_stream(messages, skill_context):
+                parts.append(text)
+                yield format_event({"text": text}, event="delta")
+        except Exception as e:
+            yield format_event({"detail": f"Chat failed: {e}"}, event="error")
+            return
+
+        response = "".join(parts).strip()
+        # Persist only complete exchanges, once the stream has finished
+        _save_exchange(req, valid_lesson_id, response)
+        yield format_event({"response": response}, event="done")
+
+    return event_stream(events())
+
+
 @router.get("/chat/{skill_id}/history")
-def get_chat_history(skill_id: int):
-    rows = query(
-        "SELECT role, content FROM chat_messages WHERE user_id = 1 AND skill_id = ? ORDER BY created_at",
-        (skill_id,),
-    )
-    return {"messages": [dict(r) for r in rows]}
+def get_chat_history(skill_id: int, lesson_id: int | None = None):
+    return {"messages": chat_service.get_history(1, skill_id, lesson_id)}
@@ -1,13 +1,13 @@
-import subprocess
-import sys
-import tempfile
-
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
 from app.ai.tutor import evaluate_exercise
+from app.config import settings
+from app.database import transaction
 from app.models import ExerciseEvaluateRequest
-from app.services.gamification import add_xp, update_streak, check_achievements, XP_EXERCISE_COMPLETE
+from app.services import sandbox
+from app.sse import event_stream, format_event
+from app.services.gamification import apply_progress, check_achievements, XP_EXERCISE_COMPLETE
 
 router = APIRouter(prefix="/api/exercises", tags=["exercises"])
 
@@ -18,38 +18,87 @@ class RunCodeRequest(BaseModel):
     code: str = Field(..., min_length=1, max_length=50000)
 
 
+def _start_run(code: str):
+    try:
+        return sandbox.pool.stream(code)
+    except sandbox.SandboxBusy:
+        raise HTTPException(status_code=503, detail="Too many code runs in progress, try again shortly",
+                            headers={"Retry-After": "1"})
+
+
+def _limit_notice(timed_out: bool, truncated: bool) -> str | None:
+    if timed_out:
+        return f"Error: Code execution timed out ({settings.sandbox_timeout_seconds} second limit)"
+    if truncated:
+        return f"Error: Output limit reached ({settings.sandbox_max_output_bytes // 1024} KB), execution stopped"
+    return None
+
+
 @router.post("/run")
 def run_code(req: RunCodeRequest):
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=True) as f:
-        f.write(req.code)
-        f.flush()
+    events = _start_run(req.code)
+    output = {"stdout": "", "stderr": ""}
+    try:
+        for event in events:
+            if event["event"] == "output":
+                output[event["stream"]] += event["data"]
+            else:
+                notice = _limit_notice(event["timed_out"], event["truncated"])
+    except sandbox.SandboxUnavailable as e:
+        return {"output": f"Error: {e}"}
+    except sandbox.SandboxError:
+        return {"output": "Error: Code execution failed, please try again"}
+
+    text = output["stdout"]
+    for extra in (output["stderr"], notice):
+        if extra:
+            text += ("\n" if text else "") + extra
+    return {"output": text or "(No output)"}
+
+
+@router.post("/run/stream")
+def run_code_stream(req: RunCodeRequest):
+    """Same as /run, but forwards stdout/stderr as SSE `output` frames while the code runs.
+
+    Ends with a `done` frame carrying the exit code and whether the run was
+    stopped for exceeding the time or output limit.
+    """
+    events = _start_run(req.code)
+
+    def frames():
         try:
-            result = subprocess.run(
-                [sys.executable, f.name],
-                capture_output=True,
-                text=True,
-                timeout=10,
-            )
-            output = result.stdout
-            if result.stderr:
-                output += ("\n" if output else "") + result.stderr
-            return {"output": output or "(No output)"}
-        except subprocess.TimeoutExpired:
-            return {"output": "Error: Code execution timed out (10 second limit)"}
+            for event in events:
+                if event["event"] == "output":
+                    yield format_event({"stream": event["stream"], "text": event["data"]}, event="output")
+                else:
+                    yield format_event({
+                        "exit_code": event["code"],
+                        "timed_out": event["timed_out"],
+                        "truncated": event["truncated"],
+                        "notice": _limit_notice(event["timed_out"], event["truncated"]),
+                    }, event="done")
+        except sandbox.SandboxUnavailable as e:
+            yield format_event({"detail": str(e)}, event="error")
+        except sandbox.SandboxError:
+            yield format_event({"detail": "Code execution failed, please try again"}, event="error")
+        finally:
+            # Stops the run if the client went away mid-stream
+            events.close()
+
+    return event_stream(frames())
 
 
 @router.post("/evaluate")
-def evaluate(req: ExerciseEvaluateRequest):
-    result = evaluate_exercise(req.exercise, req.submission, req.output)
+async def evaluate(req: ExerciseEvaluateRequest):
+    result = await evaluate_exercise(req.exercise, req.submission, req.output)
 
     xp_earned = 0
     new_achievements = []
 
     if result.get("correct"):
-        xp_result = add_xp(USER_ID, XP_EXERCISE_COMPLETE)
-        xp_earned = xp_result["xp_added"]
-        update_streak(USER_ID)
-        new_achievements = check_achievements(USER_ID)
+        with transaction():
+            xp_earned = apply_progress(USER_ID, XP_EXERCISE_COMPLETE, streak=True)["xp_added"]
+            new_achievements = check_achievements(USER_ID)
 
     return {
         "correct": result.get("correct", False),
@@ -1,22 +1,35 @@
-import json
-
 from fastapi import APIRouter, HTTPException
+from app import serialization
 from app.models import LessonGenerateRequest, FeedbackSubmitRequest
 from app.database import execute, query_one
 from app.services import lesson_service, quiz_service
 from app.ai import tutor
+from app.sse import event_stream, format_event
 
 router = APIRouter(prefix="/api")
 
 
 @router.post("/lessons/generate")
-def generate_lesson(req: LessonGenerateRequest):
+async def generate_lesson(req: LessonGenerateRequest):
     try:
-        return lesson_service.generate_lesson(req.skill_id, req.lesson_id)
+        return await lesson_service.generate_lesson(req.skill_id, req.lesson_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate lesson: {e}")
 
 
+@router.post("/lessons/generate/stream")
+async def stream_lesson(req: LessonGenerateRequest):
+    """Generate a lesson as SSE: `item`/`field` frames while it is written, then `done`."""
+    async def events():
+        try:
+            async for event, data in lesson_service.stream_lesson(req.skill_id, req.lesson_id):
+                yield format_event(data, event=event)
+        except Exception as e:
+            yield format_event({"detail": f"Failed to generate lesson: {e}"}, event="error")
+
+    return event_stream(events())
+
+
 @router.get("/lessons/{lesson_id}")
 def get_lesson(lesson_id: int):
     lesson = lesson_service.get_lesson(lesson_id)
@@ -26,18 +39,18 @@ def get_lesson(lesson_id: int):
 
 
 @router.post("/lessons/{lesson_id}/complete")
-def complete_lesson(lesson_id: int):
+async def complete_lesson(lesson_id: int):
     lesson = lesson_service.get_lesson(lesson_id)
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    lesson_service.complete_lesson(1, lesson_id)
+    await lesson_service.complete_lesson(1, lesson_id)
     return {"status": "completed"}
 
 
 @router.post("/lessons/{lesson_id}/quiz")
-def generate_quiz(lesson_id: int):
+async def generate_quiz(lesson_id: int):
     try:
-        return quiz_service.generate_quiz(lesson_id)
+        return await quiz_service.get_or_generate_quiz(lesson_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {e}")
 
@@ -55,23 +68,23 @@ def submit_feedback(lesson_id: int, req: FeedbackSubmitRequest):
     execute(
         """INSERT INTO user_feedback (user_id, content_type, content_id, tags_json, message)
            VALUES (?, 'lesson', ?, ?, ?)""",
-        (1, lesson_id, json.dumps(req.tags), req.message),
+        (1, lesson_id, serialization.dumps(req.tags), req.message),
     )
     return {"status": "submitted"}
 
 
 @router.post("/lessons/{lesson_id}/explain")
-def explain_lesson(lesson_id: int):
+async def explain_lesson(lesson_id: int):
     lesson = lesson_service.get_lesson(lesson_id)
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    content = json.loads(lesson.get("content_json") or "{}")
+    content = lesson["content"] or {}
     sections = content.get("sections", [])
     topic = lesson.get("topic", "")
     skill = query_one("SELECT name FROM skills WHERE id = ?", (lesson.get("skill_id"),))
     skill_name = skill["name"] if skill else ""
     try:
-        markdown = tutor.explain_differently(topic, skill_name, sections)
+        markdown = await tutor.explain_differently(topic, skill_name, sections)
         return {"markdown": markdown}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate explanation: {e}")
@@ -87,4 +100,4 @@ def get_lesson_feedback(lesson_id: int):
     )
     if not row:
         return {"submitted": False}
-    return {"submitted": True, "tags": json.loads(row["tags_json"]), "message": row["message"]}
+    return {"submitted": True, "tags": serialization.loads(row["tags_json"]), "message": row["message"]}
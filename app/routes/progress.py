@@ -2,7 +2,8 @@ import json
 from datetime import datetime
 from fastapi import APIRouter
 from fastapi.responses import Response
-from app.database import query, query_one
+from app.database import query
+from app.services import gamification
 from app.services.gamification import ACHIEVEMENTS
 
 router = APIRouter(prefix="/api")
@@ -10,8 +11,7 @@ router = APIRouter(prefix="/api")
 
 @router.get("/progress")
 def get_progress():
-    row = query_one("SELECT * FROM user_progress WHERE user_id = 1")
-    return dict(row) if row else {}
+    return gamification.get_progress(1) or {}
 
 
 @router.get("/achievements")
@@ -90,7 +90,7 @@ def get_chart_data():
 
 @router.get("/progress/export")
 def export_progress():
-    progress = query_one("SELECT * FROM user_progress WHERE user_id = 1")
+    progress = gamification.get_progress(1)
     skills = query(
         """SELECT s.name, s.description, s.created_at,
            (SELECT COUNT(*) FROM lessons WHERE skill_id = s.id) as total_lessons,
@@ -101,7 +101,7 @@ def export_progress():
 
     export_data = {
         "exported_at": datetime.now().isoformat(),
-        "progress": dict(progress) if progress else {},
+        "progress": progress or {},
         "skills": [dict(s) for s in skills],
         "achievements": [dict(a) for a in unlocked],
     }
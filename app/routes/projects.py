@@ -8,9 +8,9 @@ USER_ID = 1
 
 
 @router.get("/skills/{skill_id}/project")
-def get_project(skill_id: int):
+async def get_project(skill_id: int):
     try:
-        return project_service.get_or_generate_project(skill_id)
+        return await project_service.get_or_generate_project(skill_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -18,9 +18,9 @@ def get_project(skill_id: int):
 
 
 @router.post("/projects/{project_id}/submit")
-def submit_project(project_id: int, req: ProjectSubmitRequest):
+async def submit_project(project_id: int, req: ProjectSubmitRequest):
     try:
-        return project_service.submit_project(USER_ID, project_id, req.submission)
+        return await project_service.submit_project(USER_ID, project_id, req.submission)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
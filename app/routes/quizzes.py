@@ -1,13 +1,24 @@
-from fastapi import APIRouter
-from app.models import QuizGradeRequest, QuizSubmitRequest
+from fastapi import APIRouter, HTTPException
+from app.models import QuizGradeBatchRequest, QuizGradeRequest, QuizSubmitRequest
 from app.services import quiz_service
 
 router = APIRouter(prefix="/api")
 
 
 @router.post("/quizzes/grade")
-def grade_answer(req: QuizGradeRequest):
-    return quiz_service.grade_answer(req.question, req.answer)
+async def grade_answer(req: QuizGradeRequest):
+    return await quiz_service.grade_answer(req.question, req.answer)
+
+
+@router.post("/quizzes/grade-batch")
+async def grade_quiz(req: QuizGradeBatchRequest):
+    """Grade all of a quiz's answers (free-text ones in one tutor call) and record the attempt."""
+    try:
+        return await quiz_service.grade_quiz(1, req.quiz_id, req.answers)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to grade quiz: {e}")
 
 
 @router.post("/quizzes/submit")
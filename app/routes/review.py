@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.models import ReviewRateRequest
+from app.models import ReviewBatchRequest, ReviewRateRequest
 from app.services import review_service
 
 router = APIRouter(prefix="/api")
@@ -14,3 +14,8 @@ def get_review_queue():
 @router.post("/review/{card_id}/rate")
 def rate_card(card_id: int, req: ReviewRateRequest):
     return review_service.rate_card(1, card_id, req.quality)
+
+
+@router.post("/review/batch")
+def rate_cards(req: ReviewBatchRequest):
+    return review_service.rate_cards(1, [r.model_dump() for r in req.ratings])
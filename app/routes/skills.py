@@ -6,9 +6,9 @@ router = APIRouter(prefix="/api")
 
 
 @router.post("/skills/preview")
-def preview_skill(req: SkillPreviewRequest):
+async def preview_skill(req: SkillPreviewRequest):
     try:
-        return skill_service.preview_curriculum(req.name)
+        return await skill_service.preview_curriculum(req.name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate curriculum: {e}")
 
@@ -38,9 +38,9 @@ def delete_skill(skill_id: int):
 
 
 @router.get("/skills/{skill_id}/cheatsheet")
-def get_cheat_sheet(skill_id: int):
+async def get_cheat_sheet(skill_id: int):
     try:
-        content = skill_service.get_or_generate_cheat_sheet(skill_id)
+        content = await skill_service.get_or_generate_cheat_sheet(skill_id)
         return {"content": content}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -49,9 +49,9 @@ def get_cheat_sheet(skill_id: int):
 
 
 @router.post("/skills/{skill_id}/cheatsheet/regenerate")
-def regenerate_cheat_sheet(skill_id: int):
+async def regenerate_cheat_sheet(skill_id: int):
     try:
-        content = skill_service.get_or_generate_cheat_sheet(skill_id, force=True)
+        content = await skill_service.get_or_generate_cheat_sheet(skill_id, force=True)
         return {"content": content}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -0,0 +1,53 @@
+"""JSON encoding for stored columns and API responses.
+
+Uses orjson when it is installed and the standard library otherwise. Both
+write compact JSON without whitespace and read anything the other wrote,
+including rows stored before this module existed.
+"""
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse as _StarletteJSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+if orjson:
+    # Quiz answers are keyed by question index, so int keys must be allowed
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_OPTIONS)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=_OPTIONS).decode()
+
+    def loads(data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+else:
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return dumps(obj).encode()
+
+    def loads(data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+def loads_or(data: str | bytes | None, default: Any = None) -> Any:
+    """Decode a nullable column, returning `default` for NULL or empty values."""
+    return loads(data) if data else default
+
+
+class JSONResponse(_StarletteJSONResponse):
+    """Response class that renders with the active backend."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -4,10 +4,18 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
-from app.database import get_db
+from app.ai import cache as llm_cache
+from app.ai import usage as llm_usage
+from app.database import get_db, close_db
+from app.serialization import JSONResponse
+from app.services import grader
+from app.services.jobs import jobs
+from app.services.progress_cache import progress_cache
+from app.services.resources import close_http_client
+from app.services.sandbox import pool as sandbox_pool
 from app.routes import skills, lessons, quizzes, chat, review, progress, exercises, projects
 
-app = FastAPI(title="MicroTutor", version="0.1.0")
+app = FastAPI(title="MicroTutor", version="0.1.0", default_response_class=JSONResponse)
 
 STATIC_DIR = Path(__file__).parent.parent / "static"
 
@@ -23,8 +31,22 @@ app.include_router(projects.router)
 
 
 @app.on_event("startup")
-def startup():
+async def startup():
     get_db()
+    # Pick up persisted jobs (e.g. review cards) interrupted by a restart
+    jobs.resume()
+    sandbox_pool.start()
+    progress_cache.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await jobs.shutdown()
+    await close_http_client()
+    sandbox_pool.close()
+    # Write back progress still held in memory before the database closes
+    progress_cache.close()
+    close_db()
 
 
 @app.get("/api/health")
@@ -32,6 +54,18 @@ def health():
     return {"status": "ok", "version": "0.1.0"}
 
 
+@app.get("/api/metrics")
+def metrics():
+    return {
+        "llm_cache": llm_cache.stats(),
+        "llm_usage": llm_usage.stats(),
+        "grader": grader.stats,
+        "jobs": {**jobs.stats, "pending": jobs.pending()},
+        "sandbox": {**sandbox_pool.stats, "idle_workers": sandbox_pool.available()},
+        "progress_cache": progress_cache.metrics(),
+    }
+
+
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 
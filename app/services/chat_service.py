@@ -0,0 +1,150 @@
+"""Server-side chat history: recent turns within a token budget plus a running summary.
+
+A chat about a lesson is its own conversation; otherwise a skill's chat is.
+Turns that fall out of the history window are folded into a summary by a
+background job and stored in chat_summaries, so the tutor keeps the gist
+of a long conversation without resending all of it. The job waits until a
+batch of turns has fallen out, so a long chat does not cost an extra LLM
+call on every exchange.
+"""
+from app.ai import tutor
+from app.config import settings
+from app.database import execute, query, query_one, transaction
+from app.services.jobs import jobs
+
+_SCOPE_COLUMNS = {"lesson": "lesson_id", "skill": "skill_id"}
+
+# Messages folded into the summary per job; a long backlog catches up over several turns
+SUMMARY_BATCH = 60
+# Unsummarized messages before the window that it takes to queue a job
+SUMMARY_MIN_BACKLOG = SUMMARY_BATCH // 2
+
+
+def _scope(skill_id: int | None, lesson_id: int | None) -> tuple[str, int] | None:
+    if lesson_id:
+        return "lesson", lesson_id
+    if skill_id:
+        return "skill", skill_id
+    return None
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token, plus per-message overhead
+    return len(text) // 4 + 4
+
+
+def _summary(user_id: int, scope: str, scope_id: int):
+    return query_one(
+        "SELECT summary, through_message_id FROM chat_summaries WHERE user_id = ? AND scope = ? AND scope_id = ?",
+        (user_id, scope, scope_id),
+    )
+
+
+def load_history(user_id: int, skill_id: int | None, lesson_id: int | None) -> dict:
+    """Return {"messages": recent turns oldest first, "summary": gist of older turns}.
+
+    The newest turns are kept up to chat_history_max_messages and
+    chat_history_token_budget. If older turns have not been summarized yet,
+    and enough of them have built up, a background job is queued to fold
+    them in.
+    """
+    scope = _scope(skill_id, lesson_id)
+    if scope is None:
+        return {"messages": [], "summary": ""}
+    kind, scope_id = scope
+
+    rows = query(
+        f"""SELECT id, role, content FROM chat_messages
+            WHERE user_id = ? AND {_SCOPE_COLUMNS[kind]} = ?
+            ORDER BY created_at DESC, id DESC LIMIT ?""",
+        (user_id, scope_id, settings.chat_history_max_messages),
+    )
+    window = []
+    budget = settings.chat_history_token_budget
+    for row in rows:
+        budget -= estimate_tokens(row["content"])
+        if budget < 0:
+            break
+        window.append(row)
+    window.reverse()
+    # The model expects the conversation to open with a learner turn
+    while window and window[0]["role"] != "user":
+        window.pop(0)
+
+    summary = _summary(user_id, kind, scope_id)
+    if rows:
+        first_kept = window[0]["id"] if window else rows[0]["id"] + 1
+        _schedule_summary(user_id, kind, scope_id, summary["through_message_id"] if summary else 0, first_kept)
+
+    return {
+        "messages": [{"role": r["role"], "content": r["content"]} for r in window],
+        "summary": summary["summary"] if summary else "",
+    }
+
+
+def _schedule_summary(user_id: int, scope: str, scope_id: int, through: int, first_kept: int):
+    """Queue a summary update once SUMMARY_MIN_BACKLOG messages before the window are unsummarized."""
+    if first_kept - 1 - through < SUMMARY_MIN_BACKLOG:
+        return
+    pending = query_one(
+        f"""SELECT COUNT(*) AS n FROM (
+                SELECT 1 FROM chat_messages
+                WHERE user_id = ? AND {_SCOPE_COLUMNS[scope]} = ? AND id > ? AND id < ? LIMIT ?)""",
+        (user_id, scope_id, through, first_kept, SUMMARY_MIN_BACKLOG),
+    )["n"]
+    if pending >= SUMMARY_MIN_BACKLOG:
+        jobs.submit(user_id, ("chat_summary", scope, scope_id),
+                    lambda: update_summary(user_id, scope, scope_id, first_kept), budget="chat_summary")
+
+
+async def update_summary(user_id: int, scope: str, scope_id: int, before_id: int):
+    """Fold unsummarized messages older than before_id into the conversation's summary."""
+    current = _summary(user_id, scope, scope_id)
+    rows = query(
+        f"""SELECT id, role, content FROM chat_messages
+            WHERE user_id = ? AND {_SCOPE_COLUMNS[scope]} = ? AND id > ? AND id < ?
+            ORDER BY id LIMIT ?""",
+        (user_id, scope_id, current["through_message_id"] if current else 0, before_id, SUMMARY_BATCH),
+    )
+    if not rows:
+        return
+
+    summary = await tutor.summarize_chat(current["summary"] if current else "", [dict(r) for r in rows])
+    execute(
+        """INSERT INTO chat_summaries (user_id, scope, scope_id, summary, through_message_id)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT (user_id, scope, scope_id) DO UPDATE SET
+               summary = excluded.summary,
+               through_message_id = excluded.through_message_id,
+               updated_at = datetime('now')""",
+        (user_id, scope, scope_id, summary.strip(), rows[-1]["id"]),
+    )
+
+
+def save_exchange(user_id: int, skill_id: int | None, lesson_id: int | None, message: str, response: str):
+    if not (skill_id or lesson_id):
+        return
+    with transaction():
+        execute(
+            "INSERT INTO chat_messages (user_id, skill_id, lesson_id, role, content) VALUES (?, ?, ?, 'user', ?)",
+            (user_id, skill_id, lesson_id, message),
+        )
+        execute(
+            "INSERT INTO chat_messages (user_id, skill_id, lesson_id, role, content) VALUES (?, ?, ?, 'assistant', ?)",
+            (user_id, skill_id, lesson_id, response),
+        )
+
+
+def get_history(user_id: int, skill_id: int, lesson_id: int | None = None) -> list[dict]:
+    """Every stored message of a conversation, for display."""
+    if lesson_id:
+        rows = query(
+            "SELECT role, content FROM chat_messages WHERE user_id = ? AND lesson_id = ? ORDER BY created_at, id",
+            (user_id, lesson_id),
+        )
+    else:
+        rows = query(
+            "SELECT role, content FROM chat_messages WHERE user_id = ? AND skill_id = ? ORDER BY created_at, id",
+            (user_id, skill_id),
+        )
+    return [dict(r) for r in rows]
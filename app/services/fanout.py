@@ -0,0 +1,87 @@
+"""Run independent LLM/HTTP steps concurrently, each under its own timeout."""
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+# Steps handed off with FanOut.detach(); referenced here so they are not
+# garbage collected while they finish in the background
+_detached: set[asyncio.Task] = set()
+
+
+async def _run(fn: Callable[[], Awaitable[Any]], timeout: float | None) -> Any:
+    return await asyncio.wait_for(fn(), timeout)
+
+
+class FanOut:
+    """Start independent steps together and collect their results by name.
+
+    Used as an async context manager: steps that were neither awaited nor
+    detached are cancelled on exit, and everything is cancelled if the body
+    raises. Latency is that of the slowest step actually awaited.
+
+        async with FanOut() as steps:
+            steps.start("lesson", lambda: tutor.generate_lesson(...), timeout=120)
+            steps.start("resources", lambda: ..., timeout=30)
+            lesson = await steps.result("lesson")
+            resources = await steps.optional("resources", wait=5)
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "FanOut":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for task in self._tasks.values():
+            if task not in _detached:
+                task.cancel()
+
+    def start(self, name: str, fn: Callable[[], Awaitable[Any]], timeout: float | None = None):
+        self._tasks[name] = asyncio.ensure_future(_run(fn, timeout))
+
+    def running(self, name: str) -> bool:
+        return not self._tasks[name].done()
+
+    async def result(self, name: str) -> Any:
+        """Wait for a required step; its failure or timeout propagates."""
+        return await self._tasks[name]
+
+    async def optional(self, name: str, default: Any = None, wait: float | None = None) -> Any:
+        """Wait up to `wait` seconds for a step, returning `default` if it is not ready.
+
+        A step that failed or hit its own timeout also yields `default`. One
+        that is merely still running is left alone, so it can be detached.
+        """
+        task = self._tasks[name]
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), wait)
+        except asyncio.TimeoutError:
+            if task.done():
+                print(f"Step '{name}' timed out")
+            return default
+        except Exception as e:
+            print(f"Step '{name}' failed: {e}")
+            return default
+
+    def detach(self, name: str, on_result: Callable[[Any], None]):
+        """Let a running step finish after the fan-out exits, then call on_result(result).
+
+        The step's own timeout still applies; if it fails, the result is dropped.
+        """
+        task = self._tasks[name]
+        _detached.add(task)
+
+        def finished(task: asyncio.Task):
+            _detached.discard(task)
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                print(f"Step '{name}' failed after detaching: {task.exception()!r}")
+                return
+            try:
+                on_result(task.result())
+            except Exception as e:
+                print(f"Failed to apply late result of step '{name}': {e}")
+
+        task.add_done_callback(finished)
@@ -1,7 +1,10 @@
 import math
-from datetime import date
+from bisect import bisect_right
+from datetime import date, timedelta
 
-from app.database import query_one, execute
+from app.config import settings
+from app.database import execute_returning, executemany, query, query_one, register_function
+from app.services.progress_cache import progress_cache
 
 # XP rewards
 XP_LESSON_COMPLETE = 50
@@ -27,87 +30,179 @@ ACHIEVEMENTS = {
     "multi_skill": ("Renaissance Learner", "Start learning 3 skills"),
 }
 
+# Achievement rules: key -> (fact, minimum). A rule is met once the fact
+# reaches the minimum. Facts are the user_progress columns, active_skills,
+# and event facts passed to check_achievements() (e.g. quiz_score).
+ACHIEVEMENT_RULES = {
+    "first_lesson": ("lessons_completed", 1),
+    "first_quiz": ("quizzes_completed", 1),
+    "perfect_score": ("quiz_score", 1.0),
+    "streak_3": ("current_streak", 3),
+    "streak_7": ("current_streak", 7),
+    "streak_30": ("current_streak", 30),
+    "lessons_10": ("lessons_completed", 10),
+    "lessons_50": ("lessons_completed", 50),
+    "xp_1000": ("total_xp", 1000),
+    "first_review": ("reviews_completed", 1),
+    "multi_skill": ("active_skills", 3),
+}
+
 
 def xp_for_level(level: int) -> int:
-    return round(100 * math.pow(level, 1.5))
+    """Total XP at which `level` is reached (level 1 is where everyone starts)."""
+    return 0 if level <= 1 else round(100 * math.pow(level, 1.5))
+
+
+# LEVEL_XP[n] is the total XP at which level n + 1 starts, so a bisect over it
+# finds the level without walking the curve
+MAX_TABLE_LEVEL = 10_000
+LEVEL_XP = [xp_for_level(level) for level in range(1, MAX_TABLE_LEVEL + 1)]
 
 
 def level_from_xp(total_xp: int) -> int:
-    level = 1
+    if total_xp < LEVEL_XP[-1]:
+        return max(1, bisect_right(LEVEL_XP, total_xp))
+    # Past the table: invert 100 * level**1.5, then correct for rounding
+    level = int((total_xp / 100) ** (2 / 3))
     while xp_for_level(level + 1) <= total_xp:
         level += 1
+    while level > 1 and xp_for_level(level) > total_xp:
+        level -= 1
     return level
 
 
-def add_xp(user_id: int, xp: int) -> dict:
-    progress = query_one("SELECT * FROM user_progress WHERE user_id = ?", (user_id,))
-    new_xp = (progress["total_xp"] or 0) + xp
-    new_level = level_from_xp(new_xp)
-
-    execute(
-        "UPDATE user_progress SET total_xp = ?, level = ? WHERE user_id = ?",
-        (new_xp, new_level, user_id),
-    )
-    return {"total_xp": new_xp, "level": new_level, "xp_added": xp}
-
-
-def update_streak(user_id: int):
-    progress = query_one("SELECT * FROM user_progress WHERE user_id = ?", (user_id,))
-    today = date.today().isoformat()
-    last = progress["last_activity_date"]
+def level_progress(total_xp: int) -> dict:
+    """Level, XP left to the next level and the fraction (0-1) of the current level done."""
+    level = level_from_xp(total_xp)
+    start, end = xp_for_level(level), xp_for_level(level + 1)
+    return {
+        "level": level,
+        "level_xp": start,
+        "next_level_xp": end,
+        "xp_to_next_level": end - total_xp,
+        "level_progress": (total_xp - start) / (end - start),
+    }
 
-    if last == today:
-        return  # Already counted today
 
-    yesterday = date.today().toordinal() - 1
-    if last and date.fromisoformat(last).toordinal() == yesterday:
-        new_streak = (progress["current_streak"] or 0) + 1
+register_function("level_from_xp", 1, level_from_xp)
+
+# Streak after recording activity on :today, in terms of the row before the update.
+# Activity on or before the last recorded day leaves the streak alone.
+_NEW_STREAK = """CASE WHEN NOT :streak OR last_activity_date >= :today THEN COALESCE(current_streak, 0)
+                    WHEN last_activity_date IS :yesterday THEN COALESCE(current_streak, 0) + 1
+                    ELSE 1 END"""
+# A streak continued from yesterday earns the daily bonus
+_STREAK_BONUS = f"CASE WHEN :streak AND last_activity_date IS :yesterday THEN {XP_DAILY_STREAK} ELSE 0 END"
+
+
+def apply_progress(user_id: int, xp: int = 0, *, streak: bool = False,
+                   lessons: int = 0, quizzes: int = 0, reviews: int = 0, day: date | None = None) -> dict:
+    """Apply an activity to the user's progress and return the new state.
+
+    Adds `xp`, bumps the completion counters, recomputes the level and, with
+    `streak`, records activity on `day` (today by default), continuing or
+    restarting the streak and adding the daily streak bonus. A day before
+    the last recorded activity does not change the streak. The change is
+    applied atomically, in the progress cache or in one UPDATE, so
+    concurrent activities never overwrite each other's XP or counters.
+    """
+    today = day or date.today()
+    if settings.progress_cache:
+        state = progress_cache.update(
+            user_id, lambda state: _advance(state, xp, streak, lessons, quizzes, reviews, today),
+        )
     else:
-        new_streak = 1
-
-    longest = max(new_streak, progress["longest_streak"] or 0)
-
-    execute(
-        "UPDATE user_progress SET current_streak = ?, longest_streak = ?, last_activity_date = ? WHERE user_id = ?",
-        (new_streak, longest, today, user_id),
-    )
-
-    # Streak bonus XP
-    if new_streak > 1:
-        add_xp(user_id, XP_DAILY_STREAK)
-
-
-def check_achievements(user_id: int) -> list[dict]:
-    progress = query_one("SELECT * FROM user_progress WHERE user_id = ?", (user_id,))
-    new_achievements = []
-
-    checks = {
-        "first_lesson": (progress["lessons_completed"] or 0) >= 1,
-        "first_quiz": (progress["quizzes_completed"] or 0) >= 1,
-        "streak_3": (progress["current_streak"] or 0) >= 3,
-        "streak_7": (progress["current_streak"] or 0) >= 7,
-        "streak_30": (progress["current_streak"] or 0) >= 30,
-        "lessons_10": (progress["lessons_completed"] or 0) >= 10,
-        "lessons_50": (progress["lessons_completed"] or 0) >= 50,
-        "xp_1000": (progress["total_xp"] or 0) >= 1000,
-        "first_review": (progress["reviews_completed"] or 0) >= 1,
-    }
+        state = _apply_in_sql(user_id, xp, streak, lessons, quizzes, reviews, today)
+    return {"user_id": user_id, **state, "xp_added": xp, **level_progress(state["total_xp"])}
+
+
+def _advance(state: dict, xp: int, streak: bool, lessons: int, quizzes: int, reviews: int, today: date) -> dict:
+    """In-memory twin of the UPDATE in _apply_in_sql."""
+    if streak and (state["last_activity_date"] or "") < today.isoformat():
+        continued = state["last_activity_date"] == (today - timedelta(days=1)).isoformat()
+        state["current_streak"] = state["current_streak"] + 1 if continued else 1
+        state["longest_streak"] = max(state["longest_streak"], state["current_streak"])
+        state["last_activity_date"] = today.isoformat()
+        if continued:
+            xp += XP_DAILY_STREAK
+    state["total_xp"] += xp
+    state["level"] = level_from_xp(state["total_xp"])
+    state["lessons_completed"] += lessons
+    state["quizzes_completed"] += quizzes
+    state["reviews_completed"] += reviews
+    return state
+
+
+def _apply_in_sql(user_id: int, xp: int, streak: bool, lessons: int, quizzes: int, reviews: int,
+                  today: date) -> dict:
+    row = execute_returning(
+        f"""UPDATE user_progress SET
+               total_xp = COALESCE(total_xp, 0) + :xp + {_STREAK_BONUS},
+               level = level_from_xp(COALESCE(total_xp, 0) + :xp + {_STREAK_BONUS}),
+               current_streak = {_NEW_STREAK},
+               longest_streak = MAX(COALESCE(longest_streak, 0), {_NEW_STREAK}),
+               last_activity_date = CASE WHEN :streak AND COALESCE(last_activity_date, '') < :today
+                                         THEN :today ELSE last_activity_date END,
+               lessons_completed = COALESCE(lessons_completed, 0) + :lessons,
+               quizzes_completed = COALESCE(quizzes_completed, 0) + :quizzes,
+               reviews_completed = COALESCE(reviews_completed, 0) + :reviews,
+               version = version + 1
+           WHERE user_id = :user_id
+           RETURNING *""",
+        {
+            "user_id": user_id, "xp": xp, "streak": int(streak), "lessons": lessons, "quizzes": quizzes,
+            "reviews": reviews, "today": today.isoformat(), "yesterday": (today - timedelta(days=1)).isoformat(),
+        },
+    )[0]
+    return dict(row)
+
+
+def get_progress(user_id: int) -> dict | None:
+    """The user's progress row plus level-progress fields."""
+    if settings.progress_cache:
+        state = progress_cache.get(user_id)
+    else:
+        row = query_one("SELECT * FROM user_progress WHERE user_id = ?", (user_id,))
+        state = dict(row) if row else None
+    if state is None:
+        return None
+    return {"user_id": user_id, **state, **level_progress(state["total_xp"] or 0)}
+
 
-    for key, condition in checks.items():
-        if condition:
-            try:
-                execute(
-                    "INSERT OR IGNORE INTO achievements (user_id, achievement_key) VALUES (?, ?)",
-                    (user_id, key),
-                )
-                # Check if it was actually inserted (new)
-                from app.database import get_db
-                if get_db().execute(
-                    "SELECT changes()"
-                ).fetchone()[0] > 0:
-                    name, desc = ACHIEVEMENTS[key]
-                    new_achievements.append({"key": key, "name": name, "description": desc})
-            except Exception:
-                pass
-
-    return new_achievements
+def add_xp(user_id: int, xp: int) -> dict:
+    return apply_progress(user_id, xp)
+
+
+def update_streak(user_id: int) -> dict:
+    """Record activity today; a streak continued from yesterday earns the streak bonus."""
+    return apply_progress(user_id, streak=True)
+
+
+def check_achievements(user_id: int, **events) -> list[dict]:
+    """Unlock every achievement whose rule is newly met and return the new ones.
+
+    Reads the user's facts and unlocked set once, evaluates ACHIEVEMENT_RULES
+    in memory and inserts the new keys in one statement. Call it inside the
+    caller's transaction so concurrent requests cannot both report a key.
+    """
+    progress = get_progress(user_id)
+    if not progress:
+        return []
+    active_skills = query_one(
+        "SELECT COUNT(*) AS n FROM skills WHERE user_id = ? AND is_active = 1", (user_id,),
+    )["n"]
+    facts = {**progress, "active_skills": active_skills, **events}
+    unlocked = {r["achievement_key"] for r in query(
+        "SELECT achievement_key FROM achievements WHERE user_id = ?", (user_id,),
+    )}
+
+    new_keys = [
+        key for key, (fact, minimum) in ACHIEVEMENT_RULES.items()
+        if key not in unlocked and (facts.get(fact) or 0) >= minimum
+    ]
+    if new_keys:
+        executemany(
+            "INSERT OR IGNORE INTO achievements (user_id, achievement_key) VALUES (?, ?)",
+            [(user_id, key) for key in new_keys],
+        )
+    return [{"key": key, "name": ACHIEVEMENTS[key][0], "description": ACHIEVEMENTS[key][1]} for key in new_keys]
@@ -0,0 +1,153 @@
+"""Local quiz grading, so only genuinely ambiguous answers cost an LLM call.
+
+grade_locally() settles what can be decided in-process:
+
+- multiple_choice / true_false: exact match against correct_answer (also
+  accepting an option letter, or yes/no for true/false);
+- short_answer: a match after normalising case, punctuation and articles,
+  a numeric match (to the precision the expected answer is written in), a
+  near-miss typo of a short expected answer that leaves its digits alone, or
+  an answer whose content words are exactly the key words of a short
+  expected answer, in order, without hedging between alternatives.
+
+Anything else returns None and is escalated to tutor.grade_answer.
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+CHOICE_TYPES = {"multiple_choice", "true_false"}
+
+# A typo still counts: one changed character per this many characters of the
+# expected answer, so "photosynthesys" passes but "neutron" for "neuron" does not
+CHARS_PER_TYPO = 8
+# Expected answers longer than this (in key words) need a human-ish judgement
+MAX_KEY_WORDS = 4
+MIN_KEY_WORD_LENGTH = 3
+# Key words buried in a long answer may be contradicted by the rest of it
+MAX_ANSWER_WORDS = 12
+
+_ARTICLES = {"a", "an", "the"}
+_STOPWORDS = _ARTICLES | {
+    "of", "to", "in", "on", "for", "and", "or", "is", "are", "it", "its", "by", "with", "as", "be", "that", "this",
+}
+# "t" is what is left of n't ("isn't" -> "isn", "t")
+_NEGATIONS = {"not", "no", "never", "none", "neither", "nor", "cannot", "t"}
+# "merge sort or quick sort" is not a committed answer
+_HEDGES = {"or", "either", "maybe", "perhaps", "possibly", "probably", "guess"}
+# Words that frame an answer without adding to it ("I think you would use ...")
+_FILLER = {"i", "you", "we", "would", "could", "should", "can", "will", "use", "using", "think", "answer", "called"}
+_NON_ANSWERS = {"", "idk", "i don t know", "dont know", "don t know", "no idea", "not sure", "pass", "skip"}
+_TRUE = {"true", "t", "yes", "y"}
+_FALSE = {"false", "f", "no", "n"}
+_OPTION_LETTER = re.compile(r"^\s*\(?([a-z])\s*[).:]?\s*$")
+_NUMBER = re.compile(r"^-?(?:\d+(?:\.\d+)?|\.\d+)$")
+
+stats = {"local": 0, "escalated": 0}
+
+
+def _words(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKC", str(text)).casefold().replace(",", "")
+    return [w for w in re.findall(r"-?(?:\d+(?:\.\d+)?|\.\d+)|\w+", text) if w not in _ARTICLES]
+
+
+def normalize(text: str) -> str:
+    return " ".join(_words(text))
+
+
+def _number(text: str) -> float | None:
+    return float(text) if _NUMBER.match(text) else None
+
+
+def _tolerance(expected: str) -> float:
+    """Half a unit in the last decimal place: "3.14" accepts 3.141, "1945" only 1945."""
+    _, _, decimals = expected.partition(".")
+    return 0.5 * 10 ** -len(decimals) if decimals else 0.0
+
+
+def _typos(given: str, expected: str) -> int:
+    """Characters that differ between the two strings (the larger side of each edit)."""
+    ops = SequenceMatcher(None, given, expected, autojunk=False).get_opcodes()
+    return sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in ops if tag != "equal")
+
+
+def _digits(text: str) -> str:
+    return "".join(c for c in text if c.isdigit())
+
+
+def _result(correct: bool, feedback: str) -> dict:
+    stats["local"] += 1
+    return {"correct": correct, "feedback": feedback}
+
+
+def _choice_feedback(question: dict, correct: bool) -> str:
+    explanation = question.get("explanation", "")
+    if correct:
+        return f"Correct! {explanation}".strip()
+    return f"Not quite. {explanation or 'The correct answer is: ' + str(question.get('correct_answer', ''))}"
+
+
+def _grade_choice(question: dict, answer: str) -> dict:
+    expected = normalize(question.get("correct_answer", ""))
+    given = normalize(answer)
+
+    if question.get("type") == "true_false":
+        given = "true" if given in _TRUE else "false" if given in _FALSE else given
+    else:
+        options = question.get("options") or []
+        # "b" or "B)" picks the second option; matched before normalize(), which drops "a" as an article
+        letter = _OPTION_LETTER.match(str(answer).casefold())
+        if letter and ord(letter[1]) - ord("a") < len(options):
+            given = normalize(options[ord(letter[1]) - ord("a")])
+
+    correct = given == expected
+    return _result(correct, _choice_feedback(question, correct))
+
+
+def _grade_short(question: dict, answer: str) -> dict | None:
+    expected_text = str(question.get("correct_answer", ""))
+    expected, given = normalize(expected_text), normalize(answer)
+    explanation = question.get("explanation", "")
+
+    if not expected:
+        return None
+    if given in _NON_ANSWERS:
+        return _result(False, f"No answer given. The expected answer is: {expected_text}")
+    if given == expected:
+        return _result(True, f"Correct! {explanation}".strip())
+
+    expected_number, given_number = _number(expected), _number(given)
+    if expected_number is not None and given_number is not None:
+        correct = abs(expected_number - given_number) <= _tolerance(expected) + 1e-12
+        if correct:
+            return _result(True, f"Correct! {explanation}".strip())
+        return _result(False, f"Not quite. The expected answer is: {expected_text}")
+
+    key_words = [w for w in expected.split() if w not in _STOPWORDS]
+    if not key_words or len(key_words) > MAX_KEY_WORDS:
+        return None
+
+    # A changed digit is a different answer ("Python 2"), never a typo
+    if _digits(given) == _digits(expected) and _typos(given, expected) <= len(expected) // CHARS_PER_TYPO:
+        return _result(True, f"Correct! (Watch the spelling: {expected_text}) {explanation}".strip())
+
+    given_words = given.split()
+    # The answer must say the key words, in order, and nothing else of substance:
+    # "right to left", "stack overflow" or "quick sort merge sort" need the tutor
+    content = [w for w in given_words if w not in _STOPWORDS and w not in _FILLER]
+    if (len(given_words) <= MAX_ANSWER_WORDS and all(len(w) >= MIN_KEY_WORD_LENGTH for w in key_words)
+            and not (_NEGATIONS | _HEDGES).intersection(given_words)
+            and content == [w for w in key_words if w not in _FILLER]):
+        return _result(True, f"Correct! {explanation}".strip())
+
+    return None
+
+
+def grade_locally(question: dict, answer: str) -> dict | None:
+    """Grade an answer in-process, or return None if it needs the tutor's judgement."""
+    if question.get("type") in CHOICE_TYPES:
+        return _grade_choice(question, answer)
+    result = _grade_short(question, answer)
+    if result is None:
+        stats["escalated"] += 1
+    return result
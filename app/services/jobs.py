@@ -0,0 +1,171 @@
+"""Background job queue for work that should not hold up a request."""
+import asyncio
+import time
+from collections import defaultdict, deque
+from collections.abc import Awaitable, Callable, Hashable
+from functools import partial
+from typing import Any
+
+from app import serialization
+from app.config import settings
+from app.database import execute, query, query_one
+
+
+class JobQueue:
+    """Run background coroutines with bounded concurrency.
+
+    Two kinds of work share the queue:
+
+    - Best-effort jobs (submit): identified by a key and not queued twice
+      while pending or running. Each user may start at most `user_budget`
+      of them per rolling `budget_window` seconds; submissions over budget
+      are dropped, since the request path can always redo the work. A job
+      submitted under a named budget (see `budgets`) draws on that limit
+      instead, so one kind of work cannot use up another's.
+    - Persisted jobs (record + dispatch): stored in the jobs table so work
+      the user is owed survives a restart. They run through the handler
+      registered for their kind, are retried up to `max_attempts` times,
+      and are not subject to the budget.
+    """
+
+    def __init__(
+        self, max_concurrency: int, user_budget: int, budget_window: float, max_attempts: int = 3,
+        budgets: dict[str, int] | None = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.user_budget = user_budget
+        self.budgets = {"default": user_budget, **(budgets or {})}
+        self.budget_window = budget_window
+        self.max_attempts = max_attempts
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._handlers: dict[str, Callable[[int, dict], Awaitable[Any]]] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self._starts: dict[tuple[int, str], deque[float]] = defaultdict(deque)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def submit(
+        self, user_id: int, key: Hashable, fn: Callable[[], Awaitable[Any]], budget: str = "default",
+    ) -> bool:
+        """Queue fn() unless the same job is already queued or the user is over budget."""
+        if key in self._tasks:
+            return False
+        if not self._take_budget(user_id, budget):
+            self.stats["rejected"] += 1
+            return False
+        self._spawn(key, fn)
+        return True
+
+    def handler(self, kind: str):
+        """Decorator registering the coroutine that runs persisted jobs of `kind`."""
+        def register(fn: Callable[[int, dict], Awaitable[Any]]):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    def record(self, kind: str, user_id: int, payload: dict) -> int:
+        """Persist a pending job and return its id.
+
+        Call inside the caller's transaction so the job commits together with
+        the state that requires it, then dispatch() it after the commit.
+        """
+        return execute(
+            "INSERT INTO jobs (kind, user_id, payload_json) VALUES (?, ?, ?)",
+            (kind, user_id, serialization.dumps(payload)),
+        )
+
+    def dispatch(self, job_id: int):
+        """Start running a recorded job in the background."""
+        self._spawn(("job", job_id), lambda: self._run_persisted(job_id))
+
+    def resume(self) -> int:
+        """Re-dispatch jobs left pending or running by a previous process."""
+        rows = query("SELECT id FROM jobs WHERE status IN ('pending', 'running') ORDER BY id")
+        for row in rows:
+            self.dispatch(row["id"])
+        return len(rows)
+
+    def _spawn(self, key: Hashable, fn: Callable[[], Awaitable[Any]]):
+        if key in self._tasks:
+            return
+        task = asyncio.ensure_future(self._run(key, fn))
+        self._tasks[key] = task
+        task.add_done_callback(partial(self._forget, key))
+        self.stats["submitted"] += 1
+
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self):
+        """Wait for every queued job, including jobs queued while waiting."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def shutdown(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _take_budget(self, user_id: int, budget: str) -> bool:
+        now = time.monotonic()
+        starts = self._starts[user_id, budget]
+        while starts and now - starts[0] > self.budget_window:
+            starts.popleft()
+        if len(starts) >= self.budgets[budget]:
+            return False
+        starts.append(now)
+        return True
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # A semaphore belongs to one event loop; rebuild it if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]):
+        async with self._get_semaphore():
+            try:
+                await fn()
+                self.stats["completed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"Background job {key} failed: {e}")
+
+    async def _run_persisted(self, job_id: int):
+        job = query_one("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if job is None or job["status"] in ("done", "failed"):
+            return
+        handler = self._handlers[job["kind"]]
+        payload = serialization.loads(job["payload_json"])
+
+        for attempt in range(job["attempts"] + 1, self.max_attempts + 1):
+            execute(
+                "UPDATE jobs SET status = 'running', attempts = ?, updated_at = datetime('now') WHERE id = ?",
+                (attempt, job_id),
+            )
+            try:
+                await handler(job["user_id"], payload)
+            except Exception as e:
+                execute("UPDATE jobs SET error = ?, updated_at = datetime('now') WHERE id = ?", (str(e), job_id))
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(2 ** attempt)
+                continue
+            execute("UPDATE jobs SET status = 'done', error = NULL, updated_at = datetime('now') WHERE id = ?", (job_id,))
+            return
+
+        execute("UPDATE jobs SET status = 'failed', updated_at = datetime('now') WHERE id = ?", (job_id,))
+        raise RuntimeError(f"gave up after {self.max_attempts} attempts")
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+
+jobs = JobQueue(
+    max_concurrency=settings.job_concurrency,
+    user_budget=settings.job_budget_per_user,
+    budget_window=settings.job_budget_window_seconds,
+    budgets={"chat_summary": settings.chat_summary_budget_per_user},
+)
@@ -1,9 +1,16 @@
-import json
-from app.database import execute, query, query_one
+import asyncio
+from collections.abc import AsyncIterator
+from app import serialization
+from app.config import settings
+from app.database import execute, executemany, pack, query, query_one, transaction
 from app.ai import tutor
+from app.ai.json_stream import JsonFieldStream
+from app.services.fanout import FanOut
+from app.services.jobs import jobs
+from app.services.singleflight import flights
 
 
-def generate_lesson(skill_id: int, lesson_id: int) -> dict:
+def _lesson_inputs(skill_id: int, lesson_id: int):
     lesson = query_one("SELECT * FROM lessons WHERE id = ?", (lesson_id,))
     skill = query_one("SELECT * FROM skills WHERE id = ?", (skill_id,))
 
@@ -13,71 +20,265 @@ def generate_lesson(skill_id: int, lesson_id: int) -> dict:
         (skill_id, lesson["order_index"]),
     )
     previous_topics = [r["topic"] for r in previous]
+    return lesson, skill, previous_topics
 
-    content = tutor.generate_lesson(
-        skill_name=skill["name"],
-        topic=lesson["topic"],
-        difficulty=lesson["difficulty"] or 1,
-        previous_topics=previous_topics,
-    )
 
-    # Fetch external resources (arXiv papers + AI-suggested YouTube/GitHub)
+async def _generate_resources(lesson, skill) -> dict | None:
+    """arXiv papers + AI-suggested YouTube/GitHub resources, or None on failure."""
+    from app.services.resources import fetch_arxiv_papers
     try:
-        from app.services.resources import fetch_arxiv_papers
-        papers = fetch_arxiv_papers(lesson["topic"])
-        content["resources"] = tutor.generate_resources(lesson["topic"], skill["name"], papers)
+        papers, resources = await asyncio.gather(
+            fetch_arxiv_papers(lesson["topic"]),
+            tutor.generate_resources(lesson["topic"], skill["name"]),
+        )
     except Exception as e:
         print(f"Failed to generate resources: {e}")
+        return None
+    resources["papers"] = papers
+    return resources
+
+
+def _start_resources(steps: FanOut, lesson, skill):
+    # Resources only need the topic and skill name, so they are fetched
+    # while the lesson body is being written rather than after it
+    steps.start("resources", lambda: _generate_resources(lesson, skill), timeout=settings.resources_timeout_seconds)
+
+
+async def _attach_resources(steps: FanOut, content: dict):
+    """Attach resources if they are ready within a short grace period after the lesson."""
+    resources = await steps.optional("resources", wait=settings.resources_grace_seconds)
+    if resources is not None:
+        content["resources"] = resources
+
+
+def _attach_resources_later(steps: FanOut, lesson_id: int):
+    """Save resources that missed the grace period once they arrive (or drop them)."""
+    if steps.running("resources"):
+        steps.detach("resources", lambda resources: _save_late_resources(lesson_id, resources))
 
+
+def _save_late_resources(lesson_id: int, resources: dict | None):
+    if resources is None:
+        return
+    with transaction():
+        saved = _saved_lesson(lesson_id)
+        if not saved or "resources" in saved:
+            return
+        del saved["id"]
+        saved["resources"] = resources
+        _save_lesson(lesson_id, saved)
+
+
+def _save_lesson(lesson_id: int, content: dict):
     execute(
         "UPDATE lessons SET content_json = ?, summary = ? WHERE id = ?",
-        (json.dumps(content), content.get("summary", ""), lesson_id),
+        (pack(serialization.dumps(content)), content.get("summary", ""), lesson_id),
     )
 
+
+def _saved_lesson(lesson_id: int) -> dict | None:
+    row = query_one("SELECT content_json FROM lessons WHERE id = ?", (lesson_id,))
+    if row and row["content_json"]:
+        return {"id": lesson_id, **serialization.loads(row["content_json"])}
+    return None
+
+
+async def generate_lesson(skill_id: int, lesson_id: int) -> dict:
+    """Generate and save a lesson's content, or return it if it already exists.
+
+    Concurrent calls for the same lesson share a single generation.
+    """
+    saved = _saved_lesson(lesson_id)
+    if saved:
+        return saved
+    return await flights.do(("lesson", lesson_id), lambda: _generate_lesson(skill_id, lesson_id))
+
+
+async def _generate_lesson(skill_id: int, lesson_id: int) -> dict:
+    lesson, skill, previous_topics = _lesson_inputs(skill_id, lesson_id)
+
+    async with FanOut() as steps:
+        _start_resources(steps, lesson, skill)
+        steps.start(
+            "lesson",
+            lambda: tutor.generate_lesson(
+                skill_name=skill["name"],
+                topic=lesson["topic"],
+                difficulty=lesson["difficulty"] or 1,
+                previous_topics=previous_topics,
+            ),
+            timeout=settings.lesson_timeout_seconds,
+        )
+        content = await steps.result("lesson")
+        await _attach_resources(steps, content)
+        _save_lesson(lesson_id, content)
+        _attach_resources_later(steps, lesson_id)
+
     return {"id": lesson_id, **content}
 
 
+async def stream_lesson(skill_id: int, lesson_id: int) -> AsyncIterator[tuple[str, dict]]:
+    """Generate a lesson, yielding (event, data) pairs as parts of it are written.
+
+    Emits an "item" for each array element (every section, key point and
+    exercise) and a "field" for each top-level field as soon as it closes,
+    then a final "done" with the saved lesson once resources are attached.
+    If the lesson already exists, or another caller is already generating
+    it, only the "done" event is sent.
+    """
+    saved = _saved_lesson(lesson_id)
+    if saved:
+        yield "done", saved
+        return
+
+    key = ("lesson", lesson_id)
+    flight = flights.in_flight(key)
+    if flight is not None:
+        yield "done", await asyncio.shield(flight)
+        return
+
+    # Generation runs as the shared flight and survives this client disconnecting
+    events: asyncio.Queue = asyncio.Queue()
+    leader = flights.start(key, lambda: _stream_lesson_into(events, skill_id, lesson_id))
+    while (event := await events.get()) is not None:
+        yield event
+    yield "done", await asyncio.shield(leader)
+
+
+async def _stream_lesson_into(events: asyncio.Queue, skill_id: int, lesson_id: int) -> dict:
+    try:
+        lesson, skill, previous_topics = _lesson_inputs(skill_id, lesson_id)
+
+        async with FanOut() as steps:
+            _start_resources(steps, lesson, skill)
+
+            parser = JsonFieldStream()
+            chunks = []
+
+            async def consume():
+                async for text in tutor.stream_lesson(
+                    skill_name=skill["name"],
+                    topic=lesson["topic"],
+                    difficulty=lesson["difficulty"] or 1,
+                    previous_topics=previous_topics,
+                ):
+                    chunks.append(text)
+                    for event in parser.feed(text):
+                        if event[0] == "item":
+                            _, key, index, value = event
+                            events.put_nowait(("item", {"key": key, "index": index, "value": value}))
+                        else:
+                            _, key, value = event
+                            events.put_nowait(("field", {"key": key, "value": value}))
+
+            # wait_for rather than asyncio.timeout(), which needs Python 3.11
+            await asyncio.wait_for(consume(), settings.lesson_timeout_seconds)
+
+            # Fall back to a whole-text parse if the streamed object never closed cleanly
+            content = parser.result if parser.done else tutor.parse_json("".join(chunks).strip())
+
+            await _attach_resources(steps, content)
+            _save_lesson(lesson_id, content)
+            _attach_resources_later(steps, lesson_id)
+        return {"id": lesson_id, **content}
+    finally:
+        events.put_nowait(None)
+
+
 def get_lesson(lesson_id: int) -> dict | None:
+    """The lesson row with its content decoded under "content" (None until generated)."""
     row = query_one("SELECT * FROM lessons WHERE id = ?", (lesson_id,))
-    return dict(row) if row else None
+    if not row:
+        return None
+    lesson = dict(row)
+    lesson["content"] = serialization.loads_or(lesson.pop("content_json"))
+    return lesson
 
 
-def complete_lesson(user_id: int, lesson_id: int):
-    # Check if already completed — prevent double XP and duplicate review cards
-    lesson = query_one("SELECT * FROM lessons WHERE id = ?", (lesson_id,))
-    if lesson and lesson["status"] == "completed":
-        return {"already_completed": True, "xp_earned": 0}
+async def complete_lesson(user_id: int, lesson_id: int):
+    from app.services.gamification import apply_progress, XP_LESSON_COMPLETE
 
-    execute("UPDATE lessons SET status = 'completed' WHERE id = ?", (lesson_id,))
+    with transaction():
+        # Check if already completed — prevent double XP and duplicate review cards
+        # content_json is only tested for NULL, so it is never read (or decompressed)
+        lesson = query_one(
+            """SELECT id, skill_id, order_index, status, content_json IS NOT NULL AS has_content
+               FROM lessons WHERE id = ?""",
+            (lesson_id,),
+        )
+        if lesson and lesson["status"] == "completed":
+            return {"already_completed": True, "xp_earned": 0}
 
-    # Record attempt
-    execute(
-        "INSERT INTO lesson_attempts (user_id, lesson_id, completed_at) VALUES (?, ?, datetime('now'))",
-        (user_id, lesson_id),
-    )
+        execute("UPDATE lessons SET status = 'completed' WHERE id = ?", (lesson_id,))
 
-    # Update progress
-    execute(
-        "UPDATE user_progress SET lessons_completed = lessons_completed + 1 WHERE user_id = ?",
-        (user_id,),
-    )
+        # Record attempt
+        execute(
+            "INSERT INTO lesson_attempts (user_id, lesson_id, completed_at) VALUES (?, ?, datetime('now'))",
+            (user_id, lesson_id),
+        )
 
-    # Add XP and update streak
-    from app.services.gamification import add_xp, update_streak, XP_LESSON_COMPLETE
-    add_xp(user_id, XP_LESSON_COMPLETE)
-    update_streak(user_id)
-
-    # Generate review cards
-    if lesson and lesson["content_json"]:
-        try:
-            content = json.loads(lesson["content_json"])
-            cards = tutor.generate_review_cards(content)
-            for card in cards:
-                execute(
-                    "INSERT INTO review_cards (user_id, lesson_id, question, answer) VALUES (?, ?, ?, ?)",
-                    (user_id, lesson_id, card["question"], card["answer"]),
-                )
-        except Exception as e:
-            print(f"Failed to generate review cards: {e}")
+        # Count the lesson, add XP and update the streak
+        apply_progress(user_id, XP_LESSON_COMPLETE, streak=True, lessons=1)
+
+        # Review cards need an LLM call, so they are generated by a persisted
+        # background job recorded atomically with the completion
+        card_job = None
+        if lesson and lesson["has_content"]:
+            card_job = jobs.record("review_cards", user_id, {"lesson_id": lesson_id})
+
+    if card_job:
+        jobs.dispatch(card_job)
+    if lesson:
+        schedule_prefetch(user_id, lesson)
 
     return {"already_completed": False, "xp_earned": XP_LESSON_COMPLETE}
+
+
+@jobs.handler("review_cards")
+async def generate_review_cards(user_id: int, payload: dict):
+    lesson_id = payload["lesson_id"]
+    lesson = query_one("SELECT content_json FROM lessons WHERE id = ?", (lesson_id,))
+    if not lesson or not lesson["content_json"]:
+        return
+
+    cards = await tutor.generate_review_cards(serialization.loads(lesson["content_json"]))
+    with transaction():
+        # A retried job must not insert the same cards twice
+        if query_one("SELECT 1 FROM review_cards WHERE user_id = ? AND lesson_id = ?", (user_id, lesson_id)):
+            return
+        executemany(
+            "INSERT INTO review_cards (user_id, lesson_id, question, answer) VALUES (?, ?, ?, ?)",
+            [(user_id, lesson_id, card["question"], card["answer"]) for card in cards],
+        )
+
+
+def schedule_prefetch(user_id: int, lesson) -> bool:
+    """Queue background generation of the lesson after `lesson` and its quiz.
+
+    Opening the next lesson is then a DB read; if the learner gets there
+    while the prefetch is still running, single-flight joins them to it.
+    """
+    # content_json is only tested for NULL, so it is never read (or decompressed)
+    upcoming = query_one(
+        """SELECT id, skill_id,
+                  content_json IS NOT NULL AND EXISTS (
+                      SELECT 1 FROM quizzes q WHERE q.lesson_id = lessons.id
+                        AND NOT EXISTS (SELECT 1 FROM quiz_attempts a WHERE a.quiz_id = q.id AND a.user_id = ?)
+                  ) AS ready
+           FROM lessons WHERE skill_id = ? AND order_index > ? ORDER BY order_index LIMIT 1""",
+        (user_id, lesson["skill_id"], lesson["order_index"]),
+    )
+    # Nothing to do if the lesson and a quiz the user has not taken already exist
+    if not upcoming or upcoming["ready"]:
+        return False
+    return jobs.submit(
+        user_id,
+        ("prefetch", upcoming["id"]),
+        lambda: _prefetch(user_id, upcoming["skill_id"], upcoming["id"]),
+    )
+
+
+async def _prefetch(user_id: int, skill_id: int, lesson_id: int):
+    from app.services import quiz_service
+    await generate_lesson(skill_id, lesson_id)
+    await quiz_service.get_or_generate_quiz(lesson_id, user_id)
@@ -0,0 +1,286 @@
+"""Write-behind cache for user_progress.
+
+While a user's row is cached it is the source of truth: reads come from
+memory, and changes are applied in memory under one lock, so concurrent
+activities never lose each other's updates. Changes reach the database in
+one of two ways:
+
+- inside a transaction(), the rows it changed are written just before it
+  commits, so progress commits or rolls back with the rest of the flow;
+- outside one, the change is appended to a journal file and the row is
+  written with every other dirty row in one batch each flush_interval.
+
+Only the second path coalesces writes. Lesson completion, quiz submission,
+review rating and the other activity flows all run in a transaction, so
+each of them still writes its rows once, at its own commit; what the cache
+saves them is the reads. Deferring those writes too would let a crash
+between the commit and the journal append lose progress for a flow that
+did commit.
+
+Every change bumps the row's version. The journal is replayed when the
+database is opened, for rows whose journaled version is newer than the
+database's, so a crash loses nothing that reached the journal. Only one
+server process may use the cache for a given database.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+
+from app.config import settings
+from app.database import add_hook, executemany, get_db, in_transaction, query_one, transaction, write_lane
+
+COLUMNS = (
+    "total_xp", "level", "current_streak", "longest_streak", "last_activity_date",
+    "lessons_completed", "quizzes_completed", "reviews_completed", "version",
+)
+# Never overwrite a row with an older state than it already has
+_UPDATE = (
+    f"UPDATE user_progress SET {', '.join(f'{c} = ?' for c in COLUMNS)} WHERE user_id = ? AND version < ?"
+)
+
+
+def _params(user_id: int, state: dict) -> tuple:
+    return (*(state[c] for c in COLUMNS), user_id, state["version"])
+
+
+class _Entry:
+    __slots__ = ("state", "dirty_since")
+
+    def __init__(self, state: dict):
+        self.state = state
+        # Monotonic time of the oldest change not yet in the database
+        self.dirty_since: float | None = None
+
+
+class ProgressCache:
+    def __init__(self, flush_interval: float, max_users: int):
+        self.flush_interval = flush_interval
+        self.max_users = max_users
+        self.stats = {
+            "hits": 0, "misses": 0, "flushes": 0, "rows_flushed": 0,
+            "last_batch": 0, "max_batch": 0, "last_lag_ms": 0.0, "max_lag_ms": 0.0, "recovered": 0,
+        }
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        # Per thread: rows changed by its open transaction, with their state before it
+        self._local = threading.local()
+        self._journal = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        add_hook("before_commit", self._before_commit)
+        add_hook("after_commit", self._after_commit)
+        add_hook("after_rollback", self._after_rollback)
+        add_hook("open", self.recover)
+        add_hook("close", self._reset)
+
+    # -- reads and updates --------------------------------------------------
+
+    def get(self, user_id: int) -> dict | None:
+        # Open this thread's connection first: opening one may take the writer lane
+        get_db()
+        with self._lock:
+            entry = self._entry(user_id)
+            return dict(entry.state) if entry else None
+
+    def update(self, user_id: int, change: Callable[[dict], dict]) -> dict:
+        """Apply change(state) -> new state to the user's row and return the new state."""
+        get_db()
+        # The writer lane keeps this from interleaving with another thread's transaction
+        with write_lane(), self._lock:
+            entry = self._entry(user_id)
+            if entry is None:
+                raise ValueError(f"No progress row for user {user_id}")
+            tx = in_transaction()
+            if tx:
+                self._touched().setdefault(user_id, (entry.state, entry.dirty_since))
+            state = change(dict(entry.state))
+            state["version"] = entry.state["version"] + 1
+            entry.state = state
+            if entry.dirty_since is None:
+                entry.dirty_since = time.monotonic()
+            if not tx:
+                self._append({"user_id": user_id, **state})
+            return dict(state)
+
+    def _entry(self, user_id: int) -> _Entry | None:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self.stats["hits"] += 1
+            self._entries.move_to_end(user_id)
+            return entry
+        self.stats["misses"] += 1
+        row = query_one(f"SELECT {', '.join(COLUMNS)} FROM user_progress WHERE user_id = ?", (user_id,))
+        if row is None:
+            return None
+        state = {c: 0 if row[c] is None and c != "last_activity_date" else row[c] for c in COLUMNS}
+        entry = self._entries[user_id] = _Entry(state)
+        self._evict()
+        return entry
+
+    def _evict(self):
+        """Drop least recently used clean rows beyond max_users."""
+        excess = len(self._entries) - self.max_users
+        for user_id in [u for u, e in self._entries.items() if e.dirty_since is None][:max(0, excess)]:
+            del self._entries[user_id]
+
+    # -- writing --------------------------------------------------------------
+
+    def _write(self, batch: list[tuple[int, _Entry]]):
+        """Write rows in one statement (inside the caller's transaction) and record metrics."""
+        executemany(_UPDATE, [_params(user_id, entry.state) for user_id, entry in batch])
+        lag = (time.monotonic() - min(entry.dirty_since for _, entry in batch)) * 1000
+        self.stats["flushes"] += 1
+        self.stats["rows_flushed"] += len(batch)
+        self.stats["last_batch"] = len(batch)
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        self.stats["last_lag_ms"] = round(lag, 1)
+        self.stats["max_lag_ms"] = max(self.stats["max_lag_ms"], round(lag, 1))
+
+    def flush(self) -> int:
+        """Write every dirty row in one batch and return how many were written."""
+        with self._lock:
+            if all(e.dirty_since is None for e in self._entries.values()):
+                return 0
+        with transaction(), self._lock:
+            batch = [(u, e) for u, e in self._entries.items() if e.dirty_since is not None]
+            if not batch:
+                return 0
+            self._write(batch)
+            written = {user_id: entry.state["version"] for user_id, entry in batch}
+        with self._lock:
+            for user_id, version in written.items():
+                entry = self._entries.get(user_id)
+                # A row changed again since it was written stays dirty
+                if entry and entry.state["version"] == version:
+                    entry.dirty_since = None
+            self._compact()
+        return len(written)
+
+    def _touched(self) -> dict:
+        if not hasattr(self._local, "touched"):
+            self._local.touched = {}
+        return self._local.touched
+
+    def _before_commit(self):
+        touched = getattr(self._local, "touched", None)
+        if not touched:
+            return
+        with self._lock:
+            batch = [(u, self._entries[u]) for u in touched if u in self._entries]
+            if batch:
+                self._write(batch)
+
+    def _after_commit(self):
+        touched = getattr(self._local, "touched", None)
+        if not touched:
+            return
+        # Still in the writer lane, so nothing changed these rows since _before_commit wrote them
+        with self._lock:
+            for user_id in touched:
+                entry = self._entries.get(user_id)
+                if entry:
+                    entry.dirty_since = None
+            self._compact()
+        touched.clear()
+
+    def _after_rollback(self):
+        touched = getattr(self._local, "touched", None)
+        if not touched:
+            return
+        with self._lock:
+            for user_id, (state, dirty_since) in touched.items():
+                entry = self._entries.get(user_id)
+                if entry:
+                    entry.state, entry.dirty_since = state, dirty_since
+        touched.clear()
+
+    # -- journal ----------------------------------------------------------------
+
+    def _journal_path(self) -> Path:
+        return Path(f"{settings.db_path}-progress")
+
+    def _append(self, record: dict):
+        if self._journal is None:
+            self._journal = open(self._journal_path(), "a")
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+
+    def _compact(self):
+        """Empty the journal once every change in it has reached the database."""
+        if self._journal is not None and all(e.dirty_since is None for e in self._entries.values()):
+            self._journal.truncate(0)
+
+    def recover(self, db: sqlite3.Connection) -> int:
+        """Replay journaled states newer than the database's; returns rows restored.
+
+        Runs as the database's "open" hook, before anything reads progress.
+        """
+        path = self._journal_path()
+        if not path.exists():
+            return 0
+        latest = {}
+        for line in path.read_text().splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line torn by the crash
+            current = latest.get(record["user_id"])
+            if current is None or record["version"] > current["version"]:
+                latest[record["user_id"]] = record
+        restored = db.executemany(_UPDATE, [_params(user_id, r) for user_id, r in latest.items()]).rowcount
+        db.commit()
+        path.unlink()
+        self.stats["recovered"] += restored
+        if restored:
+            print(f"Recovered {restored} progress row(s) from {path}")
+        return restored
+
+    def _reset(self):
+        """Forget everything (the database is being closed); unflushed rows stay in the journal."""
+        with self._lock:
+            self._entries.clear()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    # -- background flushing ----------------------------------------------------
+
+    def start(self):
+        """Start flushing dirty rows on an interval."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Progress flush failed: {e}")
+
+    def close(self):
+        """Stop the flusher and write everything still dirty."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            dirty = [e.dirty_since for e in self._entries.values() if e.dirty_since is not None]
+            return {
+                **self.stats,
+                "cached": len(self._entries),
+                "dirty": len(dirty),
+                "oldest_dirty_ms": round((time.monotonic() - min(dirty)) * 1000, 1) if dirty else 0.0,
+            }
+
+
+progress_cache = ProgressCache(settings.progress_flush_seconds, settings.progress_cache_max_users)
@@ -1,6 +1,7 @@
-import json
-from app.database import execute, query, query_one
+from app import serialization
+from app.database import execute, pack, query, query_one, transaction
 from app.ai import tutor
+from app.services.singleflight import flights
 
 _CODING_KEYWORDS = {
     "python", "javascript", "typescript", "programming", "coding", "software",
@@ -17,22 +18,27 @@ def _infer_submission_type(skill: dict) -> str:
     return "text"
 
 
-def get_or_generate_project(skill_id: int) -> dict:
+async def get_or_generate_project(skill_id: int) -> dict:
     existing = query_one(
         "SELECT * FROM skill_projects WHERE skill_id = ? ORDER BY created_at DESC LIMIT 1",
         (skill_id,),
     )
     if existing:
-        brief = json.loads(existing["description_json"])
+        brief = serialization.loads(existing["description_json"])
         skill = query_one("SELECT * FROM skills WHERE id = ?", (skill_id,))
         brief.setdefault("submission_type", _infer_submission_type(dict(skill)) if skill else "text")
         return {"id": existing["id"], **brief}
 
+    # Concurrent first visits share one generation, so only one skill_projects row is inserted
+    return await flights.do(("project", skill_id), lambda: _generate_project(skill_id))
+
+
+async def _generate_project(skill_id: int) -> dict:
     skill = query_one("SELECT * FROM skills WHERE id = ?", (skill_id,))
     if not skill:
         raise ValueError("Skill not found")
 
-    curriculum = json.loads(skill["curriculum_json"] or "[]")
+    curriculum = serialization.loads_or(skill["curriculum_json"], [])
     curriculum_overview = ", ".join(t.get("title", "") for t in curriculum)
 
     lessons = query(
@@ -45,7 +51,7 @@ def get_or_generate_project(skill_id: int) -> dict:
     )
 
     submission_type = _infer_submission_type(dict(skill))
-    brief = tutor.generate_project_brief(
+    brief = await tutor.generate_project_brief(
         skill_name=skill["name"],
         curriculum_overview=curriculum_overview,
         lesson_topics=lesson_topics,
@@ -56,21 +62,21 @@ def get_or_generate_project(skill_id: int) -> dict:
 
     project_id = execute(
         "INSERT INTO skill_projects (skill_id, description_json) VALUES (?, ?)",
-        (skill_id, json.dumps(brief)),
+        (skill_id, serialization.dumps(brief)),
     )
     return {"id": project_id, **brief}
 
 
-def submit_project(user_id: int, project_id: int, submission: str) -> dict:
+async def submit_project(user_id: int, project_id: int, submission: str) -> dict:
     project = query_one("SELECT * FROM skill_projects WHERE id = ?", (project_id,))
     if not project:
         raise ValueError("Project not found")
 
     skill = query_one("SELECT * FROM skills WHERE id = ?", (project["skill_id"],))
-    brief = json.loads(project["description_json"])
+    brief = serialization.loads(project["description_json"])
     requirements_text = "\n".join(f"- {r}" for r in brief.get("requirements", []))
 
-    result = tutor.evaluate_project(
+    result = await tutor.evaluate_project(
         skill_name=skill["name"] if skill else "Unknown",
         project_title=brief.get("title", ""),
         project_description=brief.get("description", ""),
@@ -82,22 +88,22 @@ def submit_project(user_id: int, project_id: int, submission: str) -> dict:
     passed = result.get("passed", False)
     xp_earned = 0
 
-    prior_pass = query_one(
-        "SELECT id FROM skill_project_submissions WHERE user_id = ? AND project_id = ? AND passed = 1",
-        (user_id, project_id),
-    )
-    if passed and not prior_pass:
-        from app.services.gamification import add_xp, update_streak, XP_PROJECT_PASS
-        add_xp(user_id, XP_PROJECT_PASS)
-        update_streak(user_id)
-        xp_earned = XP_PROJECT_PASS
-
-    execute(
-        """INSERT INTO skill_project_submissions
-           (user_id, project_id, submission, feedback_json, xp_earned, passed)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (user_id, project_id, submission, json.dumps(result), xp_earned, int(passed)),
-    )
+    with transaction():
+        prior_pass = query_one(
+            "SELECT id FROM skill_project_submissions WHERE user_id = ? AND project_id = ? AND passed = 1",
+            (user_id, project_id),
+        )
+        if passed and not prior_pass:
+            from app.services.gamification import apply_progress, XP_PROJECT_PASS
+            apply_progress(user_id, XP_PROJECT_PASS, streak=True)
+            xp_earned = XP_PROJECT_PASS
+
+        execute(
+            """INSERT INTO skill_project_submissions
+               (user_id, project_id, submission, feedback_json, xp_earned, passed)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (user_id, project_id, pack(submission), pack(serialization.dumps(result)), xp_earned, int(passed)),
+        )
 
     return {
         "passed": passed,
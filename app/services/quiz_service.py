@@ -1,23 +1,50 @@
-import json
-from app.database import execute, query_one
+import asyncio
+from app import serialization
+from app.database import execute, query_one, transaction
 from app.ai import tutor
+from app.services import grader
+from app.services.singleflight import flights
 
 
-def generate_quiz(lesson_id: int) -> dict:
-    lesson = query_one("SELECT * FROM lessons WHERE id = ?", (lesson_id,))
-    content = json.loads(lesson["content_json"]) if lesson and lesson["content_json"] else {}
+async def generate_quiz(lesson_id: int) -> dict:
+    """Generate a fresh quiz for a lesson. Concurrent requests for the same lesson share one."""
+    return await flights.do(("quiz", lesson_id), lambda: _generate_quiz(lesson_id))
 
-    result = tutor.generate_quiz(content, lesson["difficulty"] or 1)
+
+async def _generate_quiz(lesson_id: int) -> dict:
+    lesson = query_one("SELECT skill_id, difficulty, content_json FROM lessons WHERE id = ?", (lesson_id,))
+    content = serialization.loads_or(lesson["content_json"], {}) if lesson else {}
+
+    result = await tutor.generate_quiz(content, lesson["difficulty"] or 1)
     questions = result.get("questions", [])
 
     quiz_id = execute(
         "INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, ?)",
-        (lesson_id, json.dumps(questions)),
+        (lesson_id, serialization.dumps(questions)),
     )
 
     return {"quiz_id": quiz_id, "skill_id": lesson["skill_id"], "questions": questions}
 
 
+async def get_or_generate_quiz(lesson_id: int, user_id: int = 1) -> dict:
+    """Return the lesson's newest quiz the user has not taken yet (e.g. a prefetched one), else generate one."""
+    row = query_one(
+        """SELECT q.* FROM quizzes q
+           WHERE q.lesson_id = ?
+             AND NOT EXISTS (SELECT 1 FROM quiz_attempts a WHERE a.quiz_id = q.id AND a.user_id = ?)
+           ORDER BY q.created_at DESC, q.id DESC LIMIT 1""",
+        (lesson_id, user_id),
+    )
+    if not row:
+        return await generate_quiz(lesson_id)
+    lesson = query_one("SELECT skill_id FROM lessons WHERE id = ?", (lesson_id,))
+    return {
+        "quiz_id": row["id"],
+        "skill_id": lesson["skill_id"] if lesson else None,
+        "questions": serialization.loads(row["questions_json"]),
+    }
+
+
 def get_quiz(lesson_id: int) -> dict | None:
     row = query_one(
         "SELECT * FROM quizzes WHERE lesson_id = ? ORDER BY created_at DESC LIMIT 1",
@@ -29,58 +56,126 @@ def get_quiz(lesson_id: int) -> dict | None:
     return {
         "quiz_id": row["id"],
         "skill_id": lesson["skill_id"] if lesson else None,
-        "questions": json.loads(row["questions_json"]),
+        "questions": serialization.loads(row["questions_json"]),
     }
 
 
-def grade_answer(question: dict, answer: str) -> dict:
-    return tutor.grade_answer(question, answer)
+async def grade_answer(question: dict, answer: str) -> dict:
+    """Grade locally when the answer is clear-cut; ask the tutor only when it is not."""
+    result = grader.grade_locally(question, answer)
+    if result is not None:
+        return result
+    return await tutor.grade_answer(question, answer)
 
 
 def submit_quiz(user_id: int, quiz_id: int, answers: dict, score: float) -> dict:
+    return _record_attempt(user_id, quiz_id, answers, score)
+
+
+def _record_attempt(user_id: int, quiz_id: int, answers: dict, score: float) -> dict:
     from app.services.gamification import (
-        add_xp, update_streak, check_achievements,
+        apply_progress, check_achievements,
         XP_CORRECT_ANSWER, XP_PERFECT_QUIZ,
     )
 
-    # Prevent double-submit
-    existing = query_one(
-        "SELECT id FROM quiz_attempts WHERE user_id = ? AND quiz_id = ?",
-        (user_id, quiz_id),
-    )
-    if existing:
-        return {"xp_earned": 0, "new_achievements": [], "already_submitted": True}
+    # One unit of work: a crash midway must not leave XP half-applied
+    with transaction():
+        # Prevent double-submit
+        existing = query_one(
+            "SELECT id FROM quiz_attempts WHERE user_id = ? AND quiz_id = ?",
+            (user_id, quiz_id),
+        )
+        if existing:
+            return {"xp_earned": 0, "new_achievements": [], "already_submitted": True}
 
-    correct_count = sum(1 for a in answers.values() if a.get("correct"))
-    total = len(answers)
+        correct_count = sum(1 for a in answers.values() if a.get("correct"))
+        total = len(answers)
 
-    xp = correct_count * XP_CORRECT_ANSWER
-    if score >= 1.0:
-        xp += XP_PERFECT_QUIZ
+        xp = correct_count * XP_CORRECT_ANSWER
+        if score >= 1.0:
+            xp += XP_PERFECT_QUIZ
 
-    execute(
-        "INSERT INTO quiz_attempts (user_id, quiz_id, answers_json, score, xp_earned) VALUES (?, ?, ?, ?, ?)",
-        (user_id, quiz_id, json.dumps(answers), score, xp),
-    )
+        execute(
+            "INSERT INTO quiz_attempts (user_id, quiz_id, answers_json, score, xp_earned) VALUES (?, ?, ?, ?, ?)",
+            (user_id, quiz_id, serialization.dumps(answers), score, xp),
+        )
 
-    execute(
-        "UPDATE user_progress SET quizzes_completed = quizzes_completed + 1 WHERE user_id = ?",
-        (user_id,),
-    )
+        apply_progress(user_id, xp, streak=True, quizzes=1)
 
-    add_xp(user_id, xp)
-    update_streak(user_id)
+        new_achievements = check_achievements(user_id, quiz_score=score)
 
-    # Check for perfect score achievement
-    if score >= 1.0:
-        try:
-            execute(
-                "INSERT OR IGNORE INTO achievements (user_id, achievement_key) VALUES (?, ?)",
-                (user_id, "perfect_score"),
-            )
-        except Exception:
-            pass
+    return {"xp_earned": xp, "new_achievements": new_achievements}
 
-    new_achievements = check_achievements(user_id)
 
-    return {"xp_earned": xp, "new_achievements": new_achievements}
+async def grade_quiz(user_id: int, quiz_id: int, answers: dict[int, str]) -> dict:
+    """Grade every answer to a quiz server-side and record the attempt.
+
+    answers maps question index to the learner's answer. Clear-cut answers
+    are graded locally; all remaining free-text answers go to the tutor in a
+    single prompt.
+    """
+    quiz = query_one("SELECT * FROM quizzes WHERE id = ?", (quiz_id,))
+    if not quiz:
+        raise ValueError("Quiz not found")
+    # Checked again when recording; this just avoids paying to grade a resubmission
+    if query_one("SELECT id FROM quiz_attempts WHERE user_id = ? AND quiz_id = ?", (user_id, quiz_id)):
+        return {"xp_earned": 0, "new_achievements": [], "already_submitted": True}
+
+    questions = serialization.loads(quiz["questions_json"])
+    results: dict[int, dict] = {}
+    free_text: dict[int, str] = {}
+    for index, question in enumerate(questions):
+        answer = (answers.get(index) or "").strip()
+        if not answer:
+            results[index] = {"answer": "", "correct": False, "feedback": "No answer given."}
+            continue
+        local = grader.grade_locally(question, answer)
+        if local is not None:
+            results[index] = {"answer": answer, **local}
+        else:
+            free_text[index] = answer
+
+    if free_text:
+        graded = await _grade_free_text({i: questions[i] for i in free_text}, free_text)
+        for index, answer in free_text.items():
+            results[index] = {"answer": answer, **graded[index]}
+
+    correct_count = sum(1 for r in results.values() if r["correct"])
+    score = correct_count / len(questions) if questions else 0.0
+    recorded = _record_attempt(user_id, quiz_id, {str(i): r for i, r in sorted(results.items())}, score)
+    return {"results": results, "score": score, "correct_count": correct_count, **recorded}
+
+
+def _valid_grade(entry) -> dict | None:
+    if not isinstance(entry, dict) or not isinstance(entry.get("correct"), bool):
+        return None
+    feedback = entry.get("feedback", "")
+    return {"correct": entry["correct"], "feedback": feedback if isinstance(feedback, str) else ""}
+
+
+async def _grade_free_text(questions: dict[int, dict], answers: dict[int, str]) -> dict[int, dict]:
+    items = [
+        {"id": str(i), "question": q["question"], "expected_answer": q.get("correct_answer", ""), "answer": answers[i]}
+        for i, q in questions.items()
+    ]
+    try:
+        response = await tutor.grade_answers(items)
+    except Exception as e:
+        print(f"Batch grading failed: {e}")
+        response = {}
+
+    graded: dict[int, dict] = {}
+    entries = response.get("results") if isinstance(response, dict) else None
+    for entry in entries if isinstance(entries, list) else []:
+        grade = _valid_grade(entry)
+        index = str(entry.get("id")) if isinstance(entry, dict) else None
+        if grade and index in {item["id"] for item in items}:
+            graded.setdefault(int(index), grade)
+
+    # Answers the batch dropped or garbled are graded one by one
+    missing = [i for i in questions if i not in graded]
+    if missing:
+        retried = await asyncio.gather(*(tutor.grade_answer(questions[i], answers[i]) for i in missing))
+        for index, result in zip(missing, retried):
+            graded[index] = _valid_grade(result) or {"correct": False, "feedback": "This answer could not be graded."}
+    return graded
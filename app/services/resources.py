@@ -1,35 +1,117 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
 import xml.etree.ElementTree as ET
+from pathlib import Path
 
 import httpx
 
+from app.config import settings
+
 _ARXIV_NS = {"atom": "http://www.w3.org/2005/Atom"}
 
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client so arXiv lookups reuse keep-alive connections."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=8.0,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _cache_path(topic: str, max_results: int) -> Path:
+    digest = hashlib.sha256(f"{topic.strip().lower()}|{max_results}".encode()).hexdigest()
+    return settings.arxiv_cache_dir / f"{digest}.json"
+
+
+def _read_cache(path: Path) -> list[dict] | None:
+    """The cached papers, or None on a miss; an unreadable or malformed entry is a miss."""
+    try:
+        entry = json.loads(path.read_text())
+        # Failures are cached too (negative caching), but only briefly
+        ttl = settings.arxiv_cache_ttl_seconds if entry["ok"] else settings.arxiv_failure_ttl_seconds
+        if time.time() - entry["fetched_at"] > ttl:
+            return None
+        return list(entry["papers"])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring arXiv cache entry {path.name}: {e}")
+        return None
+
+
+def _write_cache(path: Path, papers: list[dict], ok: bool):
+    """Best effort: the cache only saves a request, so a failed write is logged and skipped."""
+    tmp = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temp file per writer, so concurrent writes of one topic cannot collide
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+            tmp = f.name
+            json.dump({"ok": ok, "fetched_at": time.time(), "papers": papers}, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"arXiv cache write failed: {e}")
+        if tmp is not None:
+            Path(tmp).unlink(missing_ok=True)
+
+
+def _parse_feed(xml: str) -> list[dict]:
+    root = ET.fromstring(xml)
+    papers = []
+    for entry in root.findall("atom:entry", _ARXIV_NS):
+        title = entry.findtext("atom:title", "", _ARXIV_NS).strip().replace("\n", " ")
+        link = entry.findtext("atom:id", "", _ARXIV_NS).strip()
+        abstract = entry.findtext("atom:summary", "", _ARXIV_NS).strip().replace("\n", " ")
+        # Trim abstract to ~250 chars for a readable 2-line summary
+        if len(abstract) > 250:
+            abstract = abstract[:247] + "..."
+        if title and link:
+            papers.append({"title": title, "url": link, "summary": abstract})
+    return papers
+
+
+async def fetch_arxiv_papers(topic: str, max_results: int = 3) -> list[dict]:
+    """Query the arXiv API and return up to max_results relevant papers.
+
+    Results are cached on disk per topic; failures return [] and are cached
+    for a shorter time so a flaky arXiv does not stall every lesson.
+    """
+    path = _cache_path(topic, max_results)
+    cached = _read_cache(path)
+    if cached is not None:
+        return cached
 
-def fetch_arxiv_papers(topic: str, max_results: int = 3) -> list[dict]:
-    """Query the arXiv API and return up to max_results relevant papers."""
     try:
-        resp = httpx.get(
-            "https://export.arxiv.org/api/query",
+        resp = await get_http_client().get(
+            settings.arxiv_url,
             params={
                 "search_query": f'ti:"{topic}" OR abs:"{topic}"',
                 "max_results": max_results,
                 "sortBy": "relevance",
                 "sortOrder": "descending",
             },
-            timeout=8.0,
         )
-        root = ET.fromstring(resp.text)
-        papers = []
-        for entry in root.findall("atom:entry", _ARXIV_NS):
-            title = entry.findtext("atom:title", "", _ARXIV_NS).strip().replace("\n", " ")
-            link = entry.findtext("atom:id", "", _ARXIV_NS).strip()
-            abstract = entry.findtext("atom:summary", "", _ARXIV_NS).strip().replace("\n", " ")
-            # Trim abstract to ~250 chars for a readable 2-line summary
-            if len(abstract) > 250:
-                abstract = abstract[:247] + "..."
-            if title and link:
-                papers.append({"title": title, "url": link, "summary": abstract})
-        return papers
+        resp.raise_for_status()
+        papers = _parse_feed(resp.text)
     except Exception as e:
         print(f"arXiv fetch failed: {e}")
+        _write_cache(path, [], ok=False)
         return []
+
+    _write_cache(path, papers, ok=True)
+    return papers
@@ -1,5 +1,5 @@
-from datetime import datetime, timedelta
-from app.database import execute, query
+from datetime import date, datetime, timedelta, timezone
+from app.database import execute, executemany, query, transaction
 
 
 def get_review_queue(user_id: int) -> list[dict]:
@@ -14,15 +14,10 @@ def get_review_queue(user_id: int) -> list[dict]:
     return [dict(r) for r in rows]
 
 
-def rate_card(user_id: int, card_id: int, quality: int) -> dict:
-    """Update card scheduling based on SM-2 algorithm.
+def _schedule(card: dict, quality: int, reviewed_at: datetime) -> dict:
+    """Apply one SM-2 step to a card's scheduling fields.
     quality: 0=Again, 3=Hard, 4=Good, 5=Easy
     """
-    from app.database import query_one
-    card = query_one("SELECT * FROM review_cards WHERE id = ? AND user_id = ?", (card_id, user_id))
-    if not card:
-        return {"error": "Card not found"}
-
     ease_factor = card["ease_factor"] or 2.5
     interval_days = card["interval_days"] or 1
     repetitions = card["repetitions"] or 0
@@ -42,36 +37,117 @@ def rate_card(user_id: int, card_id: int, quality: int) -> dict:
     # Update ease factor
     ease_factor = max(1.3, ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
 
+    return {
+        "ease_factor": ease_factor,
+        "interval_days": interval_days,
+        "repetitions": repetitions,
+        "next_review_at": (reviewed_at + timedelta(days=interval_days)).isoformat(),
+        "last_reviewed_at": reviewed_at.isoformat(),
+    }
+
+
+_UPDATE_CARD = """UPDATE review_cards SET
+   ease_factor = ?, interval_days = ?, repetitions = ?,
+   next_review_at = ?, last_reviewed_at = ?
+   WHERE id = ?"""
+
+
+def _card_params(card_id: int, card: dict) -> tuple:
+    return (card["ease_factor"], card["interval_days"], card["repetitions"],
+            card["next_review_at"], card["last_reviewed_at"], card_id)
+
+
+def rate_card(user_id: int, card_id: int, quality: int) -> dict:
+    """Update card scheduling based on SM-2 algorithm."""
+    from app.database import query_one
+    with transaction():
+        card = query_one("SELECT * FROM review_cards WHERE id = ? AND user_id = ?", (card_id, user_id))
+        if not card:
+            return {"error": "Card not found"}
+
+        card = _schedule(card, quality, datetime.utcnow())
+        execute(_UPDATE_CARD, _card_params(card_id, card))
+
+        # Award XP for review
+        from app.services.gamification import apply_progress, check_achievements, XP_REVIEW_CARD
+        xp = XP_REVIEW_CARD if quality >= 3 else 0
+        apply_progress(user_id, xp, streak=True, reviews=1)
+
+        new_achievements = check_achievements(user_id)
+
+    return {"xp_earned": xp, "next_review_days": card["interval_days"], "new_achievements": new_achievements}
+
+
+def _utc(moment: datetime | None, now: datetime) -> datetime:
+    """Naive UTC like the rest of review_cards, and never in the future."""
+    if moment is None:
+        return now
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(moment, now)
+
+
+def rate_cards(user_id: int, ratings: list[dict]) -> dict:
+    """Apply many ratings ({card_id, quality, reviewed_at}) in one transaction.
+
+    Ratings are replayed in reviewed_at order, so a card rated twice in one
+    session gets both SM-2 steps. A rating no newer than the card's
+    last_reviewed_at was already applied (e.g. a resent offline queue) and is
+    skipped, as are unknown cards. Activity is recorded once per day the
+    ratings were made, oldest first, so ratings queued offline yesterday
+    still count towards yesterday's streak. Achievements are checked once.
+    """
+    from app.services.gamification import apply_progress, check_achievements, XP_REVIEW_CARD
     now = datetime.utcnow()
-    next_review = now + timedelta(days=interval_days)
-
-    execute(
-        """UPDATE review_cards SET
-           ease_factor = ?, interval_days = ?, repetitions = ?,
-           next_review_at = ?, last_reviewed_at = ?
-           WHERE id = ?""",
-        (ease_factor, interval_days, repetitions, next_review.isoformat(), now.isoformat(), card_id),
+    ratings = sorted(
+        ({**r, "reviewed_at": _utc(r.get("reviewed_at"), now)} for r in ratings),
+        key=lambda r: r["reviewed_at"],
     )
+    card_ids = sorted({r["card_id"] for r in ratings})
 
-    # Award XP for review
-    from app.services.gamification import add_xp, update_streak, check_achievements, XP_REVIEW_CARD
-    xp = XP_REVIEW_CARD if quality >= 3 else 0
-    if xp:
-        add_xp(user_id, xp)
+    with transaction():
+        rows = query(
+            f"""SELECT id, ease_factor, interval_days, repetitions, last_reviewed_at
+                FROM review_cards WHERE user_id = ? AND id IN ({', '.join('?' * len(card_ids))})""",
+            (user_id, *card_ids),
+        )
+        cards = {r["id"]: dict(r) for r in rows}
 
-    # Update review count
-    execute(
-        "UPDATE user_progress SET reviews_completed = reviews_completed + 1 WHERE user_id = ?",
-        (user_id,),
-    )
-    update_streak(user_id)
+        reviewed, skipped, changed, xp = 0, [], {}, 0
+        # Local day -> [reviews, xp], in the order the days were reached
+        days: dict[date, list[int]] = {}
+        for rating in ratings:
+            card = cards.get(rating["card_id"])
+            if card is None or (
+                card["last_reviewed_at"] and rating["reviewed_at"] <= datetime.fromisoformat(card["last_reviewed_at"])
+            ):
+                skipped.append(rating["card_id"])
+                continue
+            card.update(_schedule(card, rating["quality"], rating["reviewed_at"]))
+            changed[rating["card_id"]] = card
+            earned = XP_REVIEW_CARD if rating["quality"] >= 3 else 0
+            reviewed += 1
+            xp += earned
+            day = days.setdefault(rating["reviewed_at"].replace(tzinfo=timezone.utc).astimezone().date(), [0, 0])
+            day[0] += 1
+            day[1] += earned
 
-    new_achievements = check_achievements(user_id)
+        new_achievements = []
+        if changed:
+            executemany(_UPDATE_CARD, [_card_params(card_id, card) for card_id, card in changed.items()])
+            for day, (day_reviews, day_xp) in days.items():
+                apply_progress(user_id, day_xp, streak=True, reviews=day_reviews, day=day)
+            new_achievements = check_achievements(user_id)
 
-    return {"xp_earned": xp, "next_review_days": interval_days, "new_achievements": new_achievements}
+    return {
+        "reviewed": reviewed,
+        "skipped": skipped,
+        "xp_earned": xp,
+        "cards": [{"card_id": card_id, "next_review_days": card["interval_days"]} for card_id, card in changed.items()],
+        "new_achievements": new_achievements,
+    }
 
 
 def get_progress_service(user_id: int) -> dict:
-    from app.database import query_one
-    row = query_one("SELECT * FROM user_progress WHERE user_id = ?", (user_id,))
-    return dict(row) if row else {}
+    from app.services.gamification import get_progress
+    return get_progress(user_id) or {}
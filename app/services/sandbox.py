@@ -0,0 +1,194 @@
+"""Pool of pre-started sandbox workers that run learners' Python code.
+
+Each worker (see sandbox_worker.py) is a warm interpreter that forks a
+fresh, resource-limited child per run, so a run skips interpreter startup
+but never shares state with the previous one. The pool caps concurrency at
+its size and lets a bounded number of callers wait for a worker; beyond
+that, runs are rejected with SandboxBusy so the route can answer 503.
+"""
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from app.config import PROJECT_ROOT, settings
+
+
+class SandboxBusy(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+class SandboxError(Exception):
+    """A worker died or broke protocol mid-run."""
+
+
+class SandboxUnavailable(SandboxError):
+    """The workers cannot confine code on this host, so they refuse to run it."""
+
+
+class _Worker:
+    def __init__(self):
+        # A minimal environment keeps the server's API keys out of os.environ; the
+        # worker's chroot keeps .env and the database out of reach (see sandbox_worker)
+        env = {"PATH": os.environ.get("PATH", ""), "LANG": "C.UTF-8", "PYTHONIOENCODING": "utf-8"}
+        args = [sys.executable, "-m", "app.services.sandbox_worker"]
+        if settings.sandbox_allow_unconfined:
+            args.append("--allow-unconfined")
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=PROJECT_ROOT,
+            env=env,
+            text=True,
+        )
+        self.busy = False
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def events(self, request: dict) -> Iterator[dict]:
+        """Send one run to the worker and yield its output events, ending with "exit"."""
+        self.busy = True
+        try:
+            self.proc.stdin.write(json.dumps(request) + "\n")
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise SandboxError(f"Sandbox worker is gone: {e}") from e
+
+        for line in self.proc.stdout:
+            event = json.loads(line)
+            if event["event"] == "unavailable":
+                self.busy = False
+                raise SandboxUnavailable(event["detail"])
+            if event["event"] == "exit":
+                self.busy = False
+            yield event
+            if not self.busy:
+                return
+        raise SandboxError("Sandbox worker exited mid-run")
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+            self.proc.wait()
+
+
+class SandboxPool:
+    def __init__(self, size: int, queue_limit: int, queue_wait: float):
+        self.size = size
+        self.queue_limit = queue_limit
+        self.queue_wait = queue_wait
+        self.stats = {"runs": 0, "rejected": 0, "timed_out": 0, "truncated": 0, "restarted": 0}
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        # Slots for callers running or waiting; when none are left the pool is saturated
+        self._admission = threading.BoundedSemaphore(size + queue_limit)
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Spawn the workers, if they are not running yet."""
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(_Worker())
+            self._started = True
+
+    def close(self):
+        with self._lock:
+            while not self._idle.empty():
+                self._idle.get_nowait().close()
+            self._started = False
+
+    def available(self) -> int:
+        return self._idle.qsize()
+
+    @contextmanager
+    def _checkout(self) -> Iterator[_Worker]:
+        if not self._admission.acquire(blocking=False):
+            self.stats["rejected"] += 1
+            raise SandboxBusy()
+        try:
+            self.start()
+            try:
+                worker = self._idle.get(timeout=self.queue_wait)
+            except queue.Empty:
+                self.stats["rejected"] += 1
+                raise SandboxBusy() from None
+            try:
+                yield worker
+            finally:
+                # A worker abandoned mid-run still has output in its pipe
+                if worker.busy or not worker.alive():
+                    worker.proc.kill()
+                    worker.proc.wait()
+                    worker = _Worker()
+                    self.stats["restarted"] += 1
+                self._idle.put(worker)
+        finally:
+            self._admission.release()
+
+    def stream(self, code: str, timeout: float | None = None, memory_mb: int | None = None,
+               max_output: int | None = None) -> Iterator[dict]:
+        """Run code in a worker, yielding its events as the code produces output.
+
+        Yields {"event": "output", "stream": "stdout" | "stderr", "data": ...}
+        any number of times, then {"event": "exit", "code", "timed_out",
+        "truncated"}. The run is killed as soon as it passes `timeout` seconds
+        or `max_output` bytes of output.
+
+        A worker is checked out before this returns, so SandboxBusy is raised
+        here rather than on first iteration. Closing the iterator early kills
+        the run and replaces the worker.
+        """
+        request = {
+            "code": code,
+            "timeout": timeout or settings.sandbox_timeout_seconds,
+            "memory_mb": memory_mb or settings.sandbox_memory_mb,
+            "max_output": max_output or settings.sandbox_max_output_bytes,
+        }
+        events = self._stream(request)
+        next(events)
+        return events
+
+    def _stream(self, request: dict) -> Iterator[dict | None]:
+        with self._checkout() as worker:
+            yield None
+            for event in worker.events(request):
+                if event["event"] == "exit":
+                    self.stats["runs"] += 1
+                    self.stats["timed_out"] += event["timed_out"]
+                    self.stats["truncated"] += event["truncated"]
+                yield event
+
+    def run(self, code: str, timeout: float | None = None, memory_mb: int | None = None,
+            max_output: int | None = None) -> dict:
+        """Run code to completion and return its stdout, stderr, exit_code, timed_out and truncated.
+
+        Blocks for up to queue_wait seconds for a free worker; raises
+        SandboxBusy if none frees up or too many callers are already waiting.
+        """
+        output = {"stdout": [], "stderr": []}
+        for event in self.stream(code, timeout, memory_mb, max_output):
+            if event["event"] == "output":
+                output[event["stream"]].append(event["data"])
+            else:
+                exit_event = event
+        return {
+            "stdout": "".join(output["stdout"]),
+            "stderr": "".join(output["stderr"]),
+            "exit_code": exit_event["code"],
+            "timed_out": exit_event["timed_out"],
+            "truncated": exit_event["truncated"],
+        }
+
+
+pool = SandboxPool(settings.sandbox_workers, settings.sandbox_queue_limit, settings.sandbox_queue_wait_seconds)
@@ -0,0 +1,376 @@
+"""Sandbox worker: a warm interpreter that forks a jailed child for each run.
+
+Started by SandboxPool as `python -m app.services.sandbox_worker` and uses
+only the standard library, so it starts quickly and shares nothing with the
+server. Requests arrive as one JSON object per line on stdin:
+
+    {"code": "...", "timeout": 10, "memory_mb": 256, "max_output": 65536}
+
+and each run answers with JSON lines on stdout:
+
+    {"event": "output", "stream": "stdout" | "stderr", "data": "..."}  (any number)
+    {"event": "exit", "code": 0, "timed_out": false, "truncated": false}
+
+or, if the worker cannot confine runs (see below), with just:
+
+    {"event": "unavailable", "detail": "..."}
+
+Forking from an interpreter that has already started and imported the
+common modules makes a run cost about a millisecond instead of a fresh
+interpreter start, and every run still gets a clean process.
+
+Each child gets its own user, network, mount and PID namespaces and is
+chrooted into a throwaway directory holding only the interpreter's import
+path (bind-mounted read-only) and a writable /tmp, so the project directory,
+its .env and the database are out of reach. The learner's code runs as PID 1
+of its namespace, so killing it kills everything it spawned, and it may
+start at most MAX_PROCESSES processes. A worker running as root runs code
+as an unprivileged user, since root is exempt from that limit.
+
+Where the kernel does not allow unprivileged namespaces the worker refuses
+to run code, unless started with --allow-unconfined; runs then only change
+into the throwaway directory and can read any file by absolute path.
+"""
+import codecs
+import ctypes
+import json
+import linecache
+import os
+import resource
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+# Warmed up before the first fork so exercises importing them pay nothing
+PRELOAD = (
+    "bisect", "collections", "dataclasses", "datetime", "functools", "heapq", "itertools",
+    "math", "random", "re", "statistics", "string", "typing",
+)
+
+_CLONE_NEWNS = 0x00020000
+_CLONE_NEWPID = 0x20000000
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_MS_RDONLY = 0x1
+_MS_REMOUNT = 0x20
+_MS_BIND = 0x1000
+_MS_REC = 0x4000
+_MS_PRIVATE = 0x40000
+# Mount flags a read-only remount has to keep (an unprivileged remount that
+# drops one is refused), keyed by the statvfs flag that reports them
+_KEPT_FLAGS = {
+    os.ST_NOSUID: 0x2, os.ST_NODEV: 0x4, os.ST_NOEXEC: 0x8,
+    os.ST_NOATIME: 0x400, os.ST_NODIRATIME: 0x800, os.ST_RELATIME: 0x200000,
+}
+_DEVICES = ("/dev/null", "/dev/zero", "/dev/urandom")
+_NAMESPACES = _CLONE_NEWUSER | _CLONE_NEWNET | _CLONE_NEWNS | _CLONE_NEWPID
+_PR_SET_PDEATHSIG = 1
+# Who a root worker's runs become (see _map_ids): root is exempt from RLIMIT_NPROC
+_UNPRIVILEGED_ID = 65534
+# Processes a confined run may have at once, counted within its namespace
+MAX_PROCESSES = 32
+_FILENAME = "<exercise>"
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+except OSError:
+    _libc = None
+
+
+# What learner code may import; set by main() from the worker's sys.path,
+# leaving out the project directory it was started in
+_import_paths: list[str] = []
+# Set by main(): whether runs can be confined, and whether to run them anyway if not
+_confinable = False
+_allow_unconfined = False
+
+
+def _mount(source: str | None, target: str, flags: int):
+    if _libc.mount(source and source.encode(), target.encode(), None, flags, None) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno), target)
+
+
+def _bind(source: str, target: str, read_only: bool):
+    if os.path.isdir(source):
+        os.makedirs(target, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        open(target, "a").close()
+    _mount(source, target, _MS_BIND | _MS_REC)
+    if read_only:
+        kept = sum(flag for st, flag in _KEPT_FLAGS.items() if os.statvfs(source).f_flag & st)
+        _mount(None, target, _MS_BIND | _MS_REMOUNT | _MS_RDONLY | kept)
+
+
+def _confine(jail: str, sync: int | None) -> bool:
+    """Chroot the child into the jail inside fresh user, network, mount and PID namespaces.
+
+    The PID namespace applies to the child's children: the caller must fork
+    the process that runs the code. Returns False, having changed nothing,
+    where the kernel refuses the namespaces. A failure after that raises, so
+    code never runs half-confined.
+
+    Without `sync`, namespace root is the worker's own user. With it (a root
+    worker), the worker maps namespace root to _UNPRIVILEGED_ID once told
+    over `sync`, and the child switches to that user after mounting.
+    """
+    uid, gid = os.getuid(), os.getgid()
+    if _libc is None or _libc.unshare(_NAMESPACES) != 0:
+        return False
+    if sync is None:
+        for name, mapping in (("setgroups", "deny"), ("uid_map", f"0 {uid} 1"), ("gid_map", f"0 {gid} 1")):
+            with open(f"/proc/self/{name}", "w") as f:
+                f.write(mapping)
+    else:
+        os.write(sync, b"u")
+        if os.read(sync, 1) != b"m":
+            raise OSError("the worker did not map the sandbox user")
+    # Keep the mounts below out of the worker's view
+    _mount(None, "/", _MS_REC | _MS_PRIVATE)
+    for path in _import_paths:
+        _bind(path, jail + path, read_only=True)
+    for device in _DEVICES:
+        if os.path.exists(device):
+            _bind(device, jail + device, read_only=False)
+    if sync is not None:
+        # Mounting needed root's access to the import path; the code gets none of it
+        os.setgroups([])
+        os.setgid(0)
+        os.setuid(0)
+    os.makedirs(jail + "/tmp")
+    os.chroot(jail)
+    os.chdir("/tmp")
+    return True
+
+
+def _map_ids(pid: int, sync: socket.socket):
+    """For a root worker: map the child's namespace root to _UNPRIVILEGED_ID."""
+    if sync.recv(1) != b"u":
+        return  # The child could not create its namespaces
+    for name in ("uid_map", "gid_map"):
+        with open(f"/proc/{pid}/{name}", "w") as f:
+            f.write(f"0 {_UNPRIVILEGED_ID} 1")
+    sync.send(b"m")
+
+
+def namespaces_available() -> bool:
+    """Whether children can be confined (see _confine) on this kernel."""
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if _libc is not None and _libc.unshare(_NAMESPACES) == 0 else 1)
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+
+
+def _deny_network(namespaced: bool):
+    """Cut the child off from the network.
+
+    A fresh user + network namespace leaves only a downed loopback device.
+    Unconfined runs (--allow-unconfined on a kernel without namespaces) only
+    get socket creation stubbed out, which code importing _socket bypasses.
+    """
+    if not namespaced:
+        try:
+            _libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET)
+        except AttributeError:
+            pass
+
+    def blocked(*args, **kwargs):
+        raise PermissionError("Network access is disabled in the sandbox")
+
+    socket.socket = blocked
+    socket.create_connection = blocked
+    socket.getaddrinfo = blocked
+
+
+def _limit(timeout: float, memory_mb: int, confined: bool):
+    cpu = int(timeout) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    memory = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (10 * 1024 * 1024, 10 * 1024 * 1024))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if confined:
+        # Outside a user namespace this would count every process of the server's user
+        resource.setrlimit(resource.RLIMIT_NPROC, (MAX_PROCESSES, MAX_PROCESSES))
+
+
+def _child(request: dict, jail: str, out_w: int, err_w: int, sync: int | None):
+    # Own process group, so a timeout kills anything the code spawned too
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(out_w, 1)
+    os.dup2(err_w, 2)
+    if sync is not None:
+        sync = os.dup2(sync, 3)
+    # Drop everything else inherited from the worker, including its protocol pipe
+    os.closerange(3 if sync is None else 4, 256)
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+
+    try:
+        confined = _confine(jail, sync)
+    except OSError as e:
+        print(f"Sandbox setup failed: {e}", file=sys.stderr)
+        os._exit(1)
+    if not confined:
+        if not _allow_unconfined:
+            print("Sandbox setup failed: namespaces are unavailable", file=sys.stderr)
+            os._exit(1)
+        os.chdir(jail)
+    elif os.fork() != 0:
+        _reap()
+    else:
+        # PID 1 of the new namespace: when it dies, the kernel kills every
+        # process it left behind, and it dies with this parent (the one the
+        # worker kills at the timeout)
+        _libc.prctl(_PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0)
+    home = os.getcwd()
+    os.environ.update(HOME=home, TMPDIR=home)
+    tempfile.tempdir = home
+    _limit(request["timeout"], request["memory_mb"], confined)
+    _deny_network(confined)
+
+    code = request["code"]
+    # Lets tracebacks quote the learner's source lines
+    linecache.cache[_FILENAME] = (len(code), None, code.splitlines(True), _FILENAME)
+    exit_code = 0
+    try:
+        exec(compile(code, _FILENAME, "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            exit_code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Skip this frame so the traceback starts in the learner's code
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(exit_code)
+
+
+def _reap():
+    """Wait for the namespace's PID 1 and exit the way it did."""
+    _, status = os.waitpid(-1, 0)
+    if os.WIFSIGNALED(status):
+        signal.signal(os.WTERMSIG(status), signal.SIG_DFL)
+        os.kill(os.getpid(), os.WTERMSIG(status))
+    os._exit(os.waitstatus_to_exitcode(status))
+
+
+def _send(out, event: dict):
+    out.write(json.dumps(event) + "\n")
+    out.flush()
+
+
+def _run(request: dict, out):
+    if not (_confinable or _allow_unconfined):
+        _send(out, {"event": "unavailable", "detail": "Code execution is unavailable: this server cannot sandbox it"})
+        return
+    jail = tempfile.mkdtemp(prefix="run-")
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    as_root = os.getuid() == 0 and _confinable
+    if as_root:
+        os.chown(jail, _UNPRIVILEGED_ID, _UNPRIVILEGED_ID)
+        sync, child_sync = socket.socketpair()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(out_r)
+            os.close(err_r)
+            _child(request, jail, out_w, err_w, child_sync.fileno() if as_root else None)
+        finally:
+            os._exit(1)
+
+    os.close(out_w)
+    os.close(err_w)
+    if as_root:
+        child_sync.close()
+        try:
+            _map_ids(pid, sync)
+        except OSError:
+            pass  # The child sees the socket close and gives up
+        finally:
+            sync.close()
+    streams = {out_r: "stdout", err_r: "stderr"}
+    decoders = {fd: codecs.getincrementaldecoder("utf-8")("replace") for fd in streams}
+    deadline = time.monotonic() + request["timeout"]
+    budget = request["max_output"]
+    timed_out = truncated = False
+
+    # Output is forwarded as soon as it is read; hitting the deadline or the
+    # output cap kills the run immediately rather than letting it finish
+    while streams and not (timed_out or truncated):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select(list(streams), [], [], remaining)
+        for fd in ready:
+            data = os.read(fd, 65536)
+            if not data:
+                os.close(fd)
+                del streams[fd]
+                continue
+            if len(data) > budget:
+                data, truncated = data[:budget], True
+            budget -= len(data)
+            text = decoders[fd].decode(data, final=truncated)
+            if text:
+                _send(out, {"event": "output", "stream": streams[fd], "data": text})
+            if truncated:
+                break
+
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    for fd in streams:
+        os.close(fd)
+    _, status = os.waitpid(pid, 0)
+    shutil.rmtree(jail, ignore_errors=True)
+    _send(out, {
+        "event": "exit",
+        "code": os.waitstatus_to_exitcode(status),
+        "timed_out": timed_out,
+        "truncated": truncated,
+    })
+
+
+def main():
+    global _confinable, _allow_unconfined
+    for name in PRELOAD:
+        __import__(name)
+    cwd = os.getcwd()
+    _import_paths.extend(p for p in sys.path if p and os.path.abspath(p) != cwd and os.path.exists(p))
+    _confinable = namespaces_available()
+    _allow_unconfined = "--allow-unconfined" in sys.argv[1:]
+    if not _confinable:
+        print("Sandbox: unprivileged namespaces are unavailable; " + (
+            "running code UNCONFINED, it can read any file the server can" if _allow_unconfined
+            else "refusing to run code (set sandbox_allow_unconfined to override)"
+        ), file=sys.stderr)
+
+    # Keep the protocol stream private: anything else printing to fd 1 goes to stderr
+    out = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+
+    for line in sys.stdin:
+        _run(json.loads(line), out)
+
+
+if __name__ == "__main__":
+    main()
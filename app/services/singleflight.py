@@ -0,0 +1,40 @@
+"""Request coalescing: concurrent callers for the same resource share one generation."""
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from functools import partial
+from typing import Any
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> asyncio.Future | None:
+        return self._calls.get(key)
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Return the running call for key, starting fn() first if there is none.
+
+        Registration is synchronous, so a caller that checks in_flight() and
+        then calls start() without awaiting in between cannot race another.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(partial(self._forget, key))
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Shield so one caller disconnecting does not cancel everyone else's result
+        return await asyncio.shield(self.start(key, fn))
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved; awaiting callers still see it
+
+
+# Shared by every service so keys like ("lesson", id) coalesce across entry points
+flights = SingleFlight()
@@ -0,0 +1,21 @@
+from collections.abc import AsyncIterable, Iterable
+
+from fastapi.responses import StreamingResponse
+
+from app import serialization
+
+
+def format_event(data: dict, event: str | None = None) -> str:
+    """Encode one Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {serialization.dumps(data)}\n\n"
+
+
+def event_stream(events: AsyncIterable[str] | Iterable[str]) -> StreamingResponse:
+    """Stream SSE frames; a plain iterator is advanced in the threadpool, so it may block."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Disable proxy buffering so each frame reaches the browser immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
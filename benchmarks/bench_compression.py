@@ -0,0 +1,105 @@
+"""Report DB size and read latency before and after compressing large TEXT columns.
+
+Usage: python -m benchmarks.bench_compression [--lessons 2000] [--repeats 2000]
+
+Builds a throwaway database with plaintext rows (~8k-token lessons,
+cheat sheets, project submissions and feedback), measures it, applies the
+migration-6 compression step in place, VACUUMs, and measures again. Reads go
+through the app's query path, so they include decoding and JSON parsing.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app import serialization
+from app.config import settings
+from app.database import _compress_columns, close_db, get_db, query, query_one, transaction
+from benchmarks.bench_serialization import CODE, _prose, make_lesson
+
+LESSONS_PER_SKILL = 10
+
+
+def _populate(db, lessons: int):
+    rng = random.Random(3)
+    skills = max(1, lessons // LESSONS_PER_SKILL)
+    db.executemany(
+        "INSERT INTO skills (id, user_id, name, cheatsheet) VALUES (?, 1, 'Skill', ?)",
+        [(s, f"# Cheat sheet\n\n{_prose(rng, 600)}\n\n```python\n{CODE}```") for s in range(1, skills + 1)],
+    )
+    # A handful of distinct lessons, re-seeded so rows do not compress against each other
+    db.executemany(
+        "INSERT INTO lessons (skill_id, topic, order_index, content_json) VALUES (?, 'Topic', ?, ?)",
+        [(i // LESSONS_PER_SKILL + 1, i % LESSONS_PER_SKILL, serialization.dumps(make_lesson(8000, seed=i)))
+         for i in range(lessons)],
+    )
+    db.executemany("INSERT INTO skill_projects (skill_id, description_json) VALUES (?, '{}')",
+                   [(s,) for s in range(1, skills + 1)])
+    db.executemany(
+        "INSERT INTO skill_project_submissions (user_id, project_id, submission, feedback_json) VALUES (1, ?, ?, ?)",
+        [(s, (CODE + _prose(rng, 40) + "\n") * 25,
+          serialization.dumps({"passed": False, "feedback": _prose(rng, 250), "strengths": [_prose(rng, 20)] * 3}))
+         for s in range(1, skills + 1) for _ in range(3)],
+    )
+    db.commit()
+
+
+def _size(db, path: Path) -> int:
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.execute("VACUUM")
+    return path.stat().st_size
+
+
+def _read_latency(lessons: int, repeats: int) -> dict[str, float]:
+    rng = random.Random(11)
+    ids = [rng.randint(1, lessons) for _ in range(repeats)]
+    skills = max(1, lessons // LESSONS_PER_SKILL)
+
+    start = time.perf_counter()
+    for lesson_id in ids:
+        serialization.loads(query_one("SELECT content_json FROM lessons WHERE id = ?", (lesson_id,))["content_json"])
+    one = (time.perf_counter() - start) / repeats * 1000
+
+    # The cheat-sheet builder reads every lesson of a skill
+    start = time.perf_counter()
+    for lesson_id in ids[: repeats // 10]:
+        skill_id = (lesson_id - 1) % skills + 1
+        for row in query("SELECT content_json FROM lessons WHERE skill_id = ? ORDER BY order_index", (skill_id,)):
+            serialization.loads(row["content_json"])
+    per_skill = (time.perf_counter() - start) / max(1, repeats // 10) * 1000
+    return {"lesson read (ms)": one, "skill scan (ms)": per_skill}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lessons", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        settings.db_path = path
+        settings.db_compression = False
+        db = get_db()
+
+        print(f"Populating {args.lessons:,} lessons...")
+        _populate(db, args.lessons)
+        before = {"db size (MB)": _size(db, path) / 1e6, **_read_latency(args.lessons, args.repeats)}
+
+        settings.db_compression = True
+        start = time.perf_counter()
+        with transaction() as tx:
+            _compress_columns(tx)
+        migrate = time.perf_counter() - start
+        after = {"db size (MB)": _size(db, path) / 1e6, **_read_latency(args.lessons, args.repeats)}
+        close_db()
+
+    print(f"Compressed in place in {migrate:.1f}s\n")
+    print(f"{'':<20}{'plaintext':>12}{'compressed':>12}{'ratio':>8}")
+    for name in before:
+        print(f"{name:<20}{before[name]:>12.3f}{after[name]:>12.3f}{after[name] / before[name]:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
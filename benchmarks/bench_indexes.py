@@ -0,0 +1,136 @@
+"""Time the hot read queries with and without the migration-2 indexes.
+
+Usage: python -m benchmarks.bench_indexes [--rows 1000000] [--users 1000]
+
+Builds a throwaway database with --rows review cards and --rows chat
+messages spread across --users users, then times each query before and
+after the indexes exist.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.config import settings
+from app.database import MIGRATIONS, close_db, get_db
+
+QUERIES = {
+    "review queue": (
+        """SELECT rc.*, l.topic AS lesson_topic FROM review_cards rc
+           LEFT JOIN lessons l ON rc.lesson_id = l.id
+           WHERE rc.user_id = ? AND rc.next_review_at <= datetime('now')
+           ORDER BY rc.next_review_at""",
+        lambda user, skill: (user,),
+    ),
+    "chat history": (
+        "SELECT role, content FROM chat_messages WHERE user_id = ? AND skill_id = ? ORDER BY created_at",
+        lambda user, skill: (user, skill),
+    ),
+    "lessons by skill": (
+        "SELECT * FROM lessons WHERE skill_id = ? ORDER BY order_index",
+        lambda user, skill: (skill,),
+    ),
+    "latest quiz": (
+        "SELECT * FROM quizzes WHERE lesson_id = ? ORDER BY created_at DESC LIMIT 1",
+        lambda user, skill: (skill * 10,),
+    ),
+    "quiz activity chart": (
+        """SELECT date(completed_at) as day, COUNT(*) as count FROM quiz_attempts
+           WHERE user_id = ? AND completed_at >= date('now', '-30 days') GROUP BY day""",
+        lambda user, skill: (user,),
+    ),
+}
+
+
+def _populate(db, rows: int, users: int):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    skills_per_user = 3
+    lessons_per_skill = 10
+
+    db.executemany("INSERT INTO users (id, name) VALUES (?, 'Learner')", [(u,) for u in range(2, users + 1)])
+    db.executemany(
+        "INSERT INTO skills (id, user_id, name) VALUES (?, ?, 'Skill')",
+        [(u * skills_per_user + s, u) for u in range(1, users + 1) for s in range(skills_per_user)],
+    )
+    skill_ids = [r[0] for r in db.execute("SELECT id FROM skills")]
+    db.executemany(
+        "INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Topic', ?)",
+        [(s, i) for s in skill_ids for i in range(lessons_per_skill)],
+    )
+    lesson_count = db.execute("SELECT COUNT(*) FROM lessons").fetchone()[0]
+    db.executemany(
+        "INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, '[]')",
+        [(l,) for l in range(1, lesson_count + 1)],
+    )
+
+    def stamp():
+        return (now + timedelta(minutes=rng.randint(-60 * 24 * 60, 60 * 24 * 30))).isoformat(sep=" ", timespec="seconds")
+
+    batch = 50_000
+    for start in range(0, rows, batch):
+        n = min(batch, rows - start)
+        db.executemany(
+            "INSERT INTO review_cards (user_id, lesson_id, question, answer, next_review_at) VALUES (?, ?, 'Q?', 'A.', ?)",
+            [(rng.randint(1, users), rng.randint(1, lesson_count), stamp()) for _ in range(n)],
+        )
+        db.executemany(
+            "INSERT INTO chat_messages (user_id, skill_id, role, content, created_at) VALUES (?, ?, 'user', 'Hello tutor', ?)",
+            [(u, u * skills_per_user + rng.randrange(skills_per_user), stamp())
+             for u in (rng.randint(1, users) for _ in range(n))],
+        )
+        db.executemany(
+            "INSERT INTO quiz_attempts (user_id, quiz_id, answers_json, score, completed_at) VALUES (?, ?, '{}', 0.75, ?)",
+            [(rng.randint(1, users), rng.randint(1, lesson_count), stamp()) for _ in range(n // 10)],
+        )
+        db.commit()
+
+
+def _time_queries(db, users: int, repeats: int) -> dict[str, float]:
+    rng = random.Random(7)
+    samples = [(u, u * 3 + rng.randrange(3)) for u in (rng.randint(1, users) for _ in range(repeats))]
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        start = time.perf_counter()
+        for user, skill in samples:
+            db.execute(sql, params(user, skill)).fetchall()
+        results[name] = (time.perf_counter() - start) / repeats * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    index_steps = {v: steps for v, _, steps in MIGRATIONS}[2]
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.db_path = Path(tmp) / "bench.db"
+        db = get_db()
+
+        print(f"Populating {args.rows:,} review cards and chat messages...")
+        _populate(db, args.rows, args.users)
+
+        for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+            db.execute(f"DROP INDEX {name}")
+        db.execute("ANALYZE")
+        before = _time_queries(db, args.users, args.repeats)
+
+        for step in index_steps:
+            db.execute(step)
+        db.execute("ANALYZE")
+        db.commit()
+        after = _time_queries(db, args.users, args.repeats)
+        close_db()
+
+    print(f"\n{'query':<22}{'no index (ms)':>15}{'indexed (ms)':>15}{'speedup':>10}")
+    for name in QUERIES:
+        print(f"{name:<22}{before[name]:>15.2f}{after[name]:>15.3f}{before[name] / after[name]:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Time level_from_xp against the old level-by-level walk.
+
+Usage: python -m benchmarks.bench_levels [--repeats 2000]
+
+Times both for learners at a range of levels; the walk costs one pow() per
+level below the learner's, the table lookup a bisect over it.
+"""
+import argparse
+import math
+import time
+
+from app.services.gamification import level_from_xp, xp_for_level
+
+
+def _walk(total_xp: int) -> int:
+    level = 1
+    while round(100 * math.pow(level + 1, 1.5)) <= total_xp:
+        level += 1
+    return level
+
+
+def _time(fn, xp: int, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(xp)
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'level':>7}{'total xp':>14}{'walk (µs)':>12}{'table (µs)':>12}{'speedup':>10}")
+    for level in (5, 20, 100, 500, 2000, 10_000):
+        xp = xp_for_level(level) + 1
+        assert _walk(xp) == level_from_xp(xp) == level
+        walk = _time(_walk, xp, max(1, args.repeats // level * 10))
+        table = _time(level_from_xp, xp, args.repeats)
+        print(f"{level:>7,}{xp:>14,}{walk:>12.2f}{table:>12.2f}{walk / table:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
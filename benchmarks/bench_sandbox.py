@@ -0,0 +1,77 @@
+"""Compare code-run throughput: a fresh interpreter per run vs the sandbox pool.
+
+Usage: python -m benchmarks.bench_sandbox [--runs 200] [--concurrency 4] [--workers 4]
+
+Runs the same small exercise --runs times from --concurrency threads, first
+the way /api/exercises/run used to (temp file + new sys.executable process),
+then through a SandboxPool of --workers pre-started workers.
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.sandbox import SandboxPool
+
+EXERCISE = """
+import math
+from collections import Counter
+
+words = "the quick brown fox jumps over the lazy dog the end".split()
+print(Counter(words).most_common(2))
+print(round(math.sqrt(sum(len(w) for w in words)), 3))
+"""
+
+
+def _subprocess_run(code: str) -> str:
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=True) as f:
+        f.write(code)
+        f.flush()
+        return subprocess.run([sys.executable, f.name], capture_output=True, text=True, timeout=10).stdout
+
+
+def _throughput(run, runs: int, concurrency: int) -> tuple[float, float]:
+    """Return (runs per second, mean latency in ms)."""
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        run(EXERCISE)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(timed, range(runs)))
+    elapsed = time.perf_counter() - start
+    return runs / elapsed, sum(latencies) / len(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    pool = SandboxPool(size=args.workers, queue_limit=args.concurrency, queue_wait=30)
+    pool.start()
+    assert pool.run(EXERCISE)["stdout"] == _subprocess_run(EXERCISE)
+
+    results = {
+        "subprocess per run": _throughput(_subprocess_run, args.runs, args.concurrency),
+        "sandbox pool": _throughput(lambda code: pool.run(code), args.runs, args.concurrency),
+    }
+    pool.close()
+
+    print(f"{args.runs} runs, {args.concurrency} concurrent, {args.workers} pool workers\n")
+    print(f"{'approach':<22}{'runs/sec':>10}{'mean (ms)':>12}")
+    for name, (rate, latency) in results.items():
+        print(f"{name:<22}{rate:>10.1f}{latency:>12.1f}")
+    base = results["subprocess per run"][0]
+    print(f"\nspeedup: {results['sandbox pool'][0] / base:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
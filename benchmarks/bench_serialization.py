@@ -0,0 +1,118 @@
+"""Time encoding and decoding of a realistic ~8k-token lesson with each JSON backend.
+
+Usage: python -m benchmarks.bench_serialization [--tokens 8000] [--repeats 2000]
+
+Builds a lesson shaped like the tutor's output (sections of markdown prose
+with code, key points, exercises, resources) sized to about --tokens
+tokens, then times json.dumps/json.loads as the services used to call them,
+the stdlib compact fallback, and orjson if it is installed.
+"""
+import argparse
+import json
+import random
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WORDS = (
+    "variable function loop value list dictionary return iterate index string integer "
+    "closure scope recursion generator yield exception module import class instance "
+    "attribute method argument parameter default keyword comprehension slice tuple set"
+).split()
+CODE = '''def running_total(values):
+    total = 0
+    for value in values:
+        total += value
+        yield total
+
+print(list(running_total([3, 1, 4, 1, 5])))  # → [3, 4, 8, 9, 14]
+'''
+
+
+def _prose(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        n = rng.randint(8, 20)
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + ".")
+        words -= n
+    return " ".join(sentences)
+
+
+def make_lesson(tokens: int, seed: int = 1) -> dict:
+    """A lesson dict of roughly `tokens` tokens (about four characters each)."""
+    rng = random.Random(seed)
+    lesson = {
+        "title": "Generators and lazy iteration",
+        "objective": _prose(rng, 25),
+        "sections": [],
+        "key_points": [_prose(rng, 15) for _ in range(6)],
+        "exercises": [
+            {
+                "title": f"Exercise {i + 1}",
+                "instructions": _prose(rng, 60),
+                "starter_code": CODE.replace("total", f"total_{i}"),
+                "solution": CODE,
+                "hints": [_prose(rng, 12) for _ in range(3)],
+            }
+            for i in range(3)
+        ],
+        "summary": _prose(rng, 60),
+        "resources": [
+            {"title": _prose(rng, 8), "url": f"https://arxiv.org/abs/2401.{i:05d}", "authors": ["A. Author", "B. Writer"]}
+            for i in range(5)
+        ],
+    }
+    while len(json.dumps(lesson)) < tokens * 4:
+        heading = _prose(rng, 5)
+        lesson["sections"].append({
+            "heading": heading,
+            "content": f"## {heading}\n\n{_prose(rng, 150)}\n\n```python\n{CODE}```\n\n{_prose(rng, 80)}",
+        })
+    return lesson
+
+
+def _time(fn, repeats: int, rounds: int = 5) -> float:
+    """Microseconds per call, best of `rounds` to damp scheduler noise."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=8000)
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args()
+
+    lesson = make_lesson(args.tokens)
+    backends = {
+        "json (previous)": (json.dumps, json.loads),
+        "json compact": (lambda o: json.dumps(o, separators=(",", ":")), json.loads),
+    }
+    if orjson:
+        backends["orjson"] = (lambda o: orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode(), orjson.loads)
+    else:
+        print("orjson is not installed; only the stdlib backends are timed")
+
+    print(f"\nLesson: {len(lesson['sections'])} sections, ~{len(json.dumps(lesson)) // 4:,} tokens")
+    print(f"\n{'backend':<18}{'bytes':>9}{'encode (µs)':>14}{'decode (µs)':>14}")
+    baseline = None
+    for name, (dumps, loads) in backends.items():
+        text = dumps(lesson)
+        assert loads(text) == lesson
+        encode = _time(lambda: dumps(lesson), args.repeats)
+        decode = _time(lambda: loads(text), args.repeats)
+        baseline = baseline or (encode, decode)
+        print(f"{name:<18}{len(text.encode()):>9,}{encode:>14.1f}{decode:>14.1f}"
+              f"   ({baseline[0] / encode:.1f}x / {baseline[1] / decode:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 const API = {
+    // Error for a failed response; .status lets callers tell a rejected
+    // request (4xx) from one worth retrying.
+    async _error(res) {
+        const err = await res.json().catch(() => ({ detail: res.statusText }));
+        const error = new Error(err.detail || 'Request failed');
+        error.status = res.status;
+        return error;
+    },
+
     async get(path) {
         const res = await fetch('/api' + path);
-        if (!res.ok) {
-            const err = await res.json().catch(() => ({ detail: res.statusText }));
-            throw new Error(err.detail || 'Request failed');
-        }
+        if (!res.ok) throw await this._error(res);
         return res.json();
     },
 
@@ -14,10 +20,38 @@ const API = {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(data),
         });
-        if (!res.ok) {
-            const err = await res.json().catch(() => ({ detail: res.statusText }));
-            throw new Error(err.detail || 'Request failed');
-        }
+        if (!res.ok) throw await this._error(res);
         return res.json();
     },
+
+    // POST and consume a Server-Sent Events response, calling
+    // onEvent(event, data) for every frame. Resolves when the stream ends.
+    async stream(path, data, onEvent) {
+        const res = await fetch('/api' + path, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body: JSON.stringify(data),
+        });
+        if (!res.ok) throw await this._error(res);
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                let event = 'message';
+                let payload = '';
+                for (const line of frame.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) payload += line.slice(6);
+                }
+                if (payload) onEvent(event, JSON.parse(payload));
+            }
+        }
+    },
 };
@@ -76,16 +76,9 @@ function app() {
             setTimeout(() => { this.achievementModal = null; }, 4000);
         },
 
-        xpForNextLevel(level) {
-            return Math.round(100 * Math.pow(level + 1, 1.5));
-        },
-
         xpProgress(progress) {
-            const currentLevelXp = Math.round(100 * Math.pow(progress.level, 1.5));
-            const nextLevelXp = this.xpForNextLevel(progress.level);
-            const range = nextLevelXp - currentLevelXp;
-            const current = progress.total_xp - currentLevelXp;
-            return Math.min(100, Math.max(0, (current / range) * 100));
+            // The level curve lives server-side; /progress reports how far into the level we are
+            return Math.min(100, Math.max(0, (progress.level_progress || 0) * 100));
         },
     };
 }
@@ -130,6 +123,9 @@ function skillPicker() {
                     curriculum: this.curriculum.topics,
                 });
                 window._navigate('/skills/' + skill.id);
+                if (skill.new_achievements?.length > 0) {
+                    setTimeout(() => window._showAchievement(skill.new_achievements[0]), 300);
+                }
             } catch (e) {
                 this.error = e.message || 'Failed to create skill. Please try again.';
             }
@@ -141,7 +137,6 @@ function skillDetail() {
     return {
         skill: null,
         lessons: [],
-        loadingLesson: false,
         completedCount: 0,
         error: null,
         showDeleteConfirm: false,
@@ -190,24 +185,9 @@ function skillDetail() {
             }
         },
 
-        async startLesson(lesson, index) {
-            if (lesson.content_json) {
-                window._navigate('/lessons/' + lesson.id);
-                return;
-            }
-            this.loadingLesson = true;
-            this.error = null;
-            try {
-                const generated = await API.post('/lessons/generate', {
-                    skill_id: this.skill.id,
-                    lesson_id: lesson.id,
-                });
-                window._navigate('/lessons/' + generated.id);
-            } catch (e) {
-                this.error = 'Failed to generate lesson. Please try again.';
-            } finally {
-                this.loadingLesson = false;
-            }
+        startLesson(lesson, index) {
+            // Lessons without content are generated (and streamed in) by the lesson view
+            window._navigate('/lessons/' + lesson.id);
         },
 
         async deleteSkill() {
@@ -333,6 +313,7 @@ function lessonView() {
         content: null,
         renderedContent: '',
         loading: true,
+        generating: false,
         quizLoading: false,
         error: null,
         alreadyCompleted: false,
@@ -382,13 +363,14 @@ function lessonView() {
                 this.lesson = await API.get('/lessons/' + id);
                 if (this.lesson.error) throw new Error(this.lesson.error);
                 this.alreadyCompleted = this.lesson.status === 'completed';
-                this.content = JSON.parse(this.lesson.content_json || '{}');
-                this.renderedContent = this.renderLessonContent(this.content);
-                this.exercises = this.content.exercises || [];
-                for (let i = 0; i < this.exercises.length; i++) {
-                    const savedText = localStorage.getItem(this._exerciseKey(i)) || '';
-                    this.exerciseStates[i] = { output: null, feedback: null, hints: [], correct: null, running: false, submitting: false, text: savedText };
+                if (!this.lesson.content) {
+                    this.loading = false;
+                    await this.generateLesson();
+                    return;
                 }
+                this.content = this.lesson.content;
+                this.renderedContent = this.renderLessonContent(this.content);
+                this._initExercises();
                 const fb = await API.get('/lessons/' + id + '/feedback').catch(() => null);
                 if (fb?.submitted) this.feedbackSubmitted = true;
             } catch (e) {
@@ -398,6 +380,45 @@ function lessonView() {
             }
         },
 
+        async generateLesson() {
+            this.generating = true;
+            this.content = {};
+            try {
+                await API.stream('/lessons/generate/stream', {
+                    skill_id: this.lesson.skill_id,
+                    lesson_id: this.lesson.id,
+                }, (event, data) => {
+                    if (event === 'item') {
+                        if (!Array.isArray(this.content[data.key])) this.content[data.key] = [];
+                        this.content[data.key].push(data.value);
+                    } else if (event === 'field') {
+                        this.content[data.key] = data.value;
+                    } else if (event === 'done') {
+                        const { id, ...content } = data;
+                        this.content = content;
+                        this.lesson.content = content;
+                    } else if (event === 'error') {
+                        throw new Error(data.detail);
+                    }
+                    this.renderedContent = this.renderLessonContent(this.content);
+                });
+                if (!this.lesson.content) throw new Error('Lesson generation ended early.');
+                this._initExercises();
+            } catch (e) {
+                this.error = 'Failed to generate lesson. Please try again.';
+            } finally {
+                this.generating = false;
+            }
+        },
+
+        _initExercises() {
+            this.exercises = this.content.exercises || [];
+            for (let i = 0; i < this.exercises.length; i++) {
+                const savedText = localStorage.getItem(this._exerciseKey(i)) || '';
+                this.exerciseStates[i] = { output: null, feedback: null, hints: [], correct: null, running: false, submitting: false, text: savedText };
+            }
+        },
+
         initEditor(index, el) {
             if (this.editors[index]) return;
             const editor = ace.edit(el);
@@ -434,8 +455,18 @@ function lessonView() {
 
             try {
                 const code = this.editors[index]?.getValue() || '';
-                const result = await API.post('/exercises/run', { code });
-                state.output = result.output || '(No output)';
+                // Show output as the code prints it rather than after it exits
+                state.output = '';
+                await API.stream('/exercises/run/stream', { code }, (event, data) => {
+                    if (event === 'output') {
+                        state.output += data.text;
+                    } else if (event === 'done') {
+                        if (data.notice) state.output += (state.output ? '\n' : '') + data.notice;
+                        if (!state.output) state.output = '(No output)';
+                    } else if (event === 'error') {
+                        state.output += (state.output ? '\n' : '') + 'Error: ' + data.detail;
+                    }
+                });
             } catch (e) {
                 state.output = 'Error: ' + (e.message || 'Failed to run code');
             } finally {
@@ -482,7 +513,6 @@ function lessonView() {
         },
 
         renderLessonContent(content) {
-            if (!content.sections) return '';
             let html = '';
             if (content.objective) {
                 html += `<div class="bg-brand-50 dark:bg-brand-900/30 border border-brand-200 dark:border-brand-800 rounded-lg p-4 mb-6">
@@ -490,7 +520,7 @@ function lessonView() {
                     <p class="text-brand-700 dark:text-brand-200">${content.objective}</p>
                 </div>`;
             }
-            for (const section of content.sections) {
+            for (const section of content.sections || []) {
                 html += `<h3 class="text-xl font-semibold mt-6 mb-3">${section.heading}</h3>`;
                 html += marked.parse(section.content);
             }
@@ -650,22 +680,12 @@ function quizView() {
             this.answered = true;
         },
 
-        async submitShortAnswer() {
-            if (!this.shortAnswer.trim() || this.grading) return;
-            this.grading = true;
-            try {
-                const result = await API.post('/quizzes/grade', {
-                    question: this.currentQuestion,
-                    answer: this.shortAnswer.trim(),
-                });
-                this.answers[this.currentIndex] = { answer: this.shortAnswer, correct: result.correct };
-                this.feedback = result.feedback;
-                this.answered = true;
-            } catch (e) {
-                this.feedback = 'Failed to grade answer. Please try again.';
-            } finally {
-                this.grading = false;
-            }
+        submitShortAnswer() {
+            if (!this.shortAnswer.trim()) return;
+            // Free-text answers are graded together when the quiz is finished
+            this.answers[this.currentIndex] = { answer: this.shortAnswer.trim(), correct: null };
+            this.feedback = 'Answer saved. It will be graded when you finish the quiz.';
+            this.answered = true;
         },
 
         async nextQuestion() {
@@ -684,21 +704,30 @@ function quizView() {
             if (this.submitted) return; // Prevent double-submit
             this.submitted = true;
             this.submitting = true;
-            this.correctCount = Object.values(this.answers).filter(a => a.correct).length;
-            this.score = this.correctCount / this.questions.length;
+            this.grading = true;
+            const answers = {};
+            for (const [i, a] of Object.entries(this.answers)) answers[i] = a.answer;
             try {
-                const result = await API.post('/quizzes/submit', {
+                const result = await API.post('/quizzes/grade-batch', {
                     quiz_id: this.quizId,
-                    answers: this.answers,
-                    score: this.score,
+                    answers,
                 });
+                if (result.results) {
+                    for (const [i, r] of Object.entries(result.results)) {
+                        this.answers[i] = { answer: r.answer, correct: r.correct, feedback: r.feedback };
+                    }
+                }
                 this.xpEarned = result.xp_earned;
                 this.newAchievements = result.new_achievements || [];
             } catch (e) {
                 this.xpEarned = 0;
+                this.error = 'Failed to grade your answers. Please try again.';
             }
+            this.correctCount = Object.values(this.answers).filter(a => a.correct).length;
+            this.score = this.correctCount / this.questions.length;
             this.showResults = true;
             this.submitting = false;
+            this.grading = false;
             window._refreshNavbar();
             if (this.newAchievements.length > 0) {
                 setTimeout(() => window._showAchievement(this.newAchievements[0]), 500);
@@ -712,6 +741,7 @@ function chatView() {
         messages: [],
         input: '',
         thinking: false,
+        streaming: false,
         skillId: null,
         skillName: '',
         lessonId: null,
@@ -737,11 +767,10 @@ function chatView() {
                 try {
                     const data = await API.get('/skills/' + this.skillId);
                     this.skillName = data.skill?.name || '';
-                    // Only load history for skill-wide chat (no lesson param)
-                    if (!this.lessonId) {
-                        const history = await API.get('/chat/' + this.skillId + '/history');
-                        this.messages = history.messages || [];
-                    }
+                    // A lesson's chat is its own conversation
+                    const history = await API.get('/chat/' + this.skillId + '/history'
+                        + (this.lessonId ? '?lesson_id=' + this.lessonId : ''));
+                    this.messages = history.messages || [];
                 } catch (e) {
                     console.error(e);
                 }
@@ -765,7 +794,7 @@ function chatView() {
         },
 
         async send() {
-            if (!this.input.trim() || this.thinking) return;
+            if (!this.input.trim() || this.thinking || this.streaming) return;
             const msg = this.input.trim();
             this.input = '';
             this.messages.push({ role: 'user', content: msg });
@@ -773,18 +802,36 @@ function chatView() {
             this.$nextTick(() => {
                 this.$refs.messages.scrollTop = this.$refs.messages.scrollHeight;
             });
+            let reply = null;
+            this.streaming = true;
             try {
-                const result = await API.post('/chat', {
+                await API.stream('/chat/stream', {
                     skill_id: this.skillId ? parseInt(this.skillId) : null,
                     lesson_id: this.lessonId ? parseInt(this.lessonId) : null,
                     message: msg,
-                    history: this.messages.slice(0, -1).slice(-20),
+                }, (event, data) => {
+                    if (event === 'delta') {
+                        if (!reply) {
+                            // Keep the reactive proxy so appended text re-renders
+                            this.messages.push({ role: 'assistant', content: '' });
+                            reply = this.messages[this.messages.length - 1];
+                            this.thinking = false;
+                        }
+                        reply.content += data.text;
+                        this.$nextTick(() => {
+                            this.$refs.messages.scrollTop = this.$refs.messages.scrollHeight;
+                        });
+                    } else if (event === 'error') {
+                        throw new Error(data.detail);
+                    }
                 });
-                this.messages.push({ role: 'assistant', content: result.response });
+                if (!reply) throw new Error('Empty response');
             } catch (e) {
+                if (reply) this.messages.pop();
                 this.messages.push({ role: 'assistant', content: 'Sorry, something went wrong. Please try again.' });
             } finally {
                 this.thinking = false;
+                this.streaming = false;
                 this.$nextTick(() => {
                     this.$refs.messages.scrollTop = this.$refs.messages.scrollHeight;
                 });
@@ -793,6 +840,12 @@ function chatView() {
     };
 }
 
+// Ratings wait in localStorage until they reach the server, so a review
+// session can be finished offline and flushed later with /review/batch.
+const REVIEW_QUEUE_KEY = 'review_ratings_queue';
+const REVIEW_FLUSH_SIZE = 10;
+const REVIEW_BATCH_MAX = 500;  // ReviewBatchRequest.ratings max_length
+
 function reviewView() {
     return {
         cards: [],
@@ -802,6 +855,13 @@ function reviewView() {
         completed: false,
         reviewedCount: 0,
         xpEarned: 0,
+        pendingCount: 0,
+        _flushing: null,
+
+        init() {
+            this.pendingCount = this._pending().length;
+            window.addEventListener('online', () => this.flushRatings());
+        },
 
         get currentCard() {
             return this.cards[this.currentIndex] || null;
@@ -811,11 +871,27 @@ function reviewView() {
             return marked.parse(text || '');
         },
 
+        _pending() {
+            try {
+                return JSON.parse(localStorage.getItem(REVIEW_QUEUE_KEY)) || [];
+            } catch (e) {
+                return [];
+            }
+        },
+
+        _savePending(ratings) {
+            localStorage.setItem(REVIEW_QUEUE_KEY, JSON.stringify(ratings));
+            this.pendingCount = ratings.length;
+        },
+
         async loadReviewQueue() {
             this.loading = true;
             try {
+                await this.flushRatings();
                 const data = await API.get('/review/queue');
-                this.cards = data.cards || [];
+                // Cards rated while offline are due on the server until the queue is flushed
+                const rated = new Set(this._pending().map(r => r.card_id));
+                this.cards = (data.cards || []).filter(c => !rated.has(c.id));
             } catch (e) {
                 console.error(e);
             } finally {
@@ -823,23 +899,51 @@ function reviewView() {
             }
         },
 
-        async rateCard(quality) {
-            try {
-                const result = await API.post('/review/' + this.currentCard.id + '/rate', { quality });
-                this.xpEarned += result.xp_earned || 0;
-                this.reviewedCount++;
-                if (result.new_achievements?.length > 0) {
-                    setTimeout(() => window._showAchievement(result.new_achievements[0]), 300);
+        flushRatings() {
+            // One request at a time; callers share the one in flight
+            if (!this._flushing) {
+                this._flushing = this._flush().finally(() => { this._flushing = null; });
+            }
+            return this._flushing;
+        },
+
+        async _flush() {
+            for (;;) {
+                // /review/batch takes at most REVIEW_BATCH_MAX ratings per request
+                const batch = this._pending().slice(0, REVIEW_BATCH_MAX);
+                if (batch.length === 0) return;
+                try {
+                    const result = await API.post('/review/batch', { ratings: batch });
+                    this.xpEarned += result.xp_earned || 0;
+                    if (result.new_achievements?.length > 0) {
+                        setTimeout(() => window._showAchievement(result.new_achievements[0]), 300);
+                    }
+                    window._refreshNavbar();
+                } catch (e) {
+                    console.error(e);
+                    // Offline or server error: the ratings stay queued for the next
+                    // flush. A rejected batch would fail the same way forever, so drop it.
+                    const rejected = e.status >= 400 && e.status < 500 && e.status !== 408 && e.status !== 429;
+                    if (!rejected) return;
                 }
-            } catch (e) {
-                console.error(e);
+                // Keep anything queued while the request was in flight
+                this._savePending(this._pending().slice(batch.length));
             }
+        },
+
+        async rateCard(quality) {
+            const pending = this._pending();
+            pending.push({ card_id: this.currentCard.id, quality, reviewed_at: new Date().toISOString() });
+            this._savePending(pending);
+            this.reviewedCount++;
+
             if (this.currentIndex < this.cards.length - 1) {
                 this.currentIndex++;
                 this.revealed = false;
+                if (pending.length >= REVIEW_FLUSH_SIZE) this.flushRatings();
             } else {
+                await this.flushRatings();
                 this.completed = true;
-                window._refreshNavbar();
             }
         },
     };
@@ -0,0 +1,41 @@
+"""Shared fixtures: every test runs against its own fresh database."""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.server import app
+from app.database import get_db, close_db
+
+
+@pytest.fixture(autouse=True)
+def fresh_db(tmp_path):
+    """Use a fresh in-memory DB for each test."""
+    close_db()
+    from app.config import settings
+    original = settings.db_path, settings.arxiv_cache_dir
+    settings.db_path = tmp_path / "test.db"
+    settings.arxiv_cache_dir = tmp_path / "arxiv_cache"
+    get_db()  # initialize schema
+    yield
+    close_db()
+    settings.db_path, settings.arxiv_cache_dir = original
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    """Split a Server-Sent Events response body into (event, data) pairs."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        event, data = "message", ""
+        for line in frame.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data += line[len("data: "):]
+        events.append((event, json.loads(data)))
+    return events
@@ -0,0 +1,77 @@
+"""Tests for the achievement rule engine."""
+from app.database import execute, get_db, query
+from app.services import quiz_service, skill_service
+from app.services.gamification import ACHIEVEMENT_RULES, ACHIEVEMENTS, check_achievements
+
+
+def _unlocked() -> set[str]:
+    return {r["achievement_key"] for r in query("SELECT achievement_key FROM achievements WHERE user_id = 1")}
+
+
+def test_every_achievement_has_a_rule():
+    assert ACHIEVEMENT_RULES.keys() == ACHIEVEMENTS.keys()
+
+
+def test_new_achievements_are_reported_once():
+    execute("UPDATE user_progress SET lessons_completed = 10, total_xp = 1200 WHERE user_id = 1")
+
+    first = check_achievements(1)
+    assert {a["key"] for a in first} == {"first_lesson", "lessons_10", "xp_1000"}
+    assert first[0]["name"] == ACHIEVEMENTS[first[0]["key"]][0]
+    assert check_achievements(1) == []
+    assert _unlocked() == {"first_lesson", "lessons_10", "xp_1000"}
+
+
+def test_new_keys_are_inserted_in_one_statement():
+    execute("UPDATE user_progress SET lessons_completed = 50, current_streak = 30 WHERE user_id = 1")
+    statements = []
+    db = get_db()
+    db.set_trace_callback(statements.append)
+    try:
+        new = check_achievements(1)
+    finally:
+        db.set_trace_callback(None)
+
+    assert len(new) == 6
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    assert len(inserts) == 6  # one executemany: the trace shows each bound row
+    assert len({s.split("VALUES")[0] for s in inserts}) == 1
+    assert not [s for s in statements if "changes()" in s]
+    assert sum(s.strip().upper() == "COMMIT" for s in statements) <= 1
+
+
+def test_nothing_is_written_when_nothing_is_new():
+    statements = []
+    db = get_db()
+    db.set_trace_callback(statements.append)
+    try:
+        assert check_achievements(1) == []
+    finally:
+        db.set_trace_callback(None)
+    assert not [s for s in statements if s.lstrip().upper().startswith(("INSERT", "COMMIT"))]
+
+
+def test_perfect_quiz_reports_perfect_score():
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Python')", ())
+    lesson_id = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Loops', 1)", (skill_id,))
+    quiz_id = execute("INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, '[]')", (lesson_id,))
+
+    result = quiz_service.submit_quiz(1, quiz_id, {"0": {"correct": True}}, 1.0)
+
+    assert {"perfect_score", "first_quiz"} <= {a["key"] for a in result["new_achievements"]}
+
+
+def test_imperfect_quiz_does_not_unlock_perfect_score():
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Python')", ())
+    lesson_id = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Loops', 1)", (skill_id,))
+    quiz_id = execute("INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, '[]')", (lesson_id,))
+
+    quiz_service.submit_quiz(1, quiz_id, {"0": {"correct": True}, "1": {"correct": False}}, 0.5)
+
+    assert "perfect_score" not in _unlocked()
+
+
+def test_third_skill_reports_multi_skill():
+    results = [skill_service.create_skill(1, f"Skill {i}", "", [{"title": "Intro"}]) for i in range(3)]
+    assert [a["key"] for a in results[1]["new_achievements"]] == []
+    assert [a["key"] for a in results[2]["new_achievements"]] == ["multi_skill"]
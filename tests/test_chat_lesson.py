@@ -2,30 +2,7 @@
 import json
 from unittest.mock import patch
 
-import pytest
-from fastapi.testclient import TestClient
-
-from app.server import app
-from app.database import get_db, _connection
-import app.database as db_module
-
-
-@pytest.fixture(autouse=True)
-def fresh_db(tmp_path):
-    """Use a fresh in-memory DB for each test."""
-    db_module._connection = None
-    from app.config import settings
-    original = settings.db_path
-    settings.db_path = tmp_path / "test.db"
-    get_db()  # initialize schema
-    yield
-    db_module._connection = None
-    settings.db_path = original
-
-
-@pytest.fixture
-def client():
-    return TestClient(app)
+from tests.conftest import parse_sse
 
 
 MOCK_RESPONSE = "Here is my tutoring response."
@@ -289,3 +266,71 @@ def test_review_rate_returns_achievements():
     # first_review achievement should be unlocked
     keys = [a["key"] for a in result["new_achievements"]]
     assert "first_review" in keys
+
+
+# --- Streaming tests ---
+
+async def _fake_stream(messages, skill_context=""):
+    for chunk in ["Here is ", "my tutoring ", "response."]:
+        yield chunk
+
+
+@patch("app.routes.chat.tutor.chat_stream", new=_fake_stream)
+def test_chat_stream_forwards_deltas(client):
+    """Streaming chat emits one delta per model chunk, then the full reply."""
+    skill_id, lesson_id = _seed_skill_and_lesson()
+
+    resp = client.post("/api/chat/stream", json={
+        "skill_id": skill_id,
+        "lesson_id": lesson_id,
+        "message": "What are variables?",
+        "history": [],
+    })
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(resp.text)
+    assert [e for e, _ in events] == ["delta", "delta", "delta", "done"]
+    assert "".join(d["text"] for e, d in events if e == "delta") == MOCK_RESPONSE
+    assert events[-1][1]["response"] == MOCK_RESPONSE
+
+
+@patch("app.routes.chat.tutor.chat_stream", new=_fake_stream)
+def test_chat_stream_persists_after_completion(client):
+    """Both sides of a streamed exchange are saved once the stream finishes."""
+    from app.database import query
+    skill_id, lesson_id = _seed_skill_and_lesson()
+
+    client.post("/api/chat/stream", json={
+        "skill_id": skill_id,
+        "lesson_id": lesson_id,
+        "message": "Help with variables",
+        "history": [],
+    })
+
+    rows = query("SELECT role, content, lesson_id FROM chat_messages ORDER BY id")
+    assert [r["role"] for r in rows] == ["user", "assistant"]
+    assert rows[1]["content"] == MOCK_RESPONSE
+    assert rows[1]["lesson_id"] == lesson_id
+
+
+def test_chat_stream_error_saves_nothing(client):
+    """A failed stream reports an error frame and leaves no half exchange behind."""
+    from app.database import query
+    skill_id, _ = _seed_skill_and_lesson()
+
+    async def broken_stream(messages, skill_context=""):
+        yield "partial"
+        raise RuntimeError("upstream overloaded")
+
+    with patch("app.routes.chat.tutor.chat_stream", new=broken_stream):
+        resp = client.post("/api/chat/stream", json={
+            "skill_id": skill_id,
+            "message": "Hello",
+            "history": [],
+        })
+
+    events = parse_sse(resp.text)
+    assert events[-1][0] == "error"
+    assert "upstream overloaded" in events[-1][1]["detail"]
+    assert query("SELECT * FROM chat_messages") == []
@@ -0,0 +1,109 @@
+"""Tests for transparent compression of large TEXT columns."""
+import asyncio
+import zlib
+
+import pytest
+
+from app import database, serialization
+from app.config import settings
+from app.database import _compress_columns, execute, get_db, pack, query_one, unpack
+from app.services import lesson_service, skill_service
+
+LONG_TEXT = "A generator yields values lazily, one at a time. " * 100
+
+
+def _typeof(table: str, column: str, rowid: int) -> str:
+    return query_one(f"SELECT typeof({column}) AS t FROM {table} WHERE rowid = ?", (rowid,))["t"]
+
+
+def test_pack_round_trips_long_text():
+    packed = pack(LONG_TEXT)
+    assert isinstance(packed, bytes) and packed.startswith(database._MAGIC)
+    assert len(packed) < len(LONG_TEXT) / 5
+    assert unpack(packed) == LONG_TEXT
+
+
+def test_short_values_and_disabled_compression_stay_plain(monkeypatch):
+    assert pack("short") == "short"
+    assert pack(None) is None
+    monkeypatch.setattr(settings, "db_compression", False)
+    assert pack(LONG_TEXT) == LONG_TEXT
+
+
+def test_unpack_leaves_other_values_alone():
+    assert unpack("plain") == "plain"
+    assert unpack(b"\x89PNG") == b"\x89PNG"
+    assert unpack(3) == 3
+
+
+def test_unknown_codec_is_an_error():
+    with pytest.raises(ValueError):
+        unpack(database._MAGIC + b"?" + b"data")
+
+
+@pytest.mark.skipif(database.zstandard is not None, reason="zstandard is installed")
+def test_zstd_rows_need_zstandard():
+    with pytest.raises(RuntimeError, match="zstandard"):
+        unpack(database._MAGIC + database._ZSTD + b"frame")
+
+
+def test_zlib_rows_read_without_zstandard(monkeypatch):
+    monkeypatch.setattr(database, "zstandard", None)
+    packed = pack(LONG_TEXT)
+    assert packed[len(database._MAGIC):len(database._MAGIC) + 1] == database._ZLIB
+    assert zlib.decompress(packed[len(database._MAGIC) + 1:]).decode() == LONG_TEXT
+
+
+def test_compressed_columns_read_transparently(client):
+    skill_id = execute("INSERT INTO skills (user_id, name, cheatsheet) VALUES (1, 'Python', ?)", (pack(LONG_TEXT),))
+    content = {"title": "Generators", "sections": [{"heading": "Lazy", "content": LONG_TEXT}]}
+    lesson_id = execute(
+        "INSERT INTO lessons (skill_id, topic, order_index, content_json) VALUES (?, 'Generators', 1, ?)",
+        (skill_id, pack(serialization.dumps(content))),
+    )
+
+    assert _typeof("lessons", "content_json", lesson_id) == "blob"
+    assert query_one("SELECT cheatsheet FROM skills WHERE id = ?", (skill_id,))["cheatsheet"] == LONG_TEXT
+    assert client.get(f"/api/lessons/{lesson_id}").json()["content"] == content
+    assert client.get(f"/api/skills/{skill_id}/cheatsheet").json()["content"] == LONG_TEXT
+
+
+def test_migration_compresses_plaintext_rows_in_place():
+    skill_id = execute("INSERT INTO skills (user_id, name, cheatsheet) VALUES (1, 'Python', ?)", (LONG_TEXT,))
+    project_id = execute(
+        "INSERT INTO skill_projects (skill_id, description_json) VALUES (?, '{}')", (skill_id,),
+    )
+    submission_id = execute(
+        """INSERT INTO skill_project_submissions (user_id, project_id, submission, feedback_json)
+           VALUES (1, ?, ?, ?)""",
+        (project_id, LONG_TEXT, '{"passed": true}'),
+    )
+    assert _typeof("skills", "cheatsheet", skill_id) == "text"
+
+    db = get_db()
+    with database.transaction():
+        _compress_columns(db, batch=1)
+
+    assert _typeof("skills", "cheatsheet", skill_id) == "blob"
+    assert _typeof("skill_project_submissions", "submission", submission_id) == "blob"
+    # Too short to be worth compressing
+    assert _typeof("skill_project_submissions", "feedback_json", submission_id) == "text"
+    row = query_one("SELECT submission, feedback_json FROM skill_project_submissions WHERE id = ?", (submission_id,))
+    assert row["submission"] == LONG_TEXT
+    assert row["feedback_json"] == '{"passed": true}'
+
+
+def test_listing_skills_and_completing_lessons_decompress_nothing(monkeypatch):
+    skill_id = execute("INSERT INTO skills (user_id, name, cheatsheet) VALUES (1, 'Python', ?)", (pack(LONG_TEXT),))
+    lesson_id = execute(
+        "INSERT INTO lessons (skill_id, topic, order_index, content_json) VALUES (?, 'Generators', 1, ?)",
+        (skill_id, pack(serialization.dumps({"explanation": LONG_TEXT}))),
+    )
+    decoded = []
+    real_unpack = database.unpack
+    monkeypatch.setattr(database, "unpack", lambda v: decoded.append(v) or real_unpack(v))
+    monkeypatch.setattr(lesson_service.jobs, "dispatch", lambda job: None)
+
+    assert skill_service.get_skills(1)[0]["name"] == "Python"
+    assert asyncio.run(lesson_service.complete_lesson(1, lesson_id))["already_completed"] is False
+    assert not [v for v in decoded if isinstance(v, bytes)]
@@ -0,0 +1,96 @@
+"""Tests for the per-thread SQLite connection pool."""
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import database
+from app.database import execute, get_db, query, query_one
+
+
+THREADS = 16
+WRITES_PER_THREAD = 50
+
+
+def test_each_thread_gets_its_own_connection():
+    main = get_db()
+    assert get_db() is main
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        others = set(pool.map(lambda _: id(get_db()), range(4)))
+    assert id(main) not in others
+
+
+def test_connections_close_when_their_thread_ends():
+    get_db()
+    pooled = len(database._connections)
+    opened = []
+
+    def use():
+        opened.append(get_db())
+        query_one("SELECT 1")
+
+    # Like the server's threadpool retiring idle threads and starting new ones
+    for _ in range(50):
+        thread = threading.Thread(target=use)
+        thread.start()
+        thread.join()
+
+    assert len(database._connections) == pooled
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+    assert query_one("SELECT 1")
+
+
+def test_concurrent_query_and_execute():
+    """Many threads mixing reads and writes lose nothing and raise nothing."""
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Load')", ())
+    start = threading.Barrier(THREADS)
+
+    def worker(n: int) -> int:
+        start.wait()
+        seen = 0
+        for i in range(WRITES_PER_THREAD):
+            execute(
+                "INSERT INTO chat_messages (user_id, skill_id, role, content) VALUES (1, ?, 'user', ?)",
+                (skill_id, f"{n}-{i}"),
+            )
+            seen = query_one("SELECT COUNT(*) AS c FROM chat_messages")["c"]
+            query("SELECT * FROM chat_messages WHERE skill_id = ? LIMIT 5", (skill_id,))
+        return seen
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(worker, range(THREADS)))
+
+    total = THREADS * WRITES_PER_THREAD
+    assert query_one("SELECT COUNT(*) AS c FROM chat_messages")["c"] == total
+    assert len({r["content"] for r in query("SELECT content FROM chat_messages")}) == total
+    assert all(WRITES_PER_THREAD <= seen <= total for seen in results)
+
+
+def test_execute_does_not_commit_another_threads_open_transaction():
+    """An uncommitted write on one thread stays private to that thread."""
+    pending = threading.Event()
+    release = threading.Event()
+
+    def half_written():
+        db = get_db()
+        db.execute("INSERT INTO skills (user_id, name) VALUES (1, 'Half written')")
+        pending.set()
+        release.wait(timeout=5)
+        db.rollback()
+
+    writer = threading.Thread(target=half_written)
+    writer.start()
+    pending.wait(timeout=5)
+    try:
+        # Blocks on SQLite's write lock until the other thread rolls back
+        threading.Timer(0.2, release.set).start()
+        execute("INSERT INTO skills (user_id, name) VALUES (1, 'Committed')")
+    finally:
+        release.set()
+        writer.join()
+
+    names = [r["name"] for r in query("SELECT name FROM skills")]
+    assert names == ["Committed"]
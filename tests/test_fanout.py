@@ -0,0 +1,134 @@
+"""Tests for concurrent step fan-out and late resource attachment."""
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.database import execute, query_one
+from app.services.fanout import FanOut
+
+
+async def _after(delay, value):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def _fail():
+    raise RuntimeError("boom")
+
+
+def test_steps_run_concurrently():
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with FanOut() as steps:
+            for name in ("a", "b", "c"):
+                steps.start(name, lambda name=name: _after(0.1, name))
+            results = [await steps.result(n) for n in ("a", "b", "c")]
+        return results, loop.time() - start
+
+    results, elapsed = asyncio.run(main())
+    assert results == ["a", "b", "c"]
+    assert elapsed < 0.2
+
+
+def test_required_step_timeout_propagates():
+    async def main():
+        async with FanOut() as steps:
+            steps.start("slow", lambda: _after(1, "late"), timeout=0.05)
+            await steps.result("slow")
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+
+
+def test_optional_step_falls_back_to_default():
+    async def main():
+        async with FanOut() as steps:
+            steps.start("broken", _fail)
+            steps.start("timed_out", lambda: _after(1, "late"), timeout=0.01)
+            steps.start("slow", lambda: _after(1, "late"))
+            return (
+                await steps.optional("broken", default="d"),
+                await steps.optional("timed_out", default="d"),
+                await steps.optional("slow", default="d", wait=0.01),
+                steps.running("slow"),
+            )
+
+    assert asyncio.run(main()) == ("d", "d", "d", True)
+
+
+def test_unawaited_steps_are_cancelled_on_exit():
+    async def main():
+        async with FanOut() as steps:
+            steps.start("slow", lambda: _after(1, "late"))
+        await asyncio.sleep(0)
+        return steps.running("slow")
+
+    assert asyncio.run(main()) is False
+
+
+def test_detached_step_delivers_its_result_later():
+    results = []
+
+    async def main():
+        async with FanOut() as steps:
+            steps.start("slow", lambda: _after(0.05, "late"))
+            steps.detach("slow", results.append)
+        assert results == []
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert results == ["late"]
+
+
+def _seed_lesson():
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'ML')", ())
+    lesson_id = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Attention', 1)", (skill_id,))
+    return skill_id, lesson_id
+
+
+def _saved_content(lesson_id):
+    return json.loads(query_one("SELECT content_json FROM lessons WHERE id = ?", (lesson_id,))["content_json"])
+
+
+def test_slow_resources_do_not_block_the_lesson(monkeypatch):
+    from app.services import lesson_service
+    monkeypatch.setattr(settings, "resources_grace_seconds", 0.01)
+    skill_id, lesson_id = _seed_lesson()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await lesson_service.generate_lesson(skill_id, lesson_id)
+        elapsed = loop.time() - start
+        assert "resources" not in _saved_content(lesson_id)
+        await asyncio.sleep(0.3)
+        return result, elapsed
+
+    with patch("app.services.lesson_service.tutor.generate_lesson", new=lambda **kw: _after(0, {"title": "Attention"})), \
+            patch("app.services.lesson_service._generate_resources", new=lambda *a: _after(0.2, {"youtube": ["v"]})):
+        result, elapsed = asyncio.run(main())
+
+    assert "resources" not in result
+    assert elapsed < 0.15
+    assert _saved_content(lesson_id) == {"title": "Attention", "resources": {"youtube": ["v"]}}
+
+
+def test_resources_past_their_timeout_are_dropped(monkeypatch):
+    from app.services import lesson_service
+    monkeypatch.setattr(settings, "resources_grace_seconds", 0.01)
+    monkeypatch.setattr(settings, "resources_timeout_seconds", 0.05)
+    skill_id, lesson_id = _seed_lesson()
+
+    async def main():
+        await lesson_service.generate_lesson(skill_id, lesson_id)
+        await asyncio.sleep(0.3)
+
+    with patch("app.services.lesson_service.tutor.generate_lesson", new=lambda **kw: _after(0, {"title": "Attention"})), \
+            patch("app.services.lesson_service._generate_resources", new=lambda *a: _after(1, {"youtube": ["v"]})):
+        asyncio.run(main())
+
+    assert _saved_content(lesson_id) == {"title": "Attention"}
@@ -0,0 +1,110 @@
+"""Tests for local quiz grading and escalation to the tutor."""
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.grader import grade_locally
+
+MC = {
+    "type": "multiple_choice",
+    "question": "Which structure gives O(1) average lookup?",
+    "options": ["Linked list", "Hash table", "Binary tree", "Array"],
+    "correct_answer": "Hash table",
+    "explanation": "Hashing jumps straight to the bucket.",
+}
+TF = {"type": "true_false", "question": "Python lists are immutable.", "correct_answer": "False"}
+
+
+def _short(correct_answer):
+    return {"type": "short_answer", "question": "?", "correct_answer": correct_answer, "explanation": ""}
+
+
+@pytest.mark.parametrize("answer,correct", [
+    ("Hash table", True), ("  hash TABLE ", True), ("b", True), ("B)", True),
+    ("Binary tree", False), ("a", False),
+])
+def test_multiple_choice(answer, correct):
+    result = grade_locally(MC, answer)
+    assert result["correct"] is correct
+    assert "Hashing jumps" in result["feedback"]
+
+
+@pytest.mark.parametrize("answer,correct", [("a", True), ("A)", True), ("(a)", True), ("b", False)])
+def test_first_option_by_letter(answer, correct):
+    question = {**MC, "correct_answer": "Linked list"}
+    assert grade_locally(question, answer)["correct"] is correct
+
+
+@pytest.mark.parametrize("answer,correct", [("False", True), ("false", True), ("no", True), ("True", False)])
+def test_true_false(answer, correct):
+    assert grade_locally(TF, answer)["correct"] is correct
+
+
+@pytest.mark.parametrize("expected,answer", [
+    ("The mitochondria", "mitochondria."),
+    ("42", "42.0"),
+    ("3.14", "3.141"),
+    ("0.5", ".5"),
+    ("1,000", "1000"),
+    ("Photosynthesis", "photosynthesys"),
+    ("Binary search", "you would use binary search"),
+])
+def test_short_answers_settled_as_correct(expected, answer):
+    assert grade_locally(_short(expected), answer)["correct"] is True
+
+
+@pytest.mark.parametrize("expected,answer", [
+    ("42", "41"), ("Binary search", "I don't know"),
+    # Integers need an exact match, decimals match to the precision given
+    ("1945", "1944"), ("10", "10.01"), ("3.14", "3.2"),
+])
+def test_short_answers_settled_as_wrong(expected, answer):
+    assert grade_locally(_short(expected), answer)["correct"] is False
+
+
+@pytest.mark.parametrize("expected,answer", [
+    # Different wording of the same idea needs judgement
+    ("It stores key-value pairs and hashes keys to find buckets in constant time on average",
+     "maps keys to slots using a hash function"),
+    ("Binary search", "it is not binary search"),
+    ("O(n)", "O(n log n)"),
+    ("Mitosis", "Meiosis"),
+    ("Neuron", "Neutron"),
+    # A changed digit is not a typo, and key words out of order change the meaning
+    ("Python 3", "Python 2"),
+    ("Left to right", "right to left"),
+    # Alternatives, extra content words and contradictions
+    ("Merge sort", "merge sort or quick sort"),
+    ("Merge sort", "quick sort merge sort"),
+    ("Binary search", "binary search is wrong here, use hashing"),
+    ("Stack", "stack overflow"),
+])
+def test_ambiguous_short_answers_are_escalated(expected, answer):
+    assert grade_locally(_short(expected), answer) is None
+
+
+def test_local_grading_is_sub_millisecond():
+    cases = [(MC, "b"), (TF, "false"), (_short("Photosynthesis"), "photosynthesys"),
+             (_short("Binary search"), "use a binary search here")]
+    start = time.perf_counter()
+    for _ in range(250):
+        for question, answer in cases:
+            grade_locally(question, answer)
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+@patch("app.services.quiz_service.tutor.grade_answer", new_callable=AsyncMock)
+def test_grade_endpoint_only_calls_tutor_when_ambiguous(mock_grade, client):
+    mock_grade.return_value = {"correct": True, "feedback": "Nicely put."}
+
+    res = client.post("/api/quizzes/grade", json={"question": MC, "answer": "Hash table"})
+    assert res.json()["correct"] is True
+    res = client.post("/api/quizzes/grade", json={"question": _short("Photosynthesis"), "answer": "photosynthesis"})
+    assert res.json()["correct"] is True
+    assert mock_grade.await_count == 0
+
+    question = _short("Plants convert light energy into chemical energy stored in glucose")
+    res = client.post("/api/quizzes/grade", json={"question": question, "answer": "they make sugar from sunlight"})
+    assert res.json() == {"correct": True, "feedback": "Nicely put."}
+    assert mock_grade.await_count == 1
@@ -0,0 +1,201 @@
+"""Tests for the background job queue and next-lesson prefetch."""
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+from app.database import execute, query_one
+from app.services.jobs import JobQueue, jobs
+
+
+def test_concurrency_is_bounded():
+    queue = JobQueue(max_concurrency=2, user_budget=100, budget_window=60)
+    running = []
+    peak = []
+
+    async def job():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    async def main():
+        for i in range(8):
+            queue.submit(1, ("job", i), job)
+        await queue.drain()
+
+    asyncio.run(main())
+    assert max(peak) == 2
+    assert queue.stats["completed"] == 8
+
+
+def test_duplicate_keys_are_not_queued_twice():
+    queue = JobQueue(max_concurrency=2, user_budget=100, budget_window=60)
+    calls = []
+
+    async def job():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    async def main():
+        assert queue.submit(1, "same", job)
+        assert not queue.submit(1, "same", job)
+        await queue.drain()
+
+    asyncio.run(main())
+    assert calls == [1]
+
+
+def test_per_user_budget():
+    queue = JobQueue(max_concurrency=4, user_budget=2, budget_window=60)
+
+    async def job():
+        pass
+
+    async def main():
+        accepted = [queue.submit(1, ("a", i), job) for i in range(3)]
+        other_user = queue.submit(2, ("b", 0), job)
+        await queue.drain()
+        return accepted, other_user
+
+    accepted, other_user = asyncio.run(main())
+    assert accepted == [True, True, False]
+    assert other_user
+    assert queue.stats["rejected"] == 1
+
+
+def test_named_budgets_are_separate():
+    queue = JobQueue(max_concurrency=4, user_budget=1, budget_window=60, budgets={"summary": 1})
+
+    async def job():
+        pass
+
+    async def main():
+        accepted = [
+            queue.submit(1, ("a", 0), job, budget="summary"),
+            queue.submit(1, ("a", 1), job, budget="summary"),
+            queue.submit(1, ("b", 0), job),
+        ]
+        await queue.drain()
+        return accepted
+
+    assert asyncio.run(main()) == [True, False, True]
+
+
+def _seed_curriculum() -> tuple[int, int, int]:
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Python')", ())
+    first = execute(
+        "INSERT INTO lessons (skill_id, topic, order_index, content_json) VALUES (?, 'Variables', 1, '{}')",
+        (skill_id,),
+    )
+    second = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Loops', 2)", (skill_id,))
+    return skill_id, first, second
+
+
+@patch("app.services.lesson_service._generate_resources", new_callable=AsyncMock, return_value=None)
+@patch("app.services.lesson_service.tutor.generate_review_cards", new_callable=AsyncMock, return_value=[])
+@patch("app.services.quiz_service.tutor.generate_quiz", new_callable=AsyncMock, return_value={"questions": [{"q": 1}]})
+@patch("app.services.lesson_service.tutor.generate_lesson", new_callable=AsyncMock, return_value={"title": "Loops"})
+def test_completing_a_lesson_prefetches_the_next(mock_lesson, mock_quiz, mock_cards, mock_resources):
+    from app.services import lesson_service, quiz_service
+    skill_id, first, second = _seed_curriculum()
+
+    async def main():
+        await lesson_service.complete_lesson(1, first)
+        await jobs.drain()
+        # Opening the next lesson and its quiz no longer calls the model
+        lesson = await lesson_service.generate_lesson(skill_id, second)
+        quiz = await quiz_service.get_or_generate_quiz(second)
+        return lesson, quiz
+
+    lesson, quiz = asyncio.run(main())
+
+    assert json.loads(query_one("SELECT content_json FROM lessons WHERE id = ?", (second,))["content_json"]) == {"title": "Loops"}
+    assert lesson == {"id": second, "title": "Loops"}
+    assert quiz["questions"] == [{"q": 1}]
+    assert mock_lesson.await_count == 1
+    assert mock_quiz.await_count == 1
+
+
+def test_prefetch_is_skipped_when_the_next_lesson_is_ready():
+    from app.services import lesson_service
+    _, first, second = _seed_curriculum()
+    lesson = query_one("SELECT * FROM lessons WHERE id = ?", (first,))
+    execute("UPDATE lessons SET content_json = '{}' WHERE id = ?", (second,))
+    quiz_id = execute("INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, '[]')", (second,))
+
+    with patch.object(jobs, "submit", return_value=True) as submit:
+        assert lesson_service.schedule_prefetch(1, lesson) is False
+        # Once the quiz is taken, the next visit needs a new one
+        execute(
+            "INSERT INTO quiz_attempts (user_id, quiz_id, answers_json, score) VALUES (1, ?, '{}', 1.0)",
+            (quiz_id,),
+        )
+        assert lesson_service.schedule_prefetch(1, lesson) is True
+    submit.assert_called_once()
+
+
+def test_taken_quiz_is_not_reused():
+    from app.services import quiz_service
+    _, first, _ = _seed_curriculum()
+    quiz_id = execute("INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, '[]')", (first,))
+    execute(
+        "INSERT INTO quiz_attempts (user_id, quiz_id, answers_json, score) VALUES (1, ?, '{}', 1.0)",
+        (quiz_id,),
+    )
+
+    with patch("app.services.quiz_service.tutor.generate_quiz", new_callable=AsyncMock, return_value={"questions": []}) as gen:
+        result = asyncio.run(quiz_service.get_or_generate_quiz(first))
+
+    assert gen.await_count == 1
+    assert result["quiz_id"] != quiz_id
+
+
+def test_complete_lesson_returns_before_review_cards_exist():
+    from app.services import lesson_service
+    _, first, _ = _seed_curriculum()
+    release = asyncio.Event()
+
+    async def slow_cards(content):
+        await release.wait()
+        return [{"question": "Q1?", "answer": "A1"}, {"question": "Q2?", "answer": "A2"}]
+
+    async def main():
+        result = await lesson_service.complete_lesson(1, first)
+        # The request is done, the cards are not
+        assert query_one("SELECT COUNT(*) AS c FROM review_cards")["c"] == 0
+        assert query_one("SELECT status FROM jobs WHERE kind = 'review_cards'")["status"] in ("pending", "running")
+        release.set()
+        await jobs.drain()
+        return result
+
+    with patch("app.services.lesson_service.tutor.generate_review_cards", side_effect=slow_cards), \
+            patch("app.services.lesson_service.schedule_prefetch"):
+        result = asyncio.run(main())
+
+    assert result == {"already_completed": False, "xp_earned": 50}
+    assert query_one("SELECT COUNT(*) AS c FROM review_cards WHERE lesson_id = ?", (first,))["c"] == 2
+    assert query_one("SELECT status FROM jobs")["status"] == "done"
+
+
+def test_interrupted_jobs_resume_without_duplicating_cards():
+    from app.services import lesson_service  # noqa: F401 -- registers the review_cards handler
+    _, first, _ = _seed_curriculum()
+    execute(
+        "INSERT INTO jobs (kind, user_id, payload_json, status, attempts) VALUES ('review_cards', 1, ?, 'running', 1)",
+        (json.dumps({"lesson_id": first}),),
+    )
+    cards = [{"question": "Q?", "answer": "A"}]
+
+    async def main():
+        assert jobs.resume() == 1
+        await jobs.drain()
+        # Re-running a finished job is a no-op
+        jobs.dispatch(1)
+        await jobs.drain()
+
+    with patch("app.services.lesson_service.tutor.generate_review_cards", new_callable=AsyncMock, return_value=cards):
+        asyncio.run(main())
+
+    assert query_one("SELECT COUNT(*) AS c FROM review_cards")["c"] == 1
+    job = query_one("SELECT status, attempts FROM jobs")
+    assert (job["status"], job["attempts"]) == ("done", 2)
@@ -0,0 +1,126 @@
+"""Tests for progressive (streamed) lesson generation."""
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+from app.ai.json_stream import JsonFieldStream
+from tests.conftest import parse_sse
+
+
+LESSON = {
+    "title": "Loops",
+    "objective": "Repeat work with for and while",
+    "sections": [
+        {"heading": "For loops", "content": "```python\nfor i in range(3):\n    print({i: [i]})\n```"},
+        {"heading": "While loops", "content": "Say \"stop\" when done, \\ escaped"},
+    ],
+    "key_points": ["for iterates", "while checks, then repeats"],
+    "summary": "Loops repeat code.",
+    "exercises": [{"type": "text", "title": "Reflect", "instructions": "Why loop?", "difficulty": 1}],
+}
+
+
+def _chunks(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+# --- Parser tests ---
+
+def test_parser_matches_json_loads_for_any_chunking():
+    text = "```json\n" + json.dumps(LESSON, indent=2) + "\n```"
+    for size in (1, 2, 7, 64, len(text)):
+        parser = JsonFieldStream()
+        for chunk in _chunks(text, size):
+            parser.feed(chunk)
+        assert parser.done
+        assert parser.result == LESSON
+
+
+def test_parser_emits_fields_and_items_in_order():
+    parser = JsonFieldStream()
+    events = []
+    for chunk in _chunks(json.dumps(LESSON), 5):
+        events.extend(parser.feed(chunk))
+
+    assert [e[1] for e in events if e[0] == "field"] == list(LESSON)
+    sections = [e for e in events if e[0] == "item" and e[1] == "sections"]
+    assert [(e[2], e[3]) for e in sections] == list(enumerate(LESSON["sections"]))
+    # The first section is reported before the model has written the second
+    first = events.index(sections[0])
+    assert first < events.index(sections[1])
+    assert ("field", "sections", LESSON["sections"]) in events[first:]
+
+
+def test_parser_first_section_available_before_object_closes():
+    text = json.dumps(LESSON)
+    cut = text.index('"While loops"')
+    events = JsonFieldStream().feed(text[:cut])
+    assert ("field", "objective", LESSON["objective"]) in events
+    assert ("item", "sections", 0, LESSON["sections"][0]) in events
+
+
+def test_parser_handles_bare_scalars():
+    parser = JsonFieldStream()
+    events = parser.feed('{"n": 12, "ok": true, "xs": [1, null, 2.5], "z": null}')
+    assert parser.result == {"n": 12, "ok": True, "xs": [1, None, 2.5], "z": None}
+    assert [e[3] for e in events if e[0] == "item"] == [1, None, 2.5]
+
+
+# --- Endpoint tests ---
+
+def _seed_lesson():
+    from app.database import execute
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Python')", ())
+    lesson_id = execute(
+        "INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Loops', 1)",
+        (skill_id,),
+    )
+    return skill_id, lesson_id
+
+
+async def _fake_stream(**kwargs):
+    for chunk in _chunks("```json\n" + json.dumps(LESSON) + "\n```", 13):
+        yield chunk
+
+
+@patch("app.services.lesson_service.tutor.generate_resources", new_callable=AsyncMock, return_value={"youtube": []})
+@patch("app.services.resources.fetch_arxiv_papers", new_callable=AsyncMock, return_value=[])
+@patch("app.services.lesson_service.tutor.stream_lesson", new=_fake_stream)
+def test_stream_endpoint_emits_sections_then_saves(mock_arxiv, mock_resources, client):
+    from app.database import query_one
+    skill_id, lesson_id = _seed_lesson()
+
+    resp = client.post("/api/lessons/generate/stream", json={"skill_id": skill_id, "lesson_id": lesson_id})
+
+    assert resp.status_code == 200
+    events = parse_sse(resp.text)
+    assert events[0] == ("field", {"key": "title", "value": "Loops"})
+    items = [d for e, d in events if e == "item" and d["key"] == "sections"]
+    assert [d["value"] for d in items] == LESSON["sections"]
+    assert events[-1][0] == "done"
+    assert events[-1][1]["id"] == lesson_id
+    assert events[-1][1]["resources"] == {"youtube": [], "papers": []}
+
+    saved = json.loads(query_one("SELECT content_json FROM lessons WHERE id = ?", (lesson_id,))["content_json"])
+    assert saved["sections"] == LESSON["sections"]
+    assert saved["resources"] == {"youtube": [], "papers": []}
+
+
+async def _stalled_stream(**kwargs):
+    yield '{"title": "Loops", '
+    await asyncio.sleep(60)
+
+
+@patch("app.services.lesson_service.tutor.generate_resources", new_callable=AsyncMock, return_value={"youtube": []})
+@patch("app.services.resources.fetch_arxiv_papers", new_callable=AsyncMock, return_value=[])
+@patch("app.services.lesson_service.tutor.stream_lesson", new=_stalled_stream)
+def test_stalled_stream_times_out_with_an_error_event(mock_arxiv, mock_resources, client, monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, "lesson_timeout_seconds", 0.1)
+    skill_id, lesson_id = _seed_lesson()
+
+    resp = client.post("/api/lessons/generate/stream", json={"skill_id": skill_id, "lesson_id": lesson_id})
+
+    events = parse_sse(resp.text)
+    assert events[0] == ("field", {"key": "title", "value": "Loops"})
+    assert events[-1][0] == "error"
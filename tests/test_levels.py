@@ -0,0 +1,66 @@
+"""Tests for the level table: same levels as walking the curve, plus progress fields."""
+import math
+
+from app.services import gamification
+from app.services.gamification import LEVEL_XP, add_xp, level_from_xp, level_progress, xp_for_level
+
+
+def _walk(total_xp: int, level: int = 1) -> int:
+    """The original level computation: step up while the next level is reached.
+
+    `level` lets a caller sweeping upwards resume from a level it already
+    walked to, which the loop would pass through anyway.
+    """
+    while round(100 * math.pow(level + 1, 1.5)) <= total_xp:
+        level += 1
+    return level
+
+
+def test_matches_walking_the_curve_at_every_threshold_up_to_level_10000():
+    # Levels only change at thresholds, so checking each one and its neighbours covers every XP value
+    walked = 1
+    for level in range(2, 10_001):
+        threshold = round(100 * math.pow(level, 1.5))
+        for xp in (threshold - 1, threshold, threshold + 1):
+            walked = _walk(xp, walked)
+            assert level_from_xp(xp) == walked, xp
+
+
+def test_matches_walking_the_curve_for_small_totals():
+    for xp in range(0, 5000):
+        assert level_from_xp(xp) == _walk(xp)
+
+
+def test_beyond_the_table():
+    top = LEVEL_XP[-1]
+    for xp in (top - 1, top, top + 1, xp_for_level(10_001), xp_for_level(12_345) - 1, 10**9):
+        assert level_from_xp(xp) == _walk(xp)
+
+
+def test_level_progress():
+    assert level_progress(0) == {
+        "level": 1, "level_xp": 0, "next_level_xp": 283, "xp_to_next_level": 283, "level_progress": 0.0,
+    }
+    halfway = level_progress((xp_for_level(4) + xp_for_level(5)) // 2)
+    assert halfway["level"] == 4
+    assert 0.49 < halfway["level_progress"] < 0.51
+    assert halfway["xp_to_next_level"] == xp_for_level(5) - (xp_for_level(4) + xp_for_level(5)) // 2
+
+
+def test_progress_endpoint_reports_xp_to_next_level(client):
+    add_xp(1, 300)
+    data = client.get("/api/progress").json()
+    assert data["level"] == 2
+    assert data["total_xp"] == 300
+    assert data["next_level_xp"] == xp_for_level(3)
+    assert data["xp_to_next_level"] == xp_for_level(3) - 300
+    assert 0 < data["level_progress"] < 1
+
+
+def test_add_xp_does_not_walk_levels(monkeypatch):
+    calls = []
+    real = gamification.xp_for_level
+    monkeypatch.setattr(gamification, "xp_for_level", lambda level: calls.append(level) or real(level))
+    add_xp(1, 50_000_000)
+    # Only the current and next level thresholds, not one call per level
+    assert len(calls) <= 2
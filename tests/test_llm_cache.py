@@ -0,0 +1,74 @@
+"""Tests for the persistent LLM response cache."""
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.ai import cache as llm_cache
+from app.ai import tutor
+from app.config import settings
+
+
+CURRICULUM = {"description": "Learn Python", "curriculum": [{"title": "Variables"}]}
+
+
+@pytest.fixture
+def fake_client():
+    client = SimpleNamespace(messages=SimpleNamespace(create=AsyncMock()))
+    client.messages.create.return_value = SimpleNamespace(content=[SimpleNamespace(text=json.dumps(CURRICULUM))])
+    with patch("app.ai.tutor.get_client", return_value=client):
+        yield client
+
+
+def test_repeat_generation_is_served_from_cache(fake_client):
+    before = llm_cache.stats()
+
+    first = asyncio.run(tutor.generate_curriculum("Python Programming"))
+    second = asyncio.run(tutor.generate_curriculum("Python Programming"))
+
+    assert first == second == CURRICULUM
+    assert fake_client.messages.create.await_count == 1
+    after = llm_cache.stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+
+def test_different_prompts_do_not_collide(fake_client):
+    asyncio.run(tutor.generate_curriculum("Python Programming"))
+    asyncio.run(tutor.generate_curriculum("Guitar"))
+    assert fake_client.messages.create.await_count == 2
+
+
+def test_expired_entries_are_regenerated(fake_client, monkeypatch):
+    asyncio.run(tutor.generate_curriculum("Python Programming"))
+    monkeypatch.setattr(settings, "llm_cache_ttl_seconds", -1)
+    asyncio.run(tutor.generate_curriculum("Python Programming"))
+    assert fake_client.messages.create.await_count == 2
+
+
+def test_lru_eviction_keeps_recently_used(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_max_entries", 2)
+    with patch("app.ai.cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0, 5.0]):
+        llm_cache.put("a", "A")   # t=1
+        llm_cache.put("b", "B")   # t=2
+        llm_cache.get("a")        # t=3, "a" is now most recent
+        llm_cache.put("c", "C")   # t=4, evicts "b"
+        assert llm_cache.get("b") is None
+
+    assert llm_cache.stats()["entries"] == 2
+
+
+def test_malformed_json_is_not_cached(fake_client):
+    fake_client.messages.create.return_value = SimpleNamespace(content=[SimpleNamespace(text="not json")])
+    with pytest.raises(json.JSONDecodeError):
+        asyncio.run(tutor.generate_curriculum("Python Programming"))
+    assert llm_cache.stats()["entries"] == 0
+
+
+def test_uncached_generators_always_call_the_model(fake_client):
+    fake_client.messages.create.return_value = SimpleNamespace(content=[SimpleNamespace(text='{"questions": []}')])
+    asyncio.run(tutor.generate_quiz({"title": "x"}, 1))
+    asyncio.run(tutor.generate_quiz({"title": "x"}, 1))
+    assert fake_client.messages.create.await_count == 2
@@ -0,0 +1,54 @@
+"""Tests for the versioned migration runner and its indexes."""
+import sqlite3
+
+from app.database import MIGRATIONS, SCHEMA, _run_migrations, get_db, query, schema_version
+
+
+def _plan(sql: str, params: tuple = ()) -> str:
+    return " ".join(r["detail"] for r in query("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def test_fresh_db_is_at_latest_version():
+    assert schema_version(get_db()) == MIGRATIONS[-1][0]
+
+
+def test_rerunning_migrations_is_a_no_op():
+    db = get_db()
+    _run_migrations(db)
+    rows = db.execute("SELECT version FROM schema_version ORDER BY version").fetchall()
+    assert [r[0] for r in rows] == [m[0] for m in MIGRATIONS]
+
+
+def test_upgrades_db_from_the_old_try_except_runner(tmp_path):
+    """A DB that already has the cheatsheet column (but no schema_version) upgrades cleanly."""
+    db = sqlite3.connect(str(tmp_path / "legacy.db"))
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    db.execute("ALTER TABLE skills ADD COLUMN cheatsheet TEXT")
+    db.commit()
+
+    _run_migrations(db)
+
+    assert schema_version(db) == MIGRATIONS[-1][0]
+    indexes = {r["name"] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_review_cards_user_due" in indexes
+    db.close()
+
+
+def test_hot_queries_use_indexes():
+    assert "idx_review_cards_user_due" in _plan(
+        "SELECT * FROM review_cards WHERE user_id = ? AND next_review_at <= datetime('now') ORDER BY next_review_at",
+        (1,),
+    )
+    assert "idx_chat_messages_user_skill" in _plan(
+        "SELECT role, content FROM chat_messages WHERE user_id = 1 AND skill_id = ? ORDER BY created_at",
+        (1,),
+    )
+    assert "idx_quizzes_lesson" in _plan(
+        "SELECT * FROM quizzes WHERE lesson_id = ? ORDER BY created_at DESC LIMIT 1", (1,),
+    )
+    chart_plan = _plan(
+        """SELECT date(completed_at) as day, COUNT(*) as count FROM quiz_attempts
+           WHERE user_id = 1 AND completed_at >= date('now', '-30 days') GROUP BY day"""
+    )
+    assert "COVERING INDEX idx_quiz_attempts_user_completed" in chart_plan
@@ -0,0 +1,156 @@
+"""Tests for the write-behind user_progress cache."""
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.database import close_db, execute, get_db, query_one, transaction
+from app.services.gamification import add_xp, apply_progress, get_progress
+from app.services.progress_cache import progress_cache
+
+
+def _db_xp(user_id: int = 1) -> int:
+    return query_one("SELECT total_xp FROM user_progress WHERE user_id = ?", (user_id,))["total_xp"]
+
+
+def _journal() -> Path:
+    return Path(f"{settings.db_path}-progress")
+
+
+def _trace():
+    statements = []
+    get_db().set_trace_callback(statements.append)
+    return statements
+
+
+def test_reads_are_served_from_memory():
+    get_progress(1)
+    statements = _trace()
+    for _ in range(5):
+        get_progress(1)
+    get_db().set_trace_callback(None)
+    assert statements == []
+
+
+def test_writes_outside_a_transaction_are_coalesced_until_flush():
+    for _ in range(5):
+        add_xp(1, 10)
+    assert get_progress(1)["total_xp"] == 50
+    assert _db_xp() == 0
+    assert len(_journal().read_text().splitlines()) == 5
+
+    statements = _trace()
+    assert progress_cache.flush() == 1
+    get_db().set_trace_callback(None)
+
+    assert len([s for s in statements if s.lstrip().startswith("UPDATE")]) == 1
+    assert _db_xp() == 50
+    assert progress_cache.stats["last_batch"] == 1
+    assert progress_cache.stats["last_lag_ms"] >= 0
+    assert _journal().read_text() == ""
+
+
+def test_flush_writes_every_dirty_user_in_one_batch():
+    for user_id in (2, 3):
+        execute("INSERT INTO users (id, name) VALUES (?, 'Learner')", (user_id,))
+        execute("INSERT INTO user_progress (user_id) VALUES (?)", (user_id,))
+    for user_id in (1, 2, 3):
+        add_xp(user_id, user_id * 100)
+
+    assert progress_cache.flush() == 3
+    assert [_db_xp(u) for u in (1, 2, 3)] == [100, 200, 300]
+    assert progress_cache.stats["last_batch"] == 3
+    assert progress_cache.flush() == 0
+
+
+def test_changes_in_a_transaction_are_written_at_commit():
+    with transaction():
+        apply_progress(1, 20, quizzes=1)
+        apply_progress(1, 30, reviews=1)
+        assert _db_xp() == 0
+    assert _db_xp() == 50
+    assert progress_cache.metrics()["dirty"] == 0
+    assert not _journal().exists() or _journal().read_text() == ""
+
+
+def test_rollback_restores_the_cached_state():
+    add_xp(1, 5)
+    with pytest.raises(RuntimeError):
+        with transaction():
+            apply_progress(1, 100, lessons=1)
+            raise RuntimeError("crash")
+
+    assert get_progress(1)["total_xp"] == 5
+    assert get_progress(1)["lessons_completed"] == 0
+    # The change from before the transaction is still pending
+    assert progress_cache.flush() == 1
+    assert _db_xp() == 5
+
+
+def test_journal_is_replayed_after_a_crash():
+    add_xp(1, 40)
+    add_xp(1, 2)
+    with open(_journal(), "a") as f:
+        f.write('{"user_id": 1, "total_')  # torn by the crash
+
+    # Dropping the cache without flushing is what a crash does
+    close_db()
+    get_db()
+
+    assert _db_xp() == 42
+    assert progress_cache.stats["recovered"] >= 1
+    assert not _journal().exists()
+
+
+def test_replay_never_overwrites_a_newer_row():
+    add_xp(1, 10)
+    journaled = _journal().read_text()
+    with transaction():
+        apply_progress(1, 100)
+    close_db()
+    _journal().write_text(journaled)  # e.g. compaction never ran
+    get_db()
+
+    assert _db_xp() == 110
+
+
+def test_close_flushes(monkeypatch):
+    monkeypatch.setattr(progress_cache, "flush_interval", 60)
+    progress_cache.start()
+    add_xp(1, 7)
+    progress_cache.close()
+    assert _db_xp() == 7
+
+
+def test_background_flush_runs_on_an_interval(monkeypatch):
+    monkeypatch.setattr(progress_cache, "flush_interval", 0.05)
+    progress_cache.start()
+    try:
+        add_xp(1, 9)
+        deadline = time.monotonic() + 2
+        while _db_xp() != 9 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert _db_xp() == 9
+    finally:
+        progress_cache.close()
+
+
+def test_metrics_report_flush_lag_and_batch_size(client):
+    add_xp(1, 1)
+    metrics = client.get("/api/metrics").json()["progress_cache"]
+    assert metrics["dirty"] == 1
+    assert metrics["oldest_dirty_ms"] >= 0
+    progress_cache.flush()
+    metrics = client.get("/api/metrics").json()["progress_cache"]
+    assert metrics["dirty"] == 0
+    assert {"last_batch", "max_batch", "last_lag_ms", "max_lag_ms", "flushes"} <= metrics.keys()
+
+
+def test_journal_records_are_json_states():
+    add_xp(1, 3)
+    record = json.loads(_journal().read_text().splitlines()[-1])
+    assert record["user_id"] == 1
+    assert record["total_xp"] == 3
+    assert record["version"] == 1
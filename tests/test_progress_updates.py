@@ -0,0 +1,128 @@
+"""Tests for atomic progress updates: XP, counters, level and streak.
+
+Each test runs with the progress cache on and off (one UPDATE per change).
+"""
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from app.config import settings
+from app.database import execute, get_db, query_one
+from app.services.gamification import (
+    XP_DAILY_STREAK, add_xp, apply_progress, level_from_xp, update_streak,
+)
+from app.services.progress_cache import progress_cache
+
+
+@pytest.fixture(autouse=True, params=[True, False], ids=["cache", "sql"])
+def cache_mode(request, monkeypatch):
+    monkeypatch.setattr(settings, "progress_cache", request.param)
+    return request.param
+
+
+def _stored(sql: str) -> dict:
+    """Read user_progress from the database, after writing back anything cached."""
+    progress_cache.flush()
+    return dict(query_one(sql))
+
+
+def _set_last_activity(days_ago: int, streak: int):
+    day = (date.today() - timedelta(days=days_ago)).isoformat()
+    execute(
+        "UPDATE user_progress SET last_activity_date = ?, current_streak = ?, longest_streak = ? WHERE user_id = 1",
+        (day, streak, streak),
+    )
+
+
+def test_returns_the_new_state():
+    state = apply_progress(1, 300, lessons=1, quizzes=2, reviews=3)
+    assert state["total_xp"] == 300
+    assert state["level"] == level_from_xp(300) == 2
+    assert (state["lessons_completed"], state["quizzes_completed"], state["reviews_completed"]) == (1, 2, 3)
+    assert state["xp_added"] == 300
+    assert state["xp_to_next_level"] > 0
+    assert _stored("SELECT total_xp, level FROM user_progress WHERE user_id = 1") == {"total_xp": 300, "level": 2}
+
+
+def test_one_statement_per_activity(cache_mode):
+    if cache_mode:
+        pytest.skip("the cache writes on flush; see test_progress_cache.py")
+    statements = []
+    get_db().set_trace_callback(statements.append)
+    try:
+        apply_progress(1, 20, streak=True, quizzes=1)
+    finally:
+        get_db().set_trace_callback(None)
+    writes = [s for s in statements if s.lstrip().upper().startswith(("UPDATE", "INSERT", "SELECT"))]
+    assert len(writes) == 1
+
+
+def test_first_activity_starts_a_streak():
+    state = update_streak(1)
+    assert (state["current_streak"], state["longest_streak"]) == (1, 1)
+    assert state["last_activity_date"] == date.today().isoformat()
+    assert state["total_xp"] == 0
+
+
+def test_activity_after_yesterday_continues_the_streak_with_a_bonus():
+    _set_last_activity(1, 4)
+    state = apply_progress(1, 10, streak=True)
+    assert (state["current_streak"], state["longest_streak"]) == (5, 5)
+    assert state["total_xp"] == 10 + XP_DAILY_STREAK
+
+
+def test_second_activity_today_leaves_the_streak_alone():
+    _set_last_activity(1, 4)
+    update_streak(1)
+    state = update_streak(1)
+    assert state["current_streak"] == 5
+    assert state["total_xp"] == XP_DAILY_STREAK
+
+
+def test_gap_restarts_the_streak_but_keeps_the_longest():
+    _set_last_activity(3, 6)
+    state = update_streak(1)
+    assert (state["current_streak"], state["longest_streak"]) == (1, 6)
+    assert state["total_xp"] == 0
+
+
+def test_activity_on_a_past_day():
+    _set_last_activity(3, 2)
+    state = apply_progress(1, 10, streak=True, day=date.today() - timedelta(days=2))
+    assert (state["current_streak"], state["total_xp"]) == (3, 10 + XP_DAILY_STREAK)
+    assert state["last_activity_date"] == (date.today() - timedelta(days=2)).isoformat()
+
+    # A day before the last recorded activity leaves the streak alone
+    state = apply_progress(1, 10, streak=True, day=date.today() - timedelta(days=5))
+    assert (state["current_streak"], state["total_xp"]) == (3, 20 + XP_DAILY_STREAK)
+    assert state["last_activity_date"] == (date.today() - timedelta(days=2)).isoformat()
+
+
+def test_xp_without_streak_leaves_activity_date_alone():
+    _set_last_activity(1, 4)
+    state = add_xp(1, 15)
+    assert state["last_activity_date"] == (date.today() - timedelta(days=1)).isoformat()
+    assert state["current_streak"] == 4
+
+
+def test_concurrent_updates_lose_nothing():
+    threads, per_thread = 8, 50
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            apply_progress(1, 7, reviews=1)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    progress = _stored("SELECT * FROM user_progress WHERE user_id = 1")
+    assert progress["total_xp"] == threads * per_thread * 7
+    assert progress["reviews_completed"] == threads * per_thread
+    assert progress["level"] == level_from_xp(progress["total_xp"])
+
@@ -0,0 +1,88 @@
+"""Tests for Anthropic prompt-cache breakpoints and token usage metrics."""
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.ai import tutor, usage
+
+LESSON = {"title": "Recursion", "key_points": ["Base case", "Recursive case"]}
+
+
+def _response(text, **tokens):
+    counts = {"input_tokens": 10, "output_tokens": 5, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+    return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=SimpleNamespace(**{**counts, **tokens}))
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(usage, "_stats", {key: 0 for key in usage._stats})
+    client = SimpleNamespace(messages=SimpleNamespace(create=AsyncMock()))
+    with patch("app.ai.tutor.get_client", return_value=client):
+        yield client
+
+
+def test_quiz_and_review_cards_share_a_cached_lesson_prefix(fake_client):
+    fake_client.messages.create.side_effect = [
+        _response('{"questions": []}', cache_creation_input_tokens=1500),
+        _response('{"cards": []}', cache_read_input_tokens=1500),
+    ]
+    asyncio.run(tutor.generate_quiz(LESSON, 2))
+    asyncio.run(tutor.generate_review_cards(LESSON))
+
+    quiz_call, cards_call = (c.kwargs for c in fake_client.messages.create.call_args_list)
+    quiz_blocks = quiz_call["messages"][0]["content"]
+    cards_blocks = cards_call["messages"][0]["content"]
+
+    # Same system prompt and same leading block, marked for caching
+    assert quiz_call["system"] == cards_call["system"]
+    assert quiz_blocks[0] == cards_blocks[0]
+    assert quiz_blocks[0]["cache_control"] == {"type": "ephemeral"}
+    assert json.dumps(LESSON, indent=2) in quiz_blocks[0]["text"]
+    # The task-specific instructions follow the breakpoint
+    assert "quiz" in quiz_blocks[1]["text"] and "cache_control" not in quiz_blocks[1]
+    assert "review cards" in cards_blocks[1]["text"]
+
+    stats = usage.stats()
+    assert stats["cache_creation_input_tokens"] == 1500
+    assert stats["cache_read_input_tokens"] == 1500
+    assert stats["requests"] == 2
+    assert stats["cache_read_ratio"] == round(1500 / 3020, 3)
+
+
+def test_chat_caches_system_prompt_and_history(fake_client):
+    fake_client.messages.create.return_value = _response("Sure!")
+    history = [
+        {"role": "user", "content": "What is recursion?"},
+        {"role": "assistant", "content": "A function calling itself."},
+        {"role": "user", "content": "Example?"},
+    ]
+    asyncio.run(tutor.chat(history, "Current lesson topic: Recursion"))
+
+    call = fake_client.messages.create.call_args.kwargs
+    assert call["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "Current lesson topic: Recursion" in call["system"][0]["text"]
+    # The last turn before the new message closes the cached prefix
+    assert call["messages"][1]["content"] == [
+        {"type": "text", "text": "A function calling itself.", "cache_control": {"type": "ephemeral"}},
+    ]
+    assert call["messages"][2] == {"role": "user", "content": "Example?"}
+    # The caller's history is left untouched
+    assert history[1]["content"] == "A function calling itself."
+
+
+def test_first_chat_turn_only_marks_the_system_prompt(fake_client):
+    fake_client.messages.create.return_value = _response("Hi!")
+    asyncio.run(tutor.chat([{"role": "user", "content": "Hello"}]))
+    call = fake_client.messages.create.call_args.kwargs
+    assert call["messages"] == [{"role": "user", "content": "Hello"}]
+
+
+def test_metrics_expose_usage(fake_client, client):
+    fake_client.messages.create.return_value = _response('{"cards": []}', cache_read_input_tokens=900)
+    asyncio.run(tutor.generate_review_cards(LESSON))
+    metrics = client.get("/api/metrics").json()["llm_usage"]
+    assert metrics["cache_read_input_tokens"] == 900
+    assert metrics["input_tokens"] == 10
@@ -0,0 +1,102 @@
+"""Tests for grading a whole quiz in one request."""
+import json
+from unittest.mock import AsyncMock, patch
+
+from app.database import execute, query_one
+
+QUESTIONS = [
+    {"type": "multiple_choice", "question": "Pick one", "options": ["Red", "Blue"], "correct_answer": "Blue"},
+    {"type": "true_false", "question": "The sky is green.", "correct_answer": "False"},
+    {"type": "short_answer", "question": "Name the powerhouse of the cell", "correct_answer": "Mitochondria"},
+    {"type": "short_answer", "question": "Why do leaves change colour?",
+     "correct_answer": "Chlorophyll breaks down in autumn, revealing other pigments already present in the leaf"},
+    {"type": "short_answer", "question": "What does an enzyme do?",
+     "correct_answer": "It lowers the activation energy of a reaction, speeding it up without being consumed"},
+]
+ANSWERS = {
+    "0": "Blue",
+    "1": "true",
+    "2": "mitochondria",
+    "3": "the green pigment fades and shows the yellow ones",
+    "4": "it makes food",
+}
+
+
+def _seed_quiz():
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Biology')", ())
+    lesson_id = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Cells', 1)", (skill_id,))
+    return execute("INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, ?)", (lesson_id, json.dumps(QUESTIONS)))
+
+
+@patch("app.services.quiz_service.tutor.grade_answer", new_callable=AsyncMock)
+@patch("app.services.quiz_service.tutor.grade_answers", new_callable=AsyncMock)
+def test_free_text_answers_are_graded_in_one_call(mock_batch, mock_single, client):
+    mock_batch.return_value = {"results": [
+        {"id": "3", "correct": True, "feedback": "Yes, chlorophyll fades."},
+        {"id": "4", "correct": False, "feedback": "Enzymes speed up reactions."},
+    ]}
+    quiz_id = _seed_quiz()
+
+    res = client.post("/api/quizzes/grade-batch", json={"quiz_id": quiz_id, "answers": ANSWERS})
+    assert res.status_code == 200
+    body = res.json()
+
+    assert mock_batch.await_count == 1
+    items = mock_batch.await_args.args[0]
+    assert [item["id"] for item in items] == ["3", "4"]
+    assert items[0]["answer"] == ANSWERS["3"]
+    mock_single.assert_not_awaited()
+
+    assert [body["results"][str(i)]["correct"] for i in range(5)] == [True, False, True, True, False]
+    assert body["results"]["3"]["feedback"] == "Yes, chlorophyll fades."
+    assert body["correct_count"] == 3
+    assert body["score"] == 0.6
+
+    attempt = query_one("SELECT * FROM quiz_attempts WHERE quiz_id = ?", (quiz_id,))
+    assert attempt["score"] == 0.6
+    assert attempt["xp_earned"] == body["xp_earned"] > 0
+    stored = json.loads(attempt["answers_json"])
+    assert stored["4"] == {"answer": "it makes food", "correct": False, "feedback": "Enzymes speed up reactions."}
+
+
+@patch("app.services.quiz_service.tutor.grade_answer", new_callable=AsyncMock)
+@patch("app.services.quiz_service.tutor.grade_answers", new_callable=AsyncMock)
+def test_invalid_batch_entries_are_regraded_individually(mock_batch, mock_single, client):
+    mock_batch.return_value = {"results": [
+        {"id": "3", "correct": "yes", "feedback": "?"},   # not a boolean
+        {"id": "4", "correct": True, "feedback": "Good."},
+        {"id": "9", "correct": True, "feedback": "No such question."},
+    ]}
+    mock_single.return_value = {"correct": True, "feedback": "Right idea."}
+    quiz_id = _seed_quiz()
+
+    body = client.post("/api/quizzes/grade-batch", json={"quiz_id": quiz_id, "answers": ANSWERS}).json()
+
+    assert mock_single.await_count == 1
+    assert mock_single.await_args.args == (QUESTIONS[3], ANSWERS["3"])
+    assert body["results"]["3"] == {"answer": ANSWERS["3"], "correct": True, "feedback": "Right idea."}
+    assert body["results"]["4"]["correct"] is True
+
+
+@patch("app.services.quiz_service.tutor.grade_answers", new_callable=AsyncMock)
+def test_unanswered_questions_count_as_wrong(mock_batch, client):
+    quiz_id = _seed_quiz()
+    body = client.post("/api/quizzes/grade-batch", json={"quiz_id": quiz_id, "answers": {"0": "Blue"}}).json()
+    mock_batch.assert_not_awaited()
+    assert body["correct_count"] == 1
+    assert body["results"]["2"] == {"answer": "", "correct": False, "feedback": "No answer given."}
+
+
+@patch("app.services.quiz_service.tutor.grade_answers", new_callable=AsyncMock)
+def test_resubmitting_does_not_regrade(mock_batch, client):
+    mock_batch.return_value = {"results": [{"id": "3", "correct": True}, {"id": "4", "correct": True}]}
+    quiz_id = _seed_quiz()
+    client.post("/api/quizzes/grade-batch", json={"quiz_id": quiz_id, "answers": ANSWERS})
+    again = client.post("/api/quizzes/grade-batch", json={"quiz_id": quiz_id, "answers": ANSWERS}).json()
+    assert again["already_submitted"] is True
+    assert mock_batch.await_count == 1
+
+
+def test_unknown_quiz(client):
+    res = client.post("/api/quizzes/grade-batch", json={"quiz_id": 999, "answers": {"0": "x"}})
+    assert res.status_code == 404
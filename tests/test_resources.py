@@ -0,0 +1,180 @@
+"""Tests for the arXiv fetcher, against a local stand-in HTTP server."""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.services import resources
+
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <id>http://arxiv.org/abs/1234.5678v1</id>
+    <title>Attention Is
+ All You Need</title>
+    <summary>{summary}</summary>
+  </entry>
+</feed>"""
+
+
+class FakeArxiv(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    status = 200
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        server.peers.add(self.client_address)
+        body = FEED.format(summary="x" * 300).encode()
+        self.send_response(server.status)
+        self.send_header("Content-Type", "application/atom+xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def arxiv(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeArxiv)
+    server.requests, server.peers, server.status = [], set(), 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "arxiv_url", f"http://127.0.0.1:{server.server_port}/api/query")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _run(coro_fn):
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await resources.close_http_client()
+    return asyncio.run(main())
+
+
+def test_parses_feed(arxiv):
+    papers = _run(lambda: resources.fetch_arxiv_papers("transformers"))
+    assert papers == [{
+        "title": "Attention Is  All You Need",
+        "url": "http://arxiv.org/abs/1234.5678v1",
+        "summary": "x" * 247 + "...",
+    }]
+
+
+def test_repeat_topic_is_served_from_disk_cache(arxiv):
+    async def twice():
+        first = await resources.fetch_arxiv_papers("transformers")
+        second = await resources.fetch_arxiv_papers("  Transformers ")
+        return first, second
+
+    first, second = _run(twice)
+    assert first == second
+    assert len(arxiv.requests) == 1
+    assert list(settings.arxiv_cache_dir.glob("*.json"))
+
+
+def test_expired_cache_refetches(arxiv, monkeypatch):
+    _run(lambda: resources.fetch_arxiv_papers("transformers"))
+    monkeypatch.setattr(settings, "arxiv_cache_ttl_seconds", -1)
+    _run(lambda: resources.fetch_arxiv_papers("transformers"))
+    assert len(arxiv.requests) == 2
+
+
+def test_failures_are_negatively_cached(arxiv, monkeypatch):
+    arxiv.status = 503
+
+    async def twice():
+        return [await resources.fetch_arxiv_papers("transformers") for _ in range(2)]
+
+    assert _run(twice) == [[], []]
+    assert len(arxiv.requests) == 1
+
+    # Once the short failure TTL lapses, arXiv is tried again
+    arxiv.status = 200
+    monkeypatch.setattr(settings, "arxiv_failure_ttl_seconds", -1)
+    assert _run(lambda: resources.fetch_arxiv_papers("transformers"))
+
+
+def test_malformed_cache_entry_is_a_miss(arxiv):
+    path = resources._cache_path("transformers", 3)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for entry in ('{"papers": []}', "[1, 2]", "not json"):
+        path.write_text(entry)
+        assert _run(lambda: resources.fetch_arxiv_papers("transformers"))
+    assert len(arxiv.requests) == 3
+
+
+def test_concurrent_writers_of_one_topic_do_not_collide():
+    path = resources._cache_path("transformers", 3)
+    errors = []
+
+    def write(i):
+        try:
+            for _ in range(20):
+                resources._write_cache(path, [{"title": str(i)}], ok=True)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert resources._read_cache(path)
+    assert not list(path.parent.glob("*.tmp"))
+
+
+def test_unwritable_cache_still_returns_papers(arxiv, monkeypatch, tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setattr(settings, "arxiv_cache_dir", blocker / "cache")
+    assert _run(lambda: resources.fetch_arxiv_papers("transformers"))
+
+
+def test_connections_are_reused(arxiv):
+    async def several():
+        for topic in ("a", "b", "c"):
+            await resources.fetch_arxiv_papers(topic)
+
+    _run(several)
+    assert len(arxiv.requests) == 3
+    assert len(arxiv.peers) == 1
+
+
+def test_resources_run_concurrently_with_lesson_body():
+    from app.database import execute
+    from app.services import lesson_service
+
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'ML')", ())
+    lesson_id = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Attention', 1)", (skill_id,))
+    started = []
+
+    async def slow(name, value):
+        started.append(name)
+        await asyncio.sleep(0.2)
+        return value
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await lesson_service.generate_lesson(skill_id, lesson_id)
+        return result, loop.time() - start
+
+    with patch("app.services.lesson_service.tutor.generate_lesson", new=lambda **kw: slow("lesson", {"title": "Attention"})), \
+            patch("app.services.lesson_service.tutor.generate_resources", new=lambda *a: slow("resources", {"youtube": []})), \
+            patch("app.services.resources.fetch_arxiv_papers", new=lambda topic: slow("arxiv", [])):
+        result, elapsed = asyncio.run(main())
+
+    assert sorted(started) == ["arxiv", "lesson", "resources"]
+    assert result["resources"] == {"youtube": [], "papers": []}
+    assert elapsed < 0.35  # one slow step, not three
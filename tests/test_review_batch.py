@@ -0,0 +1,157 @@
+"""Tests for rating many review cards in one request."""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from app.database import execute, get_db, query, query_one
+from app.services import review_service
+from app.services.gamification import XP_REVIEW_CARD, get_progress
+
+
+def _cards(n: int) -> list[int]:
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Test')", ())
+    lesson_id = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Topic', 1)", (skill_id,))
+    return [
+        execute("INSERT INTO review_cards (user_id, lesson_id, question, answer) VALUES (1, ?, ?, 'A.')",
+                (lesson_id, f"Q{i}?"))
+        for i in range(n)
+    ]
+
+
+def _at(minutes_ago: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)).isoformat()
+
+
+def test_batch_matches_rating_cards_one_by_one(client):
+    singles, batch = _cards(4), _cards(4)
+    qualities = [0, 3, 4, 5]
+    for card_id, quality in zip(singles, qualities):
+        client.post(f"/api/review/{card_id}/rate", json={"quality": quality})
+    client.post("/api/review/batch", json={
+        "ratings": [{"card_id": c, "quality": q} for c, q in zip(batch, qualities)],
+    })
+
+    columns = "ease_factor, interval_days, repetitions"
+    for single, batched in zip(singles, batch):
+        assert dict(query_one(f"SELECT {columns} FROM review_cards WHERE id = ?", (single,))) == \
+            dict(query_one(f"SELECT {columns} FROM review_cards WHERE id = ?", (batched,)))
+
+
+def test_awards_aggregate_xp_once(client):
+    card_ids = _cards(5)
+    with patch("app.services.gamification.check_achievements", return_value=[]) as check:
+        result = client.post("/api/review/batch", json={
+            "ratings": [{"card_id": c, "quality": 0 if i == 0 else 4} for i, c in enumerate(card_ids)],
+        }).json()
+
+    assert result["reviewed"] == 5
+    assert result["xp_earned"] == 4 * XP_REVIEW_CARD
+    check.assert_called_once()
+    progress = get_progress(1)
+    assert progress["total_xp"] >= 4 * XP_REVIEW_CARD
+    assert progress["reviews_completed"] == 5
+
+
+def test_whole_batch_reads_once_and_commits_once():
+    card_ids = _cards(20)
+    statements = []
+    get_db().set_trace_callback(statements.append)
+    review_service.rate_cards(1, [{"card_id": c, "quality": 4} for c in card_ids])
+    get_db().set_trace_callback(None)
+
+    assert sum("FROM review_cards" in s for s in statements) == 1
+    assert sum(s.strip().upper() == "COMMIT" for s in statements) == 1
+
+
+def test_same_card_twice_is_applied_in_review_order(client):
+    (card_id,) = _cards(1)
+    result = client.post("/api/review/batch", json={"ratings": [
+        {"card_id": card_id, "quality": 4, "reviewed_at": _at(1)},
+        {"card_id": card_id, "quality": 0, "reviewed_at": _at(5)},
+    ]}).json()
+
+    assert result["reviewed"] == 2
+    card = query_one("SELECT repetitions, interval_days FROM review_cards WHERE id = ?", (card_id,))
+    # "Again" first resets the card, then "Good" starts it over
+    assert (card["repetitions"], card["interval_days"]) == (1, 1)
+
+
+def test_resending_a_queue_is_a_no_op(client):
+    card_ids = _cards(3)
+    payload = {"ratings": [{"card_id": c, "quality": 5, "reviewed_at": _at(10)} for c in card_ids]}
+    client.post("/api/review/batch", json=payload)
+    before = [dict(r) for r in query("SELECT * FROM review_cards ORDER BY id")]
+    xp = get_progress(1)["total_xp"]
+
+    result = client.post("/api/review/batch", json=payload).json()
+
+    assert result["reviewed"] == 0
+    assert result["skipped"] == card_ids
+    assert [dict(r) for r in query("SELECT * FROM review_cards ORDER BY id")] == before
+    assert get_progress(1)["total_xp"] == xp
+
+
+def test_reviewed_at_schedules_from_when_the_card_was_rated(client):
+    (card_id,) = _cards(1)
+    client.post("/api/review/batch", json={"ratings": [
+        {"card_id": card_id, "quality": 4, "reviewed_at": "2020-01-01T09:30:00+02:00"},
+    ]})
+    card = query_one("SELECT last_reviewed_at, next_review_at FROM review_cards WHERE id = ?", (card_id,))
+    assert card["last_reviewed_at"] == "2020-01-01T07:30:00"
+    assert card["next_review_at"] == "2020-01-02T07:30:00"
+
+
+def test_future_timestamps_are_clamped_to_now(client):
+    (card_id,) = _cards(1)
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    client.post("/api/review/batch", json={"ratings": [{"card_id": card_id, "quality": 4, "reviewed_at": tomorrow}]})
+    last = query_one("SELECT last_reviewed_at FROM review_cards WHERE id = ?", (card_id,))["last_reviewed_at"]
+    assert datetime.fromisoformat(last) <= datetime.utcnow()
+
+
+def test_unknown_cards_are_skipped(client):
+    (card_id,) = _cards(1)
+    result = client.post("/api/review/batch", json={"ratings": [
+        {"card_id": card_id, "quality": 4}, {"card_id": 9999, "quality": 4},
+    ]}).json()
+    assert result["reviewed"] == 1
+    assert result["skipped"] == [9999]
+    assert result["cards"] == [{"card_id": card_id, "next_review_days": 1}]
+
+
+def test_rejects_invalid_batches(client):
+    assert client.post("/api/review/batch", json={"ratings": []}).status_code == 422
+    assert client.post("/api/review/batch", json={"ratings": [{"card_id": 1, "quality": 9}]}).status_code == 422
+
+
+def test_offline_days_count_towards_the_streak(client):
+    card_ids = _cards(2)
+    local_now = datetime.now().astimezone()
+    two_days_ago = (local_now - timedelta(days=2)).date().isoformat()
+    execute("UPDATE user_progress SET last_activity_date = ?, current_streak = 1, longest_streak = 1 "
+            "WHERE user_id = 1", (two_days_ago,))
+
+    client.post("/api/review/batch", json={"ratings": [
+        {"card_id": card_ids[0], "quality": 4, "reviewed_at": (local_now - timedelta(days=1)).isoformat()},
+        {"card_id": card_ids[1], "quality": 4, "reviewed_at": local_now.isoformat()},
+    ]})
+
+    progress = get_progress(1)
+    assert progress["current_streak"] == 3
+    assert progress["last_activity_date"] == local_now.date().isoformat()
+    assert progress["reviews_completed"] == 2
+
+
+def test_ratings_older_than_the_last_activity_keep_the_streak(client):
+    (card_id,) = _cards(1)
+    today = datetime.now().astimezone()
+    execute("UPDATE user_progress SET last_activity_date = ?, current_streak = 5, longest_streak = 5 "
+            "WHERE user_id = 1", (today.date().isoformat(),))
+
+    client.post("/api/review/batch", json={"ratings": [
+        {"card_id": card_id, "quality": 4, "reviewed_at": (today - timedelta(days=3)).isoformat()},
+    ]})
+
+    progress = get_progress(1)
+    assert progress["current_streak"] == 5
+    assert progress["last_activity_date"] == today.date().isoformat()
+    assert progress["reviews_completed"] == 1
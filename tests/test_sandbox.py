@@ -0,0 +1,281 @@
+"""Tests for the pre-started sandbox worker pool behind /api/exercises/run."""
+import io
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from app.config import PROJECT_ROOT
+from app.services import sandbox, sandbox_worker
+from app.services.sandbox import SandboxBusy, SandboxPool
+from tests.conftest import parse_sse
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, queue_limit=0, queue_wait=0.1)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def shared_pool(monkeypatch):
+    pool = SandboxPool(size=2, queue_limit=2, queue_wait=1)
+    monkeypatch.setattr(sandbox, "pool", pool)
+    yield pool
+    pool.close()
+
+
+def test_runs_code_and_captures_both_streams(pool):
+    result = pool.run("import sys\nprint('hi')\nprint('oops', file=sys.stderr)")
+    assert result == {
+        "stdout": "hi\n", "stderr": "oops\n", "exit_code": 0, "timed_out": False, "truncated": False,
+    }
+
+
+def test_traceback_points_at_learner_code(pool):
+    result = pool.run("x = 1\ny = x / 0\n")
+    assert result["exit_code"] == 1
+    assert 'File "<exercise>", line 2' in result["stderr"]
+    assert "y = x / 0" in result["stderr"]
+    assert "ZeroDivisionError" in result["stderr"]
+    assert "sandbox_worker" not in result["stderr"]
+
+
+def test_runs_do_not_share_state(pool):
+    pool.run("import math\nmath.pi = 3\nleaked = 1")
+    result = pool.run("import math\nprint(math.pi)\nprint(leaked)")
+    assert result["stdout"].startswith("3.14159")
+    assert "NameError" in result["stderr"]
+
+
+def test_infinite_loop_is_killed_at_the_timeout(pool):
+    start = time.monotonic()
+    result = pool.run("print('start', flush=True)\nwhile True: pass", timeout=0.5)
+    assert time.monotonic() - start < 2
+    assert result["timed_out"] is True
+    assert result["stdout"] == "start\n"
+    # The worker is still usable afterwards
+    assert pool.run("print(1)")["stdout"] == "1\n"
+
+
+def test_memory_is_limited(pool):
+    result = pool.run("x = bytearray(2 * 1024 ** 3)", memory_mb=128)
+    assert "MemoryError" in result["stderr"]
+
+
+def test_code_runs_in_a_throwaway_directory(pool):
+    first = pool.run("import os\nopen('notes.txt', 'w').write('x')\nprint(os.listdir('.'))")
+    assert first["stdout"] == "['notes.txt']\n"
+    second = pool.run("import os\nprint(os.listdir('.'))")
+    assert second["stdout"] == "[]\n"
+
+
+confined = pytest.mark.skipif(
+    not sandbox_worker.namespaces_available(), reason="unprivileged namespaces are unavailable"
+)
+
+
+@confined
+def test_project_files_are_out_of_reach(pool):
+    result = pool.run(f"open({str(PROJECT_ROOT / 'pyproject.toml')!r}).read()")
+    assert "FileNotFoundError" in result["stderr"]
+    result = pool.run(f"import os\nprint(os.path.exists('/etc/passwd'))\nos.listdir({str(PROJECT_ROOT)!r})")
+    assert result["stdout"] == "False\n"
+    assert "FileNotFoundError" in result["stderr"]
+
+
+@confined
+def test_standard_library_is_importable_but_read_only(pool):
+    result = pool.run("import decimal, json, os\nprint(json.dumps([1]))\nopen(os.__file__, 'a')")
+    assert result["stdout"] == "[1]\n"
+    assert "Read-only file system" in result["stderr"] or "Permission denied" in result["stderr"]
+
+
+def test_server_secrets_are_not_in_the_environment(pool):
+    result = pool.run("import os\nprint('ANTHROPIC_API_KEY' in os.environ)")
+    assert result["stdout"] == "False\n"
+
+
+def test_network_is_blocked(pool):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    port = listener.getsockname()[1]
+    try:
+        result = pool.run(
+            "import socket\n"
+            f"socket.create_connection(('127.0.0.1', {port}), timeout=1)\n"
+            "print('connected')"
+        )
+    finally:
+        listener.close()
+    assert "connected" not in result["stdout"]
+    assert result["exit_code"] == 1
+
+
+def test_saturated_pool_rejects_instead_of_queueing(pool):
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        pool.run("import time\ntime.sleep(0.5)")
+
+    thread = threading.Thread(target=slow)
+    thread.start()
+    started.wait()
+    time.sleep(0.1)
+    with pytest.raises(SandboxBusy):
+        pool.run("print(1)")
+    thread.join()
+    assert pool.stats["rejected"] == 1
+    assert pool.run("print(1)")["stdout"] == "1\n"
+
+
+def test_run_endpoint(shared_pool, client):
+    res = client.post("/api/exercises/run", json={"code": "print(6 * 7)"})
+    assert res.status_code == 200
+    assert res.json() == {"output": "42\n"}
+
+    res = client.post("/api/exercises/run", json={"code": "pass"})
+    assert res.json() == {"output": "(No output)"}
+
+
+def test_run_endpoint_returns_503_when_saturated(client, monkeypatch):
+    class Saturated:
+        def stream(self, code):
+            raise SandboxBusy()
+
+    monkeypatch.setattr(sandbox, "pool", Saturated())
+    for path in ("/api/exercises/run", "/api/exercises/run/stream"):
+        res = client.post(path, json={"code": "print(1)"})
+        assert res.status_code == 503
+        assert res.headers["retry-after"] == "1"
+
+
+def test_output_cap_kills_a_print_loop(pool):
+    start = time.monotonic()
+    result = pool.run("while True:\n    print('x' * 999)", max_output=10_000)
+    assert time.monotonic() - start < 2
+    assert result["truncated"] is True
+    assert result["timed_out"] is False
+    assert len(result["stdout"]) == 10_000
+
+
+def test_output_is_streamed_while_the_code_runs(pool):
+    events = pool.stream("import time\nprint('first', flush=True)\ntime.sleep(0.5)\nprint('second')")
+    start = time.monotonic()
+    first = next(events)
+    assert time.monotonic() - start < 0.4
+    assert first == {"event": "output", "stream": "stdout", "data": "first\n"}
+    rest = list(events)
+    assert rest[-1]["event"] == "exit"
+    assert "".join(e["data"] for e in rest[:-1]) == "second\n"
+
+
+def test_abandoned_stream_replaces_the_worker(pool):
+    events = pool.stream("import time\nprint('tick', flush=True)\ntime.sleep(5)")
+    assert next(events)["data"] == "tick\n"
+    events.close()
+    assert pool.stats["restarted"] == 1
+    assert pool.run("print(1)")["stdout"] == "1\n"
+
+
+def test_stream_endpoint(shared_pool, client):
+    res = client.post("/api/exercises/run/stream", json={"code": "print('a')\nimport sys\nprint('b', file=sys.stderr)"})
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(res.text)
+    assert ("output", {"stream": "stdout", "text": "a\n"}) in events
+    assert ("output", {"stream": "stderr", "text": "b\n"}) in events
+    assert events[-1] == ("done", {"exit_code": 0, "timed_out": False, "truncated": False, "notice": None})
+
+
+def test_stream_endpoint_reports_output_limit(shared_pool, client, monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, "sandbox_max_output_bytes", 2048)
+    res = client.post("/api/exercises/run/stream", json={"code": "while True: print('spam')"})
+    events = parse_sse(res.text)
+    assert sum(len(data["text"]) for kind, data in events if kind == "output") == 2048
+    assert events[-1][1]["truncated"] is True
+    assert "Output limit reached" in events[-1][1]["notice"]
+
+    res = client.post("/api/exercises/run", json={"code": "while True: print('spam')"})
+    assert res.json()["output"].endswith("Output limit reached (2 KB), execution stopped")
+
+
+def _worker_processes() -> list[int]:
+    """Live processes forked from a sandbox worker (they keep its command line)."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+            with open(f"/proc/{entry}/stat") as f:
+                state = f.read().rsplit(")", 1)[1].split()[0]
+        except (OSError, IndexError):
+            continue
+        if b"app.services.sandbox_worker" in cmdline and state != "Z":
+            pids.append(int(entry))
+    return pids
+
+
+@confined
+def test_timeout_kills_processes_that_left_the_process_group(pool):
+    pool.start()
+    before = set(_worker_processes())
+    result = pool.run(
+        "import os, time\n"
+        "if os.fork() == 0:\n"
+        "    os.setsid()\n"
+        "    time.sleep(30)\n"
+        "time.sleep(30)\n",
+        timeout=0.5,
+    )
+    assert result["timed_out"] is True
+    deadline = time.monotonic() + 2
+    while set(_worker_processes()) - before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert set(_worker_processes()) - before == set()
+
+
+@confined
+def test_process_count_is_limited(pool):
+    result = pool.run(
+        "import os, time\n"
+        "started = 0\n"
+        "for _ in range(200):\n"
+        "    try:\n"
+        "        pid = os.fork()\n"
+        "    except OSError:\n"
+        "        break\n"
+        "    if pid == 0:\n"
+        "        time.sleep(5)\n"
+        "        os._exit(0)\n"
+        "    started += 1\n"
+        "print(started)\n",
+        timeout=3,
+    )
+    assert int(result["stdout"]) < sandbox_worker.MAX_PROCESSES
+
+
+def test_worker_refuses_to_run_unconfined(monkeypatch):
+    monkeypatch.setattr(sandbox_worker, "_confinable", False)
+    out = io.StringIO()
+    sandbox_worker._run({"code": "print(1)", "timeout": 1, "memory_mb": 64, "max_output": 100}, out)
+    assert json.loads(out.getvalue())["event"] == "unavailable"
+
+
+def test_run_endpoint_reports_an_unavailable_sandbox(client, monkeypatch):
+    def unavailable(code):
+        def events():
+            raise sandbox.SandboxUnavailable("Code execution is unavailable")
+            yield
+        return events()
+
+    monkeypatch.setattr(sandbox.pool, "stream", unavailable)
+    assert client.post("/api/exercises/run", json={"code": "print(1)"}).json() == {
+        "output": "Error: Code execution is unavailable",
+    }
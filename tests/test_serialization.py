@@ -0,0 +1,92 @@
+"""Tests for the JSON serializer and pre-parsed lesson content in API responses."""
+import builtins
+import importlib
+import json
+
+import pytest
+
+from app import serialization
+from app.database import execute, query_one
+
+SAMPLE = {"title": "Café ☕", "sections": [{"heading": "Loops", "content": "for x in xs:\n    print(x)"}],
+          "score": 0.75, "done": True, "missing": None}
+
+
+@pytest.fixture
+def stdlib_serialization(monkeypatch):
+    """The module as it loads when orjson is not installed."""
+    real_import = builtins.__import__
+
+    def no_orjson(name, *args, **kwargs):
+        if name == "orjson":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_orjson)
+    module = importlib.reload(serialization)
+    monkeypatch.undo()
+    yield module
+    importlib.reload(serialization)
+
+
+def test_stdlib_fallback_round_trips(stdlib_serialization):
+    assert stdlib_serialization.BACKEND == "json"
+    text = stdlib_serialization.dumps(SAMPLE)
+    assert text == json.dumps(SAMPLE, separators=(",", ":"))
+    assert stdlib_serialization.loads(text) == SAMPLE
+    assert stdlib_serialization.loads(text.encode()) == SAMPLE
+
+
+def test_backends_read_each_others_output(stdlib_serialization):
+    orjson = pytest.importorskip("orjson")
+    assert stdlib_serialization.loads(orjson.dumps(SAMPLE).decode()) == SAMPLE
+    assert orjson.loads(stdlib_serialization.dumps(SAMPLE)) == SAMPLE
+
+
+def test_reads_rows_written_by_json_dumps():
+    assert serialization.loads(json.dumps(SAMPLE, indent=2)) == SAMPLE
+
+
+def test_int_keys_are_allowed():
+    assert serialization.loads(serialization.dumps({0: "a", 1: "b"})) == {"0": "a", "1": "b"}
+
+
+def test_loads_or_handles_null_columns():
+    assert serialization.loads_or(None, {}) == {}
+    assert serialization.loads_or("", []) == []
+    assert serialization.loads_or('{"a":1}') == {"a": 1}
+
+
+def _seed_lesson(content):
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Python')", ())
+    return skill_id, execute(
+        "INSERT INTO lessons (skill_id, topic, order_index, content_json) VALUES (?, 'Loops', 1, ?)",
+        (skill_id, serialization.dumps(content) if content is not None else None),
+    )
+
+
+def test_lesson_endpoint_returns_parsed_content(client):
+    _, lesson_id = _seed_lesson(SAMPLE)
+    data = client.get(f"/api/lessons/{lesson_id}").json()
+    assert data["content"] == SAMPLE
+    assert "content_json" not in data
+
+
+def test_ungenerated_lesson_has_null_content(client):
+    _, lesson_id = _seed_lesson(None)
+    assert client.get(f"/api/lessons/{lesson_id}").json()["content"] is None
+
+
+def test_skill_outline_omits_lesson_content(client):
+    skill_id, _ = _seed_lesson(SAMPLE)
+    lessons = client.get(f"/api/skills/{skill_id}").json()["lessons"]
+    assert lessons[0]["topic"] == "Loops"
+    assert "content_json" not in lessons[0]
+
+
+def test_feedback_tags_are_stored_compactly(client):
+    _, lesson_id = _seed_lesson(SAMPLE)
+    client.post(f"/api/lessons/{lesson_id}/feedback", json={"tags": ["too easy", "clear"], "message": ""})
+    row = query_one("SELECT tags_json FROM user_feedback WHERE content_id = ?", (lesson_id,))
+    assert row["tags_json"] == '["too easy","clear"]'
+    assert client.get(f"/api/lessons/{lesson_id}/feedback").json()["tags"] == ["too easy", "clear"]
@@ -0,0 +1,106 @@
+"""Tests for request coalescing of concurrent identical generations."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.database import execute, query_one
+from app.services.singleflight import SingleFlight
+
+
+async def _slow(value, calls: list, delay: float = 0.05):
+    calls.append(value)
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", lambda: _slow("v", calls)) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["v"] * 10
+    assert calls == ["v"]
+    assert flight.in_flight("k") is None
+
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flight = SingleFlight()
+    attempts = []
+
+    async def boom():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model overloaded")
+
+    async def main():
+        results = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await flight.do("k", boom)
+
+    asyncio.run(main())
+    assert len(attempts) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+    calls = []
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", lambda: _slow("v", calls)))
+        second = asyncio.ensure_future(flight.do("k", lambda: _slow("v", calls)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "v"
+    assert calls == ["v"]
+
+
+def _seed_skill() -> tuple[int, int]:
+    skill_id = execute("INSERT INTO skills (user_id, name, description, curriculum_json) VALUES (1, 'Guitar', 'Play', '[]')", ())
+    lesson_id = execute("INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Chords', 1)", (skill_id,))
+    return skill_id, lesson_id
+
+
+def test_concurrent_project_requests_insert_one_row():
+    from app.services import project_service
+    skill_id, _ = _seed_skill()
+
+    async def slow_brief(**kwargs):
+        await asyncio.sleep(0.05)
+        return {"title": "Play a song"}
+
+    async def main():
+        return await asyncio.gather(*(project_service.get_or_generate_project(skill_id) for _ in range(5)))
+
+    with patch("app.services.project_service.tutor.generate_project_brief", side_effect=slow_brief) as brief:
+        results = asyncio.run(main())
+
+    assert brief.await_count == 1
+    assert len({r["id"] for r in results}) == 1
+    assert query_one("SELECT COUNT(*) AS c FROM skill_projects")["c"] == 1
+
+
+@patch("app.services.lesson_service._generate_resources", new_callable=AsyncMock, return_value=None)
+def test_concurrent_lesson_generation_calls_model_once(mock_resources):
+    from app.services import lesson_service
+    skill_id, lesson_id = _seed_skill()
+
+    async def slow_lesson(**kwargs):
+        await asyncio.sleep(0.05)
+        return {"title": "Chords", "sections": []}
+
+    async def main():
+        return await asyncio.gather(*(lesson_service.generate_lesson(skill_id, lesson_id) for _ in range(5)))
+
+    with patch("app.services.lesson_service.tutor.generate_lesson", side_effect=slow_lesson) as gen:
+        results = asyncio.run(main())
+        # Once saved, reopening is a DB read
+        again = asyncio.run(lesson_service.generate_lesson(skill_id, lesson_id))
+
+    assert gen.await_count == 1
+    assert all(r == {"id": lesson_id, "title": "Chords", "sections": []} for r in results + [again])
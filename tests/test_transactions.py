@@ -0,0 +1,74 @@
+"""Tests for unit-of-work transactions in the service flows."""
+from unittest.mock import patch
+
+import pytest
+
+from app.database import execute, get_db, query_one, transaction
+
+
+def _seed_quiz() -> int:
+    skill_id = execute("INSERT INTO skills (user_id, name) VALUES (1, 'Test')", ())
+    lesson_id = execute(
+        "INSERT INTO lessons (skill_id, topic, order_index) VALUES (?, 'Topic', 1)",
+        (skill_id,),
+    )
+    return execute("INSERT INTO quizzes (lesson_id, questions_json) VALUES (?, '[]')", (lesson_id,))
+
+
+def _trace_statements():
+    statements = []
+    get_db().set_trace_callback(statements.append)
+    return statements
+
+
+def test_submit_quiz_commits_once():
+    from app.services.quiz_service import submit_quiz
+    quiz_id = _seed_quiz()
+
+    statements = _trace_statements()
+    result = submit_quiz(1, quiz_id, {"0": {"correct": True}}, 1.0)
+    get_db().set_trace_callback(None)
+
+    assert result["xp_earned"] > 0
+    assert sum(1 for s in statements if s.strip().upper() == "COMMIT") == 1
+
+
+def test_rate_card_commits_once():
+    from app.services.review_service import rate_card
+    _seed_quiz()
+    card_id = execute(
+        "INSERT INTO review_cards (user_id, lesson_id, question, answer) VALUES (1, 1, 'Q?', 'A.')",
+        (),
+    )
+
+    statements = _trace_statements()
+    rate_card(1, card_id, 5)
+    get_db().set_trace_callback(None)
+
+    assert sum(1 for s in statements if s.strip().upper() == "COMMIT") == 1
+
+
+def test_failure_midway_rolls_back_xp():
+    from app.services.quiz_service import submit_quiz
+    quiz_id = _seed_quiz()
+
+    # Fails after the XP and counters have been applied
+    with patch("app.services.gamification.check_achievements", side_effect=RuntimeError("crash")):
+        with pytest.raises(RuntimeError):
+            submit_quiz(1, quiz_id, {"0": {"correct": True}}, 1.0)
+
+    progress = query_one("SELECT * FROM user_progress WHERE user_id = 1")
+    assert progress["total_xp"] == 0
+    assert progress["quizzes_completed"] == 0
+    assert query_one("SELECT COUNT(*) AS c FROM quiz_attempts")["c"] == 0
+
+
+def test_nested_transactions_join_the_outer_one():
+    with pytest.raises(ValueError):
+        with transaction():
+            execute("INSERT INTO skills (user_id, name) VALUES (1, 'Outer')")
+            with transaction():
+                execute("INSERT INTO skills (user_id, name) VALUES (1, 'Inner')")
+            raise ValueError("abort")
+
+    assert query_one("SELECT COUNT(*) AS c FROM skills")["c"] == 0